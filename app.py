@@ -1,5 +1,4 @@
 import streamlit as st
-import sqlite3
 import os
 import pandas as pd
 import numpy as np
@@ -7,19 +6,25 @@ import cv2
 import tempfile
 from PIL import Image
 import time
-import spacy
-import pytesseract
-from transformers import pipeline, AutoTokenizer, AutoModel
-import torch
 from sklearn.metrics.pairwise import cosine_similarity
 import re
 import io
 import base64
 from streamlit_webrtc import webrtc_streamer, VideoTransformerBase
 import mediapipe as mp
-import layoutparser as lp
 import matplotlib.pyplot as plt
 from pathlib import Path
+from lib.candidate_index import CandidateIndex
+from lib.cv_store import CVStore
+from lib.database import get_database
+from lib.document_context import DocumentImage
+from lib.document_extraction import EXTRACTION_VERSION, extract_document
+from lib.embedding_store import EmbeddingStore
+from lib.embeddings import DOCUMENT_EMBEDDING_DIM, DOCUMENT_EMBEDDING_VERSION, embed_documents, embed_many
+from lib.job_analysis_cache import JobAnalysisCache
+from lib.model_registry import get_model
+from lib.ocr_backends import OCRPolicy
+from lib.score_recompute import ScorePolicy
 
 # Configuration de la page
 st.set_page_config(
@@ -31,151 +36,126 @@ st.set_page_config(
 
 # Initialisation de la base de données
 def init_db():
-    conn = sqlite3.connect('ats_database.db')
-    c = conn.cursor()
-    
-    # Table des candidats
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS candidates (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        phone TEXT,
-        cv_path TEXT,
-        job_id INTEGER,
-        cv_match_score REAL,
-        written_interview_score REAL,
-        video_interview_score REAL,
-        documents_score REAL,
-        final_score REAL,
-        status TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Table des offres d'emploi
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS jobs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        description TEXT NOT NULL,
-        required_skills TEXT,
-        required_experience INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Table des documents
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS documents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        candidate_id INTEGER,
-        document_type TEXT,
-        document_path TEXT,
-        authenticity_score REAL,
-        verified BOOLEAN,
-        FOREIGN KEY (candidate_id) REFERENCES candidates (id)
-    )
-    ''')
-    
-    # Table des entretiens
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS interviews (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        candidate_id INTEGER,
-        job_id INTEGER,
-        questions TEXT,
-        answers TEXT,
-        written_score REAL,
-        video_score REAL,
-        emotions_data TEXT,
-        FOREIGN KEY (candidate_id) REFERENCES candidates (id),
-        FOREIGN KEY (job_id) REFERENCES jobs (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    get_database().init_schema()
 
 # Initialisation des modèles NLP
 @st.cache_resource
 def load_nlp_models():
     # Chargement du modèle spaCy
-    nlp = spacy.load("fr_core_news_md")
+    nlp = get_model("spacy:fr_core_news_md")
     
     # Chargement du modèle de transformers pour l'analyse sémantique
-    tokenizer = AutoTokenizer.from_pretrained("camembert-base")
-    model = AutoModel.from_pretrained("camembert-base")
+    camembert = get_model("camembert-base")
     
     # Modèle pour la classification de documents
-    document_model = lp.Detectron2LayoutModel(
-        'lp://PubLayNet/mask_rcnn_X_101_32x8d_FPN_3x/config',
-        extra_config=["MODEL.ROI_HEADS.SCORE_THRESH_TEST", 0.8],
-        label_map={0: "Text", 1: "Title", 2: "List", 3: "Table", 4: "Figure"}
-    )
+    document_model = get_model("publaynet-layout")
     
     return {
         "nlp": nlp,
-        "tokenizer": tokenizer,
-        "model": model,
+        "tokenizer": camembert.tokenizer,
+        "model": camembert.model,
         "document_model": document_model
     }
 
+# Embedding d'un CV ou d'une offre (fenêtres de 512 tokens moyennées, sans troncature)
+def embed_document(text):
+    return embed_documents([text])[0]
+
+SPACY_ENTITIES_VERSION = "spacy:fr_core_news_md/v1"
+
+@st.cache_resource
+def get_job_cache():
+    return JobAnalysisCache(DOCUMENT_EMBEDDING_VERSION)
+
+# Embedding d'une offre, calculé une seule fois par texte d'offre
+def get_job_embedding(job_description):
+    analysis = get_job_cache().get_or_compute(
+        job_description,
+        lambda text: {"embedding": embed_document(text)}
+    )
+    return analysis["embedding"]
+
+# CV stockés par empreinte SHA-256, avec texte, entités et embeddings en cache
+@st.cache_resource
+def get_cv_store():
+    return CVStore()
+
+# Entités spaCy d'un CV, sous forme de paires (texte, label)
+def extract_cv_entities(cv_text, models):
+    return [[ent.text, ent.label_] for ent in models["nlp"](cv_text).ents]
+
+# Embeddings des CV et des offres enregistrés dans la base (python -m lib.embedding_store pour les remplir)
+@st.cache_resource
+def get_embedding_store():
+    return EmbeddingStore(get_database())
+
+# Pondération des scores et seuil de présélection (score_policy.json, sinon valeurs par défaut)
+@st.cache_resource
+def get_score_policy():
+    return ScorePolicy.load()
+
+# Index des embeddings de CV pour la recherche des meilleurs profils
+@st.cache_resource
+def get_candidate_index():
+    return CandidateIndex.load(DOCUMENT_EMBEDDING_DIM)
+
+# Nombre de candidats par page de la liste du tableau de bord
+DASHBOARD_PAGE_SIZE = 50
+
+# Moteur OCR par type de document (ocr_policy.json produit par python -m lib.ocr_benchmark)
+@st.cache_resource
+def get_ocr_policy():
+    return OCRPolicy.load()
+
+# Extraction page par page (budget de pages et de taille, pool de processus pour les gros PDF)
+def extract_cv_text(cv_file, document_format):
+    result = extract_document(cv_file, document_format=document_format)
+    if result.truncated:
+        st.warning(f"Document tronqué: {len(result.pages)} pages analysées sur {result.total_pages}.")
+    slowest = result.slowest_pages(1)
+    if slowest:
+        print(f"📄 Extraction {document_format}: {len(result.pages)} pages en {result.seconds:.2f}s "
+              f"(page la plus lente: {slowest[0].index + 1}, {slowest[0].seconds:.2f}s)")
+    return result.text
+
 # Fonction pour extraire le texte d'un PDF
 def extract_text_from_pdf(pdf_file):
     try:
-        import PyPDF2
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
+        return extract_cv_text(pdf_file, "pdf")
     except Exception as e:
         st.error(f"Erreur lors de l'extraction du texte du PDF: {e}")
         return ""
 
-# Fonction pour extraire le texte d'un document Word
+# Fonction pour extraire le texte d'un document Word (paragraphes et tableaux)
 def extract_text_from_docx(docx_file):
     try:
-        import docx
-        doc = docx.Document(docx_file)
-        text = ""
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+        return extract_cv_text(docx_file, "docx")
     except Exception as e:
         st.error(f"Erreur lors de l'extraction du texte du document Word: {e}")
         return ""
 
 # Fonction pour calculer le score de matching entre CV et description de poste
-def calculate_matching_score(cv_text, job_description, models):
+def calculate_matching_score(cv_text, job_description, models, cv_embedding=None, cv_entities=None):
     nlp = models["nlp"]
-    tokenizer = models["tokenizer"]
-    model = models["model"]
     
-    # Traitement avec spaCy pour l'extraction d'entités
-    cv_doc = nlp(cv_text)
+    # Traitement avec spaCy pour l'extraction d'entités (celles du CV peuvent venir du cache)
+    if cv_entities is None:
+        cv_entities = extract_cv_entities(cv_text, models)
     job_doc = nlp(job_description)
     
     # Extraction des compétences et expériences
-    cv_skills = [ent.text for ent in cv_doc.ents if ent.label_ in ["SKILL", "ORG", "PRODUCT"]]
+    cv_skills = [text for text, label in cv_entities if label in ["SKILL", "ORG", "PRODUCT"]]
     job_skills = [ent.text for ent in job_doc.ents if ent.label_ in ["SKILL", "ORG", "PRODUCT"]]
     
-    # Calcul de similarité avec transformers
-    cv_inputs = tokenizer(cv_text, return_tensors="pt", truncation=True, max_length=512, padding=True)
-    job_inputs = tokenizer(job_description, return_tensors="pt", truncation=True, max_length=512, padding=True)
-    
-    with torch.no_grad():
-        cv_outputs = model(**cv_inputs)
-        job_outputs = model(**job_inputs)
-    
-    cv_embeddings = cv_outputs.last_hidden_state.mean(dim=1)
-    job_embeddings = job_outputs.last_hidden_state.mean(dim=1)
+    # Calcul de similarité avec transformers (l'embedding de l'offre est mis en cache)
+    if cv_embedding is None:
+        cv_embedding = embed_document(cv_text)
+    job_embedding = get_job_embedding(job_description)
     
     # Calcul de la similarité cosinus
     similarity = cosine_similarity(
-        cv_embeddings.detach().numpy(),
-        job_embeddings.detach().numpy()
+        cv_embedding.reshape(1, -1),
+        job_embedding.reshape(1, -1)
     )[0][0]
     
     # Calcul du score final (0-100)
@@ -276,27 +256,23 @@ def evaluate_written_answers(questions, answers, models):
     
     scores = []
     
+    # Encodage de toutes les questions et réponses suffisamment longues en un seul lot
+    pairs = [(q, a) for q, a in zip(questions, answers) if len(a.split()) >= 10]
+    embeddings = embed_many([text for pair in pairs for text in pair], tokenizer, model)
+    pair_embeddings = iter(embeddings.reshape(len(pairs), 2, embeddings.shape[1]))
+    
     for q, a in zip(questions, answers):
         # Vérifier la longueur de la réponse
         if len(a.split()) < 10:
             scores.append(0.3)  # Réponse trop courte
             continue
-            
-        # Encodage de la question et de la réponse
-        q_inputs = tokenizer(q, return_tensors="pt", truncation=True, max_length=512, padding=True)
-        a_inputs = tokenizer(a, return_tensors="pt", truncation=True, max_length=512, padding=True)
-        
-        with torch.no_grad():
-            q_outputs = model(**q_inputs)
-            a_outputs = model(**a_inputs)
         
-        q_embeddings = q_outputs.last_hidden_state.mean(dim=1)
-        a_embeddings = a_outputs.last_hidden_state.mean(dim=1)
+        q_embedding, a_embedding = next(pair_embeddings)
         
         # Calcul de la similarité cosinus
         similarity = cosine_similarity(
-            q_embeddings.detach().numpy(),
-            a_embeddings.detach().numpy()
+            q_embedding.reshape(1, -1),
+            a_embedding.reshape(1, -1)
         )[0][0]
         
         # Normalisation du score (0-1)
@@ -309,17 +285,18 @@ def evaluate_written_answers(questions, answers, models):
 # Fonction pour vérifier l'authenticité des documents
 def verify_document_authenticity(document_path, document_type, models):
     try:
-        # Chargement de l'image du document
-        image = cv2.imread(document_path)
-        if image is None:
+        # Chargement de l'image du document (décodée une seule fois pour l'OCR et la mise en page)
+        try:
+            document = DocumentImage.of(document_path)
+        except ValueError:
             return 0.0
             
-        # Extraction du texte avec OCR
-        text = pytesseract.image_to_string(image, lang='fra')
+        # Extraction du texte avec le moteur OCR retenu pour ce type de document
+        text = get_ocr_policy().backend_for(document_type).recognize(document).text
         
         # Analyse de la mise en page avec LayoutParser
         layout_model = models["document_model"]
-        layout = layout_model.detect(image)
+        layout = layout_model.detect(document.bgr)
         
         # Vérification basée sur le type de document
         authenticity_score = 0.0
@@ -435,23 +412,17 @@ def main():
             
             if submit_button:
                 if job_title and job_description:
-                    conn = sqlite3.connect('ats_database.db')
-                    c = conn.cursor()
-                    c.execute(
-                        "INSERT INTO jobs (title, description, required_skills, required_experience) VALUES (?, ?, ?, ?)",
-                        (job_title, job_description, required_skills, required_experience)
-                    )
-                    conn.commit()
-                    conn.close()
+                    job_id = get_database().jobs.create(job_title, job_description, required_skills, required_experience)
+                    
+                    # Pré-calcul de l'embedding de l'offre pour les futures candidatures, enregistré avec l'offre
+                    get_embedding_store().save("job", job_id, get_job_embedding(job_description))
                     st.success("Offre d'emploi ajoutée avec succès!")
                 else:
                     st.error("Veuillez remplir tous les champs obligatoires.")
         
         # Afficher les offres existantes
         st.subheader("Offres d'emploi existantes")
-        conn = sqlite3.connect('ats_database.db')
-        jobs_df = pd.read_sql_query("SELECT id, title, required_experience, created_at FROM jobs ORDER BY created_at DESC", conn)
-        conn.close()
+        jobs_df = get_database().jobs.listing_df()
         
         if not jobs_df.empty:
             st.dataframe(jobs_df)
@@ -463,9 +434,8 @@ def main():
         st.title("Postuler à une offre d'emploi")
         
         # Sélection de l'offre d'emploi
-        conn = sqlite3.connect('ats_database.db')
-        jobs_df = pd.read_sql_query("SELECT id, title FROM jobs", conn)
-        conn.close()
+        db = get_database()
+        jobs_df = db.jobs.titles_df()
         
         if jobs_df.empty:
             st.warning("Aucune offre d'emploi disponible. Veuillez demander au recruteur d'ajouter des offres.")
@@ -474,11 +444,7 @@ def main():
         job_id = st.selectbox("Sélectionnez une offre d'emploi", jobs_df["id"].tolist(), format_func=lambda x: jobs_df[jobs_df["id"] == x]["title"].iloc[0])
         
         # Récupération de la description du poste
-        conn = sqlite3.connect('ats_database.db')
-        c = conn.cursor()
-        c.execute("SELECT description FROM jobs WHERE id = ?", (job_id,))
-        job_description = c.fetchone()[0]
-        conn.close()
+        job_description = db.jobs.description(job_id)
         
         # Formulaire de candidature
         with st.form("application_form"):
@@ -492,35 +458,50 @@ def main():
             
             if submit_button:
                 if name and email and cv_file:
-                    # Sauvegarde du CV
-                    cv_path = f"uploads/cv_{int(time.time())}_{cv_file.name}"
-                    os.makedirs(os.path.dirname(cv_path), exist_ok=True)
-                    
-                    with open(cv_path, "wb") as f:
-                        f.write(cv_file.getbuffer())
-                    
                     # Extraction du texte du CV
                     if cv_file.name.endswith('.pdf'):
-                        cv_text = extract_text_from_pdf(cv_file)
+                        extract_text = extract_text_from_pdf
                     elif cv_file.name.endswith('.docx'):
-                        cv_text = extract_text_from_docx(cv_file)
+                        extract_text = extract_text_from_docx
                     else:
                         st.error("Format de fichier non supporté.")
                         return
                     
-                    # Calcul du score de matching
-                    matching_score = calculate_matching_score(cv_text, job_description, models)
+                    # Sauvegarde du CV (un fichier déjà reçu n'est ni réécrit ni réanalysé)
+                    cv_store = get_cv_store()
+                    stored_cv = cv_store.store(cv_file.getvalue(), cv_file.name)
+                    cv_path = stored_cv.path
                     
-                    # Enregistrement du candidat dans la base de données
-                    conn = sqlite3.connect('ats_database.db')
-                    c = conn.cursor()
-                    c.execute(
-                        "INSERT INTO candidates (name, email, phone, cv_path, job_id, cv_match_score, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                        (name, email, phone, cv_path, job_id, matching_score, "En attente")
+                    cv_text = cv_store.get_or_compute(
+                        stored_cv.sha256, "text", EXTRACTION_VERSION, lambda: extract_text(cv_file)
                     )
-                    candidate_id = c.lastrowid
-                    conn.commit()
-                    conn.close()
+                    if cv_text and cv_text.strip():
+                        cv_entities = cv_store.get_or_compute(
+                            stored_cv.sha256, "spacy_entities", SPACY_ENTITIES_VERSION,
+                            lambda: extract_cv_entities(cv_text, models)
+                        )
+                        # L'embedding du CV sert au score et à l'index des profils
+                        cv_embedding = cv_store.get_or_compute(
+                            stored_cv.sha256, "embedding", DOCUMENT_EMBEDDING_VERSION, lambda: embed_document(cv_text)
+                        )
+                    else:
+                        # Extraction échouée: rien n'est mis en cache, enregistré ni indexé pour ce fichier,
+                        # une extraction réussie plus tard repartira de zéro
+                        cv_entities = cv_embedding = None
+                    
+                    # Calcul du score de matching
+                    matching_score = calculate_matching_score(
+                        cv_text, job_description, models, cv_embedding, cv_entities
+                    )
+                    
+                    # Enregistrement du candidat et de l'embedding de son CV dans la base de données
+                    with db.transaction():
+                        candidate_id = db.candidates.create(name, email, phone, cv_path, job_id, matching_score)
+                        if cv_embedding is not None:
+                            get_embedding_store().save("cv", candidate_id, cv_embedding)
+                    
+                    if cv_embedding is not None:
+                        get_candidate_index().add(candidate_id, cv_embedding)
                     
                     st.success("Candidature soumise avec succès!")
                     
@@ -548,20 +529,11 @@ def main():
                                 written_score = evaluate_written_answers(questions, answers, models)
                                 
                                 # Mise à jour du score dans la base de données
-                                conn = sqlite3.connect('ats_database.db')
-                                c = conn.cursor()
-                                c.execute(
-                                    "UPDATE candidates SET written_interview_score = ? WHERE id = ?",
-                                    (written_score, candidate_id)
-                                )
-                                
-                                # Enregistrement des questions et réponses
-                                c.execute(
-                                    "INSERT INTO interviews (candidate_id, job_id, questions, answers, written_score) VALUES (?, ?, ?, ?, ?)",
-                                    (candidate_id, job_id, str(questions), str(answers), written_score)
-                                )
-                                conn.commit()
-                                conn.close()
+                                with db.transaction():
+                                    db.candidates.set_score(candidate_id, "written_interview_score", written_score)
+                                    
+                                    # Enregistrement des questions et réponses
+                                    db.interviews.create(candidate_id, job_id, str(questions), str(answers), written_score)
                                 
                                 st.metric("Score de l'entretien écrit", f"{written_score:.1f}/100")
                                 
@@ -607,20 +579,11 @@ def main():
                                         ) * 100
                                         
                                         # Mise à jour du score dans la base de données
-                                        conn = sqlite3.connect('ats_database.db')
-                                        c = conn.cursor()
-                                        c.execute(
-                                            "UPDATE candidates SET video_interview_score = ? WHERE id = ?",
-                                            (video_score, candidate_id)
-                                        )
-                                        
-                                        # Mise à jour des données d'entretien
-                                        c.execute(
-                                            "UPDATE interviews SET video_score = ?, emotions_data = ? WHERE candidate_id = ?",
-                                            (video_score, str(emotion_stats), candidate_id)
-                                        )
-                                        conn.commit()
-                                        conn.close()
+                                        with db.transaction():
+                                            db.candidates.set_score(candidate_id, "video_interview_score", video_score)
+                                            
+                                            # Mise à jour des données d'entretien
+                                            db.interviews.set_video(candidate_id, video_score, str(emotion_stats))
                                         
                                         st.metric("Score de l'entretien vidéo", f"{video_score:.1f}/100")
                                         
@@ -645,6 +608,7 @@ def main():
                                             if st.button("Soumettre les documents"):
                                                 if uploaded_docs:
                                                     total_auth_score = 0
+                                                    document_rows = []
                                                     
                                                     for doc_type, doc_file in uploaded_docs.items():
                                                         # Sauvegarde du document
@@ -657,15 +621,8 @@ def main():
                                                         # Vérification de l'authenticité
                                                         auth_score = verify_document_authenticity(doc_path, doc_type.split()[0], models)
                                                         
-                                                        # Enregistrement du document dans la base de données
-                                                        conn = sqlite3.connect('ats_database.db')
-                                                        c = conn.cursor()
-                                                        c.execute(
-                                                            "INSERT INTO documents (candidate_id, document_type, document_path, authenticity_score, verified) VALUES (?, ?, ?, ?, ?)",
-                                                            (candidate_id, doc_type, doc_path, auth_score, auth_score >= 70)
-                                                        )
-                                                        conn.commit()
-                                                        conn.close()
+                                                        # Enregistré avec les autres documents en une seule transaction
+                                                        document_rows.append((candidate_id, doc_type, doc_path, auth_score, auth_score >= 70))
                                                         
                                                         total_auth_score += auth_score
                                                         
@@ -674,40 +631,25 @@ def main():
                                                     # Calcul du score moyen d'authenticité
                                                     avg_auth_score = total_auth_score / len(uploaded_docs)
                                                     
-                                                    # Mise à jour du score dans la base de données
-                                                    conn = sqlite3.connect('ats_database.db')
-                                                    c = conn.cursor()
-                                                    c.execute(
-                                                        "UPDATE candidates SET documents_score = ? WHERE id = ?",
-                                                        (avg_auth_score, candidate_id)
-                                                    )
-                                                    
-                                                    # Calcul du score final
-                                                    c.execute(
-                                                        "SELECT cv_match_score, written_interview_score, video_interview_score, documents_score FROM candidates WHERE id = ?",
-                                                        (candidate_id,)
-                                                    )
-                                                    scores = c.fetchone()
-                                                    
-                                                    final_score = (
-                                                        scores[0] * 0.3 +  # CV match
-                                                        scores[1] * 0.25 +  # Written interview
-                                                        scores[2] * 0.25 +  # Video interview
-                                                        scores[3] * 0.2  # Documents
-                                                    )
-                                                    
-                                                    # Mise à jour du statut et du score final
-                                                    status = "Présélectionné" if final_score >= 70 else "Rejeté"
-                                                    c.execute(
-                                                        "UPDATE candidates SET final_score = ?, status = ? WHERE id = ?",
-                                                        (final_score, status, candidate_id)
-                                                    )
-                                                    conn.commit()
-                                                    conn.close()
+                                                    # Documents, score et statut enregistrés en une seule transaction
+                                                    with db.transaction():
+                                                        db.documents.create_many(document_rows)
+                                                        db.candidates.set_score(candidate_id, "documents_score", avg_auth_score)
+                                                        
+                                                        # Calcul du score final
+                                                        scores = db.candidates.scores(candidate_id)
+                                                        
+                                                        # Pondération et seuil de la politique partagée avec python -m lib.score_recompute
+                                                        score_policy = get_score_policy()
+                                                        final_score = score_policy.final_score(*scores)
+                                                        
+                                                        # Mise à jour du statut et du score final
+                                                        status = score_policy.status_for(final_score)
+                                                        db.candidates.set_final(candidate_id, final_score, status)
                                                     
                                                     st.metric("Score final", f"{final_score:.1f}/100")
                                                     
-                                                    if final_score >= 70:
+                                                    if status == score_policy.accepted_status:
                                                         st.success("Félicitations! Votre candidature a été présélectionnée.")
                                                         st.balloons()
                                                     else:
@@ -729,13 +671,18 @@ def main():
     elif page == "Tableau de bord":
         st.title("Tableau de bord de recrutement")
         
+        db = get_database()
+        cache_stats = db.cache.stats()
+        st.caption(
+            f"Cache des requêtes: {cache_stats['entries']} entrées, "
+            f"{cache_stats['hits']} succès / {cache_stats['misses']} échecs ({cache_stats['hit_rate']:.0%})"
+        )
+        
         # Filtres
         col1, col2 = st.columns(2)
         
         with col1:
-            conn = sqlite3.connect('ats_database.db')
-            jobs_df = pd.read_sql_query("SELECT id, title FROM jobs", conn)
-            conn.close()
+            jobs_df = db.jobs.titles_df()
             
             if not jobs_df.empty:
                 job_filter = st.selectbox(
@@ -752,57 +699,67 @@ def main():
                 ["Tous les statuts", "En attente", "Présélectionné", "Rejeté"]
             )
         
-        # Construction de la requête SQL avec filtres
-        query = "SELECT * FROM candidates"
-        params = []
-        
-        if job_filter != "Toutes les offres" or status_filter != "Tous les statuts":
-            query += " WHERE"
-            
-            if job_filter != "Toutes les offres":
-                query += " job_id = ?"
-                params.append(job_filter)
+        # Recherche des meilleurs profils de toute la base pour une offre
+        with st.expander("Meilleurs profils pour une offre"):
+            if jobs_df.empty:
+                st.info("Aucune offre d'emploi disponible.")
+            else:
+                search_job_id = st.selectbox(
+                    "Offre d'emploi",
+                    jobs_df["id"].tolist(),
+                    format_func=lambda x: jobs_df[jobs_df["id"] == x]["title"].iloc[0],
+                    key="top_k_job"
+                )
+                top_k = st.slider("Nombre de profils", 5, 100, 20)
                 
-                if status_filter != "Tous les statuts":
-                    query += " AND status = ?"
-                    params.append(status_filter)
-            elif status_filter != "Tous les statuts":
-                query += " status = ?"
-                params.append(status_filter)
+                if st.button("Rechercher"):
+                    # Embedding enregistré avec l'offre; calculé (et enregistré) s'il manque ou date d'un autre modèle
+                    search_embedding = get_embedding_store().get("job", search_job_id)
+                    if search_embedding is None:
+                        search_embedding = get_job_embedding(db.jobs.description(search_job_id))
+                        get_embedding_store().save("job", search_job_id, search_embedding)
+                    
+                    start = time.perf_counter()
+                    matches = get_candidate_index().search(search_embedding, k=top_k)
+                    search_ms = (time.perf_counter() - start) * 1000
+                    
+                    if not matches:
+                        st.info("Aucun CV indexé pour le moment.")
+                    else:
+                        match_ids = [candidate_id for candidate_id, _ in matches]
+                        matches_df = db.candidates.by_ids_df(match_ids)
+                        
+                        similarities = pd.DataFrame(matches, columns=["id", "similarity"])
+                        matches_df = similarities.merge(matches_df, on="id")
+                        matches_df["similarity"] = (matches_df["similarity"] * 100).round(1)
+                        matches_df.columns = ["ID", "Similarité", "Nom", "Email", "Offre postulée", "Statut"]
+                        
+                        st.caption(f"{len(get_candidate_index())} CV indexés, recherche en {search_ms:.0f} ms")
+                        st.dataframe(matches_df)
         
-        # Récupération des données
-        conn = sqlite3.connect('ats_database.db')
-        candidates_df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
+        # Statistiques lues dans job_stats (tenue à jour par triggers): coût proportionnel au nombre d'offres
+        filter_job_id = None if job_filter == "Toutes les offres" else job_filter
+        filter_status = None if status_filter == "Tous les statuts" else status_filter
+        status_counts = db.candidates.status_counts(filter_job_id, filter_status)
+        total_candidates = sum(status_counts.values())
         
-        if not candidates_df.empty:
-            # Ajout du nom de l'offre d'emploi
-            conn = sqlite3.connect('ats_database.db')
-            jobs_df = pd.read_sql_query("SELECT id, title FROM jobs", conn)
-            conn.close()
-            
-            candidates_df = candidates_df.merge(jobs_df, left_on="job_id", right_on="id", suffixes=("", "_job"))
-            candidates_df.rename(columns={"title": "job_title"}, inplace=True)
-            
+        if total_candidates:
             # Affichage des statistiques
             st.subheader("Statistiques")
             
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Total des candidats", len(candidates_df))
+                st.metric("Total des candidats", total_candidates)
             
             with col2:
-                preselected = len(candidates_df[candidates_df["status"] == "Présélectionné"])
-                st.metric("Candidats présélectionnés", preselected)
+                st.metric("Candidats présélectionnés", status_counts.get("Présélectionné", 0))
             
             with col3:
-                rejected = len(candidates_df[candidates_df["status"] == "Rejeté"])
-                st.metric("Candidats rejetés", rejected)
+                st.metric("Candidats rejetés", status_counts.get("Rejeté", 0))
             
             with col4:
-                pending = len(candidates_df[candidates_df["status"] == "En attente"])
-                st.metric("Candidats en attente", pending)
+                st.metric("Candidats en attente", status_counts.get("En attente", 0))
             
             # Graphiques
             st.subheader("Analyse des candidatures")
@@ -810,9 +767,11 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                # Distribution des scores finaux
+                # Distribution des scores finaux (bins de 10 points de job_stats)
+                histogram = db.candidates.score_histogram(filter_job_id, filter_status)
+                bin_width = 100 / len(histogram)
                 fig, ax = plt.subplots(figsize=(8, 5))
-                candidates_df["final_score"].fillna(0).hist(bins=10, ax=ax)
+                ax.bar([i * bin_width for i in range(len(histogram))], histogram, width=bin_width, align="edge")
                 ax.set_title("Distribution des scores finaux")
                 ax.set_xlabel("Score")
                 ax.set_ylabel("Nombre de candidats")
@@ -820,22 +779,26 @@ def main():
             
             with col2:
                 # Répartition des statuts
-                status_counts = candidates_df["status"].value_counts()
+                labels = [str(label) for label in status_counts]
                 fig, ax = plt.subplots(figsize=(8, 5))
-                ax.pie(status_counts, labels=status_counts.index, autopct='%1.1f%%')
+                ax.pie(list(status_counts.values()), labels=labels, autopct='%1.1f%%')
                 ax.set_title("Répartition des statuts")
                 st.pyplot(fig)
             
-            # Tableau des candidats
+            # Tableau des candidats, page par page (pagination par id, sans OFFSET)
             st.subheader("Liste des candidats")
             
-            # Sélection et renommage des colonnes à afficher
-            display_df = candidates_df[[
-                "id", "name", "email", "job_title", "cv_match_score",
-                "written_interview_score", "video_interview_score",
-                "documents_score", "final_score", "status"
-            ]].copy()
+            # Dernier id de chaque page déjà parcourue; on repart de la première page si les filtres changent
+            if st.session_state.get("candidates_filters") != (job_filter, status_filter):
+                st.session_state["candidates_filters"] = (job_filter, status_filter)
+                st.session_state["candidates_cursors"] = [None]
+            cursors = st.session_state["candidates_cursors"]
             
+            page_df = db.candidates.page_df(filter_job_id, filter_status, after_id=cursors[-1], limit=DASHBOARD_PAGE_SIZE + 1)
+            has_next_page = len(page_df) > DASHBOARD_PAGE_SIZE
+            page_df = page_df.head(DASHBOARD_PAGE_SIZE)
+            
+            display_df = page_df.copy()
             display_df.columns = [
                 "ID", "Nom", "Email", "Poste", "Score CV",
                 "Score Entretien Écrit", "Score Entretien Vidéo",
@@ -848,17 +811,27 @@ def main():
             # Affichage du tableau
             st.dataframe(display_df)
             
-            # Détails d'un candidat
+            nav1, nav2, nav3 = st.columns([1, 1, 4])
+            with nav1:
+                st.button("⬅️ Précédente", disabled=len(cursors) == 1, on_click=cursors.pop)
+            with nav2:
+                last_id = int(page_df["id"].iloc[-1]) if not page_df.empty else None
+                st.button("Suivante ➡️", disabled=not has_next_page, on_click=cursors.append, args=(last_id,))
+            with nav3:
+                st.caption(f"Page {len(cursors)} ({DASHBOARD_PAGE_SIZE} candidats par page)")
+            
+            # Détails d'un candidat (parmi la page affichée)
             st.subheader("Détails d'un candidat")
             
+            page_names = dict(zip(page_df["id"].tolist(), page_df["name"].tolist()))
             selected_candidate = st.selectbox(
                 "Sélectionner un candidat",
-                candidates_df["id"].tolist(),
-                format_func=lambda x: candidates_df[candidates_df["id"] == x]["name"].iloc[0]
+                list(page_names),
+                format_func=lambda x: page_names[x]
             )
             
             if selected_candidate:
-                candidate = candidates_df[candidates_df["id"] == selected_candidate].iloc[0]
+                candidate = db.candidates.detail(selected_candidate)
                 
                 col1, col2 = st.columns(2)
                 
@@ -877,13 +850,7 @@ def main():
                     st.metric("Score Final", f"{candidate['final_score']:.1f}/100" if pd.notna(candidate['final_score']) else "-")
                 
                 # Récupération des entretiens
-                conn = sqlite3.connect('ats_database.db')
-                interviews_df = pd.read_sql_query(
-                    "SELECT * FROM interviews WHERE candidate_id = ?",
-                    conn,
-                    params=(selected_candidate,)
-                )
-                conn.close()
+                interviews_df = db.interviews.for_candidate_df(selected_candidate)
                 
                 if not interviews_df.empty:
                     st.subheader("Détails de l'entretien")
@@ -923,13 +890,7 @@ def main():
                             st.write("Impossible d'afficher l'analyse des émotions.")
                 
                 # Récupération des documents
-                conn = sqlite3.connect('ats_database.db')
-                documents_df = pd.read_sql_query(
-                    "SELECT * FROM documents WHERE candidate_id = ?",
-                    conn,
-                    params=(selected_candidate,)
-                )
-                conn.close()
+                documents_df = db.documents.for_candidate_df(selected_candidate)
                 
                 if not documents_df.empty:
                     st.subheader("Documents soumis")
@@ -1,5 +1,5 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { spawn } from "child_process"
+import { postToAnalysisServer } from "@/lib/analysis-client"
 
 // Mock implementation of the enhanced ATS system
 class MockEnhancedATSSystem {
@@ -157,38 +157,11 @@ class MockEnhancedATSSystem {
   }
 }
 
-// Function to call Python enhanced analyzer (for production)
+// Function to call the persistent Python analysis server (for production)
+// Start it with: python -m lib.analysis_server
 async function callEnhancedPythonAnalyzer(cvText: string, jobText: string) {
   try {
-    return new Promise((resolve, reject) => {
-      const pythonProcess = spawn("python", [
-        "lib/enhanced_ats_system.py",
-        JSON.stringify({ cv_text: cvText, job_text: jobText }),
-      ])
-
-      let result = ""
-      let errorOutput = ""
-
-      pythonProcess.stdout.on("data", (data) => {
-        result += data.toString()
-      })
-
-      pythonProcess.stderr.on("data", (data) => {
-        errorOutput += data.toString()
-      })
-
-      pythonProcess.on("close", (code) => {
-        if (code !== 0) {
-          reject(new Error(`Enhanced Python process exited with code ${code}: ${errorOutput}`))
-        } else {
-          try {
-            resolve(JSON.parse(result))
-          } catch (e) {
-            reject(new Error(`Failed to parse enhanced Python output: ${result}`))
-          }
-        }
-      })
-    })
+    return await postToAnalysisServer("/analyze-cv", { cv_text: cvText, job_text: jobText })
   } catch (error) {
     console.error("Error calling enhanced Python analyzer:", error)
     throw error
@@ -1,24 +1,15 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { spawn } from "child_process"
-import { writeFile } from "fs/promises"
-import path from "path"
-import os from "os"
+import { postImageToAnalysisServer } from "@/lib/analysis-client"
 
 // Mock implementation for frontend testing
 // In production, this would call the Python backend
 class MockCVImageAnalyzer {
-  async analyzeCVImage(imageBase64: string, jobDescription: string) {
+  async analyzeCVImage(contentType: string, jobDescription: string) {
     // Simulate processing time
     await new Promise((resolve) => setTimeout(resolve, 2000))
 
     // Extract image type for better mock data
-    let imageType = "unknown"
-    if (imageBase64.startsWith("data:image/")) {
-      const match = imageBase64.match(/data:image\/([a-zA-Z0-9]+);base64,/)
-      if (match && match[1]) {
-        imageType = match[1]
-      }
-    }
+    const imageType = contentType.startsWith("image/") ? contentType.slice("image/".length) : "unknown"
 
     // Generate mock skill matches
     const skillCategories = ["programmation", "frameworks", "data_science", "databases", "cloud", "soft_skills"]
@@ -129,60 +120,60 @@ Arabe (natif), Français (courant), Anglais (professionnel)
   }
 }
 
-// Function to call Python script (for production use)
-async function callPythonAnalyzer(imageBase64: string, jobDescription: string) {
+// Function to call the persistent Python analysis server (for production use)
+// Start it with: python -m lib.analysis_server
+async function callPythonAnalyzer(image: Buffer, contentType: string, jobDescription: string) {
   try {
-    // Create temporary file for the image
-    const tmpDir = os.tmpdir()
-    const imagePath = path.join(tmpDir, `cv_image_${Date.now()}.txt`)
-
-    // Write base64 image to temp file
-    await writeFile(imagePath, imageBase64)
-
-    return new Promise((resolve, reject) => {
-      const pythonProcess = spawn("python", ["lib/cv_image_analyzer.py", imagePath, jobDescription])
-
-      let result = ""
-      let errorOutput = ""
-
-      pythonProcess.stdout.on("data", (data) => {
-        result += data.toString()
-      })
-
-      pythonProcess.stderr.on("data", (data) => {
-        errorOutput += data.toString()
-      })
-
-      pythonProcess.on("close", (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python process exited with code ${code}: ${errorOutput}`))
-        } else {
-          try {
-            resolve(JSON.parse(result))
-          } catch (e) {
-            reject(new Error(`Failed to parse Python output: ${result}`))
-          }
-        }
-      })
-    })
+    // Raw bytes: no base64 round-trip, the server decodes the image once
+    return await postImageToAnalysisServer("/analyze-cv-image", image, contentType, jobDescription)
   } catch (error) {
     console.error("Error calling Python analyzer:", error)
     throw error
   }
 }
 
+// Accepts multipart form data (image file + jobDescription) or the legacy JSON body
+// ({ imageBase64, jobDescription }), decoded here once into a Buffer
+async function readImageRequest(request: NextRequest) {
+  if ((request.headers.get("content-type") || "").startsWith("multipart/form-data")) {
+    const form = await request.formData()
+    const file = form.get("image")
+    const jobDescription = form.get("jobDescription")
+    if (!(file instanceof Blob) || typeof jobDescription !== "string") {
+      return null
+    }
+    return {
+      image: Buffer.from(await file.arrayBuffer()),
+      contentType: file.type || "application/octet-stream",
+      jobDescription,
+    }
+  }
+
+  const { imageBase64, jobDescription } = await request.json()
+  if (!imageBase64 || !jobDescription) {
+    return null
+  }
+  const match = /^data:([^;,]+);base64,/.exec(imageBase64)
+  return {
+    image: Buffer.from(match ? imageBase64.slice(match[0].length) : imageBase64, "base64"),
+    contentType: match ? match[1] : "application/octet-stream",
+    jobDescription,
+  }
+}
+
 export async function POST(request: NextRequest) {
   try {
-    const { imageBase64, jobDescription } = await request.json()
+    const input = await readImageRequest(request)
 
-    if (!imageBase64 || !jobDescription) {
-      return NextResponse.json({ error: "Image base64 and job description are required" }, { status: 400 })
+    if (!input || input.image.length === 0 || !input.jobDescription) {
+      return NextResponse.json({ error: "Image and job description are required" }, { status: 400 })
     }
 
     // Use mock analyzer for now
-    // In production, replace with: const result = await callPythonAnalyzer(imageBase64, jobDescription)
+    // In production, replace with:
+    // const result = await callPythonAnalyzer(input.image, input.contentType, input.jobDescription)
     const analyzer = new MockCVImageAnalyzer()
-    const result = await analyzer.analyzeCVImage(imageBase64, jobDescription)
+    const result = await analyzer.analyzeCVImage(input.contentType, input.jobDescription)
 
     return NextResponse.json(result)
   } catch (error) {
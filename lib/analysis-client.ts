@@ -0,0 +1,78 @@
+import http from "http"
+
+// Client for the persistent Python analysis server (lib/analysis_server.py).
+// Models stay loaded in that process, so each request only pays for inference.
+// Set ANALYSIS_SERVER_SOCKET to use a Unix socket, or ANALYSIS_SERVER_URL for HTTP.
+const DEFAULT_ANALYSIS_SERVER_URL = "http://127.0.0.1:8765"
+const DEFAULT_TIMEOUT_MS = 300_000
+
+export async function postToAnalysisServer(route: string, payload: unknown, timeoutMs = DEFAULT_TIMEOUT_MS) {
+  return sendToAnalysisServer(route, Buffer.from(JSON.stringify(payload)), { "Content-Type": "application/json" }, timeoutMs)
+}
+
+// Sends raw image bytes (no base64 inflation); the server decodes them once.
+// The job description travels URL-encoded in the X-Job-Description header.
+export async function postImageToAnalysisServer(
+  route: string,
+  image: Buffer,
+  contentType: string,
+  jobDescription: string,
+  timeoutMs = DEFAULT_TIMEOUT_MS,
+) {
+  return sendToAnalysisServer(
+    route,
+    image,
+    {
+      "Content-Type": contentType || "application/octet-stream",
+      "X-Job-Description": encodeURIComponent(jobDescription),
+    },
+    timeoutMs,
+  )
+}
+
+function sendToAnalysisServer(route: string, body: Buffer, headers: http.OutgoingHttpHeaders, timeoutMs: number) {
+  const socketPath = process.env.ANALYSIS_SERVER_SOCKET
+  const baseUrl = new URL(process.env.ANALYSIS_SERVER_URL || DEFAULT_ANALYSIS_SERVER_URL)
+
+  const options: http.RequestOptions = {
+    method: "POST",
+    path: route,
+    headers: {
+      ...headers,
+      "Content-Length": body.length,
+    },
+    timeout: timeoutMs,
+    ...(socketPath ? { socketPath } : { hostname: baseUrl.hostname, port: baseUrl.port }),
+  }
+
+  return new Promise((resolve, reject) => {
+    const req = http.request(options, (res) => {
+      let result = ""
+      res.setEncoding("utf8")
+      res.on("data", (chunk) => {
+        result += chunk
+      })
+      res.on("end", () => {
+        let parsed: any
+        try {
+          parsed = JSON.parse(result)
+        } catch (e) {
+          reject(new Error(`Failed to parse analysis server output: ${result}`))
+          return
+        }
+        if (res.statusCode !== 200) {
+          reject(new Error(`Analysis server returned ${res.statusCode}: ${parsed?.error ?? result}`))
+        } else {
+          resolve(parsed)
+        }
+      })
+    })
+
+    req.on("timeout", () => {
+      req.destroy(new Error(`Analysis server timed out after ${timeoutMs}ms`))
+    })
+    req.on("error", reject)
+    req.write(body)
+    req.end()
+  })
+}
@@ -0,0 +1,350 @@
+"""
+Serveur d'analyse persistant pour l'ATS.
+
+Les modèles (EnhancedATSSystem, CVImageAnalyzer) sont chargés une seule fois au
+démarrage, puis les requêtes JSON sont servies par un pool de workers au lieu de
+lancer un nouveau processus Python à chaque CV.
+
+Usage:
+    python -m lib.analysis_server --host 127.0.0.1 --port 8765
+    python -m lib.analysis_server --socket /tmp/ats-analysis.sock
+
+Endpoints:
+    GET  /health            Le processus répond (toujours 200)
+    GET  /ready             Les modèles sont chargés (200) ou non (503)
+    POST /analyze-cv        {"cv_text": ..., "job_text": ...}
+    POST /analyze-cv-image  {"image_base64": ..., "job_description": ...}
+                            ou corps binaire (Content-Type image/* ou
+                            application/octet-stream) avec l'en-tête
+                            X-Job-Description (encodé en URL)
+    POST /rank-candidates   {"job_text": ..., "cv_texts": [...], "top_k": 20}
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Callable, Dict, Optional
+
+from .model_registry import registry
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+
+def _json_default(obj: Any) -> Any:
+    """Sérialise les types numpy renvoyés par les analyseurs"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type non sérialisable: {type(obj).__name__}")
+
+
+class ServiceUnavailable(Exception):
+    """Les modèles ne sont pas encore chargés ou la file d'attente est pleine"""
+
+
+class AnalysisService:
+    """Détient les modèles chargés et exécute les analyses dans un pool de workers"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, request_timeout: float = 300.0,
+                 load_image_analyzer: bool = True, profile: str = "full"):
+        self.workers = workers
+        self.profile = profile
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.load_image_analyzer = load_image_analyzer
+
+        self.ats_system = None
+        self.image_analyzer = None
+
+        self.started_at = time.time()
+        self.ready = threading.Event()
+        self.load_error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ats-worker")
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "rejected": 0}
+
+    def load_models(self):
+        """Charge les modèles une fois pour toute la durée de vie du processus"""
+        start = time.perf_counter()
+        try:
+            from .enhanced_ats_system import EnhancedATSSystem
+            # Préchargement: le serveur n'est prêt qu'une fois les modèles du profil en mémoire
+            self.ats_system = EnhancedATSSystem(profile=self.profile, preload=True)
+
+            if self.load_image_analyzer:
+                from .cv_image_analyzer import CVImageAnalyzer
+                self.image_analyzer = CVImageAnalyzer()
+
+            self.load_seconds = round(time.perf_counter() - start, 2)
+            self.ready.set()
+            print(f"✅ Modèles chargés en {self.load_seconds}s, serveur prêt")
+        except Exception as e:
+            self.load_error = str(e)
+            traceback.print_exc()
+            print(f"❌ Échec du chargement des modèles: {e}")
+
+    def start_loading(self) -> threading.Thread:
+        """Lance le chargement en arrière-plan pour que /health réponde immédiatement"""
+        thread = threading.Thread(target=self.load_models, name="ats-model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "workers": self.workers,
+            "stats": dict(self.stats),
+        }
+
+    def readiness(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready.is_set(),
+            "profile": self.profile,
+            "load_seconds": self.load_seconds,
+            "models": self.ats_system.loading_report() if self.ats_system else [],
+            "error": self.load_error,
+            "image_analyzer": self.image_analyzer is not None,
+            "memory": registry.memory_report(),
+        }
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def submit(self, func: Callable, *args) -> Any:
+        """Exécute une analyse dans le pool en bornant le nombre de requêtes en attente"""
+        if not self.ready.is_set():
+            raise ServiceUnavailable(self.load_error or "Modèles en cours de chargement")
+        if not self._pending.acquire(blocking=False):
+            self._count("rejected")
+            raise ServiceUnavailable("Trop de requêtes en attente")
+
+        self._count("requests")
+        try:
+            future = self._pool.submit(func, *args)
+        except Exception:
+            self._pending.release()
+            self._count("errors")
+            raise
+        # La place n'est libérée qu'à la fin réelle du job: après un timeout il occupe encore un worker
+        future.add_done_callback(lambda _: self._pending.release())
+        try:
+            return future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            self._count("errors")
+            raise
+        except Exception:
+            self._count("errors")
+            raise
+
+    def analyze_cv(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        cv_text = payload.get("cv_text")
+        job_text = payload.get("job_text")
+        if not cv_text or not job_text:
+            raise ValueError("cv_text et job_text sont requis")
+        return self.submit(self.ats_system.generate_enhanced_ats_score, cv_text, job_text)
+
+    def rank_candidates(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job_text = payload.get("job_text")
+        cv_texts = payload.get("cv_texts")
+        if not job_text or not isinstance(cv_texts, list):
+            raise ValueError("job_text et cv_texts (liste) sont requis")
+        top_k = payload.get("top_k")
+        if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k <= 0):
+            raise ValueError("top_k doit être un entier positif")
+        table = self.submit(self.ats_system.rank_candidates, job_text, cv_texts, 32, top_k)
+        return {"ranking": table.to_dict(orient="records")}
+
+    def analyze_cv_image(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        image_base64 = payload.get("image_base64")
+        job_description = payload.get("job_description")
+        if not image_base64 or not job_description:
+            raise ValueError("image_base64 et job_description sont requis")
+        if self.image_analyzer is None:
+            raise ServiceUnavailable("Analyseur d'images CV non chargé")
+        return self.submit(self.image_analyzer.analyze_cv_base64, image_base64, job_description)
+
+    def analyze_cv_image_bytes(self, image: memoryview, job_description: Optional[str]) -> Dict[str, Any]:
+        """Analyse d'une image reçue en binaire (sans passage par base64)"""
+        if not len(image) or not job_description:
+            raise ValueError("L'image et l'en-tête X-Job-Description sont requis")
+        if self.image_analyzer is None:
+            raise ServiceUnavailable("Analyseur d'images CV non chargé")
+        return self.submit(self.image_analyzer.analyze_cv_image, image, job_description)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """Routage HTTP minimal vers l'AnalysisService"""
+
+    server_version = "ATSAnalysisServer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> AnalysisService:
+        return self.server.service
+
+    def address_string(self) -> str:
+        # Les sockets Unix n'ont pas d'adresse client
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body, default=_json_default, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> memoryview:
+        """Corps de la requête, lu directement dans un seul tampon"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # Le corps n'est pas lu: la connexion ne peut pas être réutilisée
+            self.close_connection = True
+            raise ValueError(f"Requête trop volumineuse ({length} octets)")
+        body = memoryview(bytearray(length))
+        received = 0
+        while received < length:
+            count = self.rfile.readinto(body[received:])
+            if not count:
+                self.close_connection = True
+                raise ValueError("Corps de requête incomplet")
+            received += count
+        return body
+
+    def _is_binary(self) -> bool:
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        return content_type.startswith("image/") or content_type == "application/octet-stream"
+
+    def _read_json(self) -> Dict[str, Any]:
+        raw = self._read_body()
+        payload = json.loads(str(raw, "utf-8")) if len(raw) else {}
+        if not isinstance(payload, dict):
+            raise ValueError("Le corps de la requête doit être un objet JSON")
+        return payload
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.health())
+        elif self.path == "/ready":
+            readiness = self.service.readiness()
+            self._send_json(200 if readiness["ready"] else 503, readiness)
+        else:
+            self._send_json(404, {"error": f"Route inconnue: {self.path}"})
+
+    def do_POST(self):
+        routes = {
+            "/analyze-cv": self.service.analyze_cv,
+            "/analyze-cv-image": self.service.analyze_cv_image,
+            "/rank-candidates": self.service.rank_candidates,
+        }
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Route inconnue: {self.path}"})
+            return
+
+        try:
+            if self.path == "/analyze-cv-image" and self._is_binary():
+                job_description = urllib.parse.unquote(self.headers.get("X-Job-Description") or "")
+                self._send_json(200, self.service.analyze_cv_image_bytes(self._read_body(), job_description))
+                return
+            payload = self._read_json()
+            self._send_json(200, handler(payload))
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+        except ServiceUnavailable as e:
+            self._send_json(503, {"error": str(e)})
+        except FutureTimeoutError:
+            self._send_json(504, {"error": "Délai d'analyse dépassé"})
+        except Exception as e:
+            traceback.print_exc()
+            self._send_json(500, {"error": str(e)})
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """Équivalent de ThreadingHTTPServer sur une socket Unix locale"""
+
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def create_server(service: AnalysisService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  socket_path: Optional[str] = None):
+    """Crée le serveur HTTP (TCP ou socket Unix) associé au service"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, AnalysisRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serveur d'analyse ATS persistant")
+    parser.add_argument("--host", default=os.environ.get("ATS_ANALYSIS_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ATS_ANALYSIS_PORT", DEFAULT_PORT)))
+    parser.add_argument("--socket", dest="socket_path", default=os.environ.get("ATS_ANALYSIS_SOCKET"),
+                        help="Chemin d'une socket Unix (prioritaire sur --host/--port)")
+    parser.add_argument("--workers", type=int, default=2, help="Nombre d'analyses simultanées")
+    parser.add_argument("--max-pending", type=int, default=32, help="Requêtes en attente avant rejet (503)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Délai maximal par analyse (secondes)")
+    parser.add_argument("--profile", default=os.environ.get("ATS_SCORING_PROFILE", "full"),
+                        help="Profil de scoring (fast, standard, full)")
+    parser.add_argument("--no-image-analyzer", action="store_true", help="Ne pas charger CVImageAnalyzer")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    service = AnalysisService(
+        workers=args.workers,
+        max_pending=args.max_pending,
+        request_timeout=args.timeout,
+        load_image_analyzer=not args.no_image_analyzer,
+        profile=args.profile,
+    )
+    server = create_server(service, args.host, args.port, args.socket_path)
+    service.start_loading()
+
+    where = args.socket_path or f"http://{args.host}:{args.port}"
+    print(f"🚀 Serveur d'analyse ATS en écoute sur {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Arrêt du serveur d'analyse")
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.socket_path and os.path.exists(args.socket_path):
+            os.unlink(args.socket_path)
+
+
+if __name__ == "__main__":
+    main()
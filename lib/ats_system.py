@@ -1,71 +1,38 @@
-import spacy
-import torch
-from transformers import (
-    AutoTokenizer, AutoModel, AutoModelForSequenceClassification,
-    pipeline, BertTokenizer, BertModel
-)
-from sentence_transformers import SentenceTransformer
 import pandas as pd
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
 import re
 import json
 from typing import Dict, List, Tuple, Any
 import warnings
+from .embeddings import embed_chunked
+from .job_analysis_cache import JobAnalysisCache
+from .scoring_profiles import LazyModelsMixin, weighted_score
+from .tfidf_corpus import shared_corpus
+
 warnings.filterwarnings('ignore')
 
-class ATSSystem:
-    def __init__(self):
+class ATSSystem(LazyModelsMixin):
+    SUPPORTED_STAGES = frozenset({"regex", "tfidf", "sentence", "bert", "spacy", "sentiment", "zero_shot", "tech_ner"})
+
+    def __init__(self, profile: str = "full", preload: bool = False, use_job_cache: bool = True):
         """
-        Initialise le système ATS avec tous les modèles nécessaires
+        Initialise le système ATS avec le profil de scoring choisi.
+        Les modèles sont chargés à la première utilisation de leur étape
+        (preload=True pour tout charger immédiatement). Les analyses d'offres
+        sont persistées et réutilisées entre processus (use_job_cache).
         """
         print("🚀 Initialisation du système ATS...")
-        
-        # Chargement des modèles SpaCy
-        try:
-            self.nlp_fr = spacy.load("fr_core_news_sm")
-        except:
-            print("⚠️ Modèle français non trouvé, utilisation du modèle anglais")
-            self.nlp_fr = spacy.load("en_core_web_sm")
-            
-        self.nlp_en = spacy.load("en_core_web_sm")
-        
-        # Modèles BERT et transformers
-        self.bert_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-        self.bert_model = BertModel.from_pretrained('bert-base-uncased')
-        
-        # Sentence Transformers pour les embeddings sémantiques
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Pipeline pour l'analyse de sentiment
-        self.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest"
-        )
-        
-        # Pipeline pour la classification de texte
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli"
-        )
-        
-        # Modèle pour l'extraction d'entités techniques
-        self.tech_ner = pipeline(
-            "ner",
-            model="dslim/bert-base-NER",
-            aggregation_strategy="simple"
-        )
-        
-        print("✅ Tous les modèles sont chargés avec succès!")
+        self._init_models(profile, preload=preload)
+        self.job_cache = JobAnalysisCache(self.analysis_version()) if use_job_cache else None
+        # IDF du corpus enregistré (offres et CV), partagé par tous les processus
+        self.tfidf_corpus = shared_corpus
+        print("✅ Système ATS prêt!")
 
     def extract_entities_spacy(self, text: str, language: str = "fr") -> Dict[str, List[str]]:
         """
         Extraction d'entités nommées avec SpaCy
         """
-        nlp = self.nlp_fr if language == "fr" else self.nlp_en
-        doc = nlp(text)
-        
         entities = {
             "PERSON": [],
             "ORG": [],
@@ -76,9 +43,12 @@ class ATSSystem:
             "TECHNOLOGIES": []
         }
         
-        for ent in doc.ents:
-            if ent.label_ in entities:
-                entities[ent.label_].append(ent.text.strip())
+        if self.uses("spacy"):
+            nlp = self.nlp_fr if language == "fr" else self.nlp_en
+            doc = nlp(text)
+            for ent in doc.ents:
+                if ent.label_ in entities:
+                    entities[ent.label_].append(ent.text.strip())
         
         # Extraction de compétences techniques avec regex
         tech_patterns = [
@@ -100,19 +70,18 @@ class ATSSystem:
         """
         Extraction d'embeddings BERT
         """
-        inputs = self.bert_tokenizer(
-            text, 
-            return_tensors='pt', 
-            max_length=512, 
-            truncation=True, 
-            padding=True
+        return self.extract_bert_embeddings_many([text])[0]
+
+    def extract_bert_embeddings_many(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Extraction d'embeddings BERT par lots (une ligne par texte, dans l'ordre).
+        Les CV longs sont découpés en fenêtres chevauchantes (au plus
+        EMBEDDING_MAX_CHUNKS par texte) agrégées selon EMBEDDING_POOLING.
+        """
+        return embed_chunked(
+            texts, self.bert_tokenizer, self.bert_model,
+            max_chunks=self.EMBEDDING_MAX_CHUNKS, pooling=self.EMBEDDING_POOLING, batch_size=batch_size
         )
-        
-        with torch.no_grad():
-            outputs = self.bert_model(**inputs)
-            embeddings = outputs.last_hidden_state.mean(dim=1)
-            
-        return embeddings.numpy().flatten()
 
     def extract_sentence_embeddings(self, text: str) -> np.ndarray:
         """
@@ -140,33 +109,36 @@ class ATSSystem:
             extracted_skills[category] = list(set(matches))
         
         # Extraction avec le modèle NER technique
-        try:
-            tech_entities = self.tech_ner(text)
-            tech_skills = [ent['word'] for ent in tech_entities if ent['entity_group'] in ['MISC', 'ORG']]
-            extracted_skills['technical_entities'] = list(set(tech_skills))
-        except:
-            extracted_skills['technical_entities'] = []
+        extracted_skills['technical_entities'] = []
+        if self.uses("tech_ner"):
+            try:
+                tech_entities = self.tech_ner(text)
+                tech_skills = [ent['word'] for ent in tech_entities if ent['entity_group'] in ['MISC', 'ORG']]
+                extracted_skills['technical_entities'] = list(set(tech_skills))
+            except:
+                pass
         
         return extracted_skills
 
     def analyze_job_posting(self, job_text: str) -> Dict[str, Any]:
         """
-        Analyse complète d'une offre d'emploi
+        Analyse complète d'une offre d'emploi (mise en cache par texte d'offre)
         """
-        analysis = {
-            "entities": self.extract_entities_spacy(job_text),
-            "skills": self.extract_skills_and_requirements(job_text),
-            "bert_embedding": self.extract_bert_embeddings(job_text),
-            "sentence_embedding": self.extract_sentence_embeddings(job_text),
-            "sentiment": self.sentiment_analyzer(job_text[:512])[0],
-            "text_length": len(job_text),
-            "raw_text": job_text
-        }
+        if self.job_cache is not None:
+            cached = self.job_cache.get(job_text)
+            if cached is not None:
+                return cached
+        
+        analysis = self._analyze_text(job_text)
         
         # Classification du niveau d'expérience requis
-        experience_labels = ["junior", "mid-level", "senior", "executive"]
-        exp_classification = self.classifier(job_text, experience_labels)
-        analysis["experience_level"] = exp_classification
+        analysis["experience_level"] = None
+        if self.uses("zero_shot"):
+            experience_labels = ["junior", "mid-level", "senior", "executive"]
+            analysis["experience_level"] = self.classifier(job_text, experience_labels)
+        
+        if self.job_cache is not None:
+            self.job_cache.put(job_text, analysis)
         
         return analysis
 
@@ -174,17 +146,21 @@ class ATSSystem:
         """
         Analyse complète d'un CV
         """
-        analysis = {
-            "entities": self.extract_entities_spacy(cv_text),
-            "skills": self.extract_skills_and_requirements(cv_text),
-            "bert_embedding": self.extract_bert_embeddings(cv_text),
-            "sentence_embedding": self.extract_sentence_embeddings(cv_text),
-            "sentiment": self.sentiment_analyzer(cv_text[:512])[0],
-            "text_length": len(cv_text),
-            "raw_text": cv_text
+        return self._analyze_text(cv_text)
+
+    def _analyze_text(self, text: str) -> Dict[str, Any]:
+        """
+        Analyse commune aux CV et aux offres, limitée aux étapes du profil
+        """
+        return {
+            "entities": self.extract_entities_spacy(text),
+            "skills": self.extract_skills_and_requirements(text),
+            "bert_embedding": self.extract_bert_embeddings(text) if self.uses("bert") else None,
+            "sentence_embedding": self.extract_sentence_embeddings(text) if self.uses("sentence") else None,
+            "sentiment": self.sentiment_analyzer(text[:512])[0] if self.uses("sentiment") else None,
+            "text_length": len(text),
+            "raw_text": text
         }
-        
-        return analysis
 
     def calculate_similarity_scores(self, cv_analysis: Dict, job_analysis: Dict) -> Dict[str, float]:
         """
@@ -193,24 +169,24 @@ class ATSSystem:
         scores = {}
         
         # Similarité BERT
-        bert_similarity = cosine_similarity(
-            cv_analysis["bert_embedding"].reshape(1, -1),
-            job_analysis["bert_embedding"].reshape(1, -1)
-        )[0][0]
-        scores["bert_similarity"] = float(bert_similarity)
+        if cv_analysis.get("bert_embedding") is not None and job_analysis.get("bert_embedding") is not None:
+            bert_similarity = cosine_similarity(
+                cv_analysis["bert_embedding"].reshape(1, -1),
+                job_analysis["bert_embedding"].reshape(1, -1)
+            )[0][0]
+            scores["bert_similarity"] = float(bert_similarity)
         
         # Similarité Sentence Transformers
-        sentence_similarity = cosine_similarity(
-            cv_analysis["sentence_embedding"].reshape(1, -1),
-            job_analysis["sentence_embedding"].reshape(1, -1)
-        )[0][0]
-        scores["sentence_similarity"] = float(sentence_similarity)
+        if cv_analysis.get("sentence_embedding") is not None and job_analysis.get("sentence_embedding") is not None:
+            sentence_similarity = cosine_similarity(
+                cv_analysis["sentence_embedding"].reshape(1, -1),
+                job_analysis["sentence_embedding"].reshape(1, -1)
+            )[0][0]
+            scores["sentence_similarity"] = float(sentence_similarity)
         
         # Similarité TF-IDF
-        vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-        tfidf_matrix = vectorizer.fit_transform([cv_analysis["raw_text"], job_analysis["raw_text"]])
-        tfidf_similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-        scores["tfidf_similarity"] = float(tfidf_similarity)
+        if self.uses("tfidf"):
+            scores["tfidf_similarity"] = self.tfidf_corpus.similarity(cv_analysis["raw_text"], job_analysis["raw_text"])
         
         return scores
 
@@ -262,12 +238,8 @@ class ATSSystem:
         
         skill_average = np.mean(list(skill_matches.values())) if skill_matches else 0.0
         
-        ats_score = (
-            similarity_scores["bert_similarity"] * weights["bert_similarity"] +
-            similarity_scores["sentence_similarity"] * weights["sentence_similarity"] +
-            similarity_scores["tfidf_similarity"] * weights["tfidf_similarity"] +
-            skill_average * weights["skill_average"]
-        ) * 100
+        # Les poids sont renormalisés sur les similarités calculées par le profil
+        ats_score = weighted_score({**similarity_scores, "skill_average": skill_average}, weights)
         
         return {
             "ats_score": round(ats_score, 2),
@@ -306,7 +278,7 @@ class ATSSystem:
         if len(cv_analysis["raw_text"]) < 500:
             recommendations.append("Développer davantage le contenu du CV pour plus de détails")
         
-        if cv_analysis["sentiment"]["label"] == "NEGATIVE":
+        if cv_analysis["sentiment"] and cv_analysis["sentiment"]["label"] == "NEGATIVE":
             recommendations.append("Utiliser un langage plus positif dans le CV")
         
         return recommendations[:5]  # Limiter à 5 recommandations
@@ -0,0 +1,297 @@
+"""
+Import en masse de CV pour une offre d'emploi.
+
+    python -m lib.bulk_import <dossier ou archive.zip> --job-id 3
+
+Le texte des CV est extrait dans des processus séparés, les embeddings sont
+calculés par lots et les candidats insérés par transaction (un lot = une
+transaction). Chaque fichier traité est noté dans la table
+bulk_import_items dans la même transaction que son insertion: une commande
+interrompue reprend là où elle s'était arrêtée.
+"""
+import argparse
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .candidate_index import CandidateIndex, default_index_path
+from .cv_store import DEFAULT_UPLOAD_DIR, CVStore
+from .database import DEFAULT_DB_PATH, Database
+from .document_extraction import EXTRACTION_VERSION, extract_document
+from .embedding_store import DEFAULT_EMBEDDING_DTYPE, encode_embedding
+from .embeddings import DOCUMENT_EMBEDDING_DIM, DOCUMENT_EMBEDDING_VERSION, embed_documents
+from .job_analysis_cache import JobAnalysisCache
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_PATTERN = re.compile(r"(?:\+33\s?|0)[1-9](?:[\s.-]?\d{2}){4}")
+
+# Statuts définitifs: ces fichiers ne sont pas retraités à la reprise
+DONE_STATUSES = ("imported", "duplicate")
+
+
+def list_source_items(source: str) -> List[str]:
+    """Fichiers PDF/DOCX d'un dossier (chemins relatifs) ou d'une archive zip, triés"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    else:
+        names = []
+        for root, _, files in os.walk(source):
+            for filename in files:
+                names.append(os.path.relpath(os.path.join(root, filename), source))
+    return sorted(name for name in names if name.lower().endswith(SUPPORTED_EXTENSIONS))
+
+
+# --- Processus d'extraction -------------------------------------------
+
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(source: str, upload_dir: str, db_path: str):
+    _worker_state["source"] = source
+    _worker_state["archive"] = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+    _worker_state["store"] = CVStore(upload_dir, db_path)
+
+
+def _extract_item(item: str) -> Dict[str, Any]:
+    """Lit, enregistre et extrait un CV (exécuté dans un processus du pool)"""
+    try:
+        archive = _worker_state["archive"]
+        if archive is not None:
+            data = archive.read(item)
+        else:
+            with open(os.path.join(_worker_state["source"], item), "rb") as f:
+                data = f.read()
+
+        store = _worker_state["store"]
+        stored = store.store(data, os.path.basename(item))
+        text = store.get_or_compute(
+            stored.sha256, "text", EXTRACTION_VERSION,
+            lambda: extract_document(data, filename=item, workers=1).text
+        )
+        if not text or not text.strip():
+            return {"item": item, "sha256": stored.sha256, "error": "Aucun texte extrait"}
+        return {"item": item, "sha256": stored.sha256, "path": stored.path, "text": text}
+    except Exception as e:
+        return {"item": item, "sha256": None, "error": f"{type(e).__name__}: {e}"}
+
+
+# --- Import -------------------------------------------------------------
+
+def candidate_name(item: str) -> str:
+    """Nom lisible déduit du nom de fichier (cv_jean_dupont.pdf -> Jean Dupont)"""
+    stem = os.path.splitext(os.path.basename(item))[0]
+    stem = re.sub(r"(?i)^(cv|resume)[\s_-]*", "", stem)
+    return re.sub(r"[\s_-]+", " ", stem).strip().title() or stem
+
+
+class BulkImporter:
+    """Importe les CV d'un dossier ou d'une archive pour une offre"""
+
+    def __init__(self, source: str, job_id: int, db_path: str = DEFAULT_DB_PATH,
+                 upload_dir: str = DEFAULT_UPLOAD_DIR, workers: Optional[int] = None,
+                 batch_size: int = 64, update_index: bool = True):
+        self.source = os.path.abspath(source)
+        self.job_id = job_id
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.db = Database(db_path)
+        # Colonnes d'embeddings, triggers de statistiques et table des points de reprise
+        self.db.init_schema()
+        self.store = CVStore(upload_dir, db=self.db)
+        self.embedding_dtype = DEFAULT_EMBEDDING_DTYPE
+        self.index = CandidateIndex.load(DOCUMENT_EMBEDDING_DIM, default_index_path(db_path)) if update_index else None
+
+    def pending_items(self) -> List[str]:
+        """Fichiers de la source pas encore importés pour cette offre"""
+        done = {
+            row[0] for row in self.db.fetchall(
+                f"SELECT item FROM bulk_import_items WHERE source = ? AND job_id = ? "
+                f"AND status IN ({','.join('?' * len(DONE_STATUSES))})",
+                (self.source, self.job_id, *DONE_STATUSES)
+            )
+        }
+        return [item for item in list_source_items(self.source) if item not in done]
+
+    def job_embedding(self) -> np.ndarray:
+        row = self.db.fetchone("SELECT description FROM jobs WHERE id = ?", (self.job_id,))
+        if row is None:
+            raise ValueError(f"Offre d'emploi introuvable: {self.job_id}")
+        analysis = JobAnalysisCache(DOCUMENT_EMBEDDING_VERSION, db=self.db).get_or_compute(
+            row[0], lambda text: {"embedding": embed_documents([text])[0]}
+        )
+        return analysis["embedding"]
+
+    def _embeddings(self, results: List[Dict[str, Any]]) -> np.ndarray:
+        """Embeddings des CV du lot: cache par empreinte, les autres en un passage"""
+        embeddings = np.zeros((len(results), DOCUMENT_EMBEDDING_DIM), dtype=np.float32)
+        missing = []
+        for row, result in enumerate(results):
+            cached = self.store.get(result["sha256"], "embedding", DOCUMENT_EMBEDDING_VERSION)
+            if cached is None:
+                missing.append(row)
+            else:
+                embeddings[row] = cached
+        if missing:
+            computed = embed_documents([results[row]["text"] for row in missing])
+            for row, embedding in zip(missing, computed):
+                embeddings[row] = embedding
+                self.store.put(results[row]["sha256"], "embedding", DOCUMENT_EMBEDDING_VERSION, embedding)
+        return embeddings
+
+    def _flush(self, batch: List[Dict[str, Any]], job_embedding: np.ndarray) -> Dict[str, int]:
+        """Score et insère un lot en une transaction, avec ses points de reprise"""
+        checkpoints = [
+            (self.source, result["item"], self.job_id, "failed", None, result["sha256"], result["error"])
+            for result in batch if "error" in result
+        ]
+        results = [result for result in batch if "error" not in result]
+
+        rows = []
+        embeddings = np.zeros((0, DOCUMENT_EMBEDDING_DIM), dtype=np.float32)
+        if results:
+            embeddings = self._embeddings(results)
+            # Même score que le formulaire « Postuler »: similarité cosinus x 100
+            norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(job_embedding)
+            scores = np.clip(embeddings @ job_embedding / np.maximum(norms, 1e-12) * 100, 0, 100)
+            for result, score in zip(results, scores):
+                email = EMAIL_PATTERN.search(result["text"])
+                phone = PHONE_PATTERN.search(result["text"])
+                rows.append({
+                    "result": result,
+                    # email est UNIQUE NOT NULL: adresse de substitution si le CV n'en contient pas
+                    "email": email.group(0).lower() if email else f"cv-{result['sha256'][:16]}@import.invalid",
+                    "phone": phone.group(0) if phone else None,
+                    "score": float(score),
+                })
+
+        inserted_ids: List[int] = []
+        inserted_rows: List[int] = []
+        with self.db.transaction() as conn:
+            emails = [row["email"] for row in rows]
+            existing = set()
+            for start in range(0, len(emails), 500):
+                chunk = emails[start:start + 500]
+                existing.update(r[0] for r in conn.execute(
+                    f"SELECT email FROM candidates WHERE email IN ({','.join('?' * len(chunk))})", chunk
+                ))
+
+            to_insert = []
+            for position, row in enumerate(rows):
+                if row["email"] in existing:
+                    checkpoints.append((self.source, row["result"]["item"], self.job_id, "duplicate", None,
+                                        row["result"]["sha256"], f"Email déjà enregistré: {row['email']}"))
+                    continue
+                existing.add(row["email"])
+                to_insert.append(position)
+
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM candidates").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO candidates (name, email, phone, cv_path, job_id, cv_match_score, status, "
+                "cv_embedding, cv_embedding_dtype, cv_embedding_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (candidate_name(rows[p]["result"]["item"]), rows[p]["email"], rows[p]["phone"],
+                     rows[p]["result"]["path"], self.job_id, rows[p]["score"], "En attente",
+                     encode_embedding(embeddings[p], self.embedding_dtype), self.embedding_dtype,
+                     DOCUMENT_EMBEDDING_VERSION)
+                    for p in to_insert
+                ]
+            )
+            # Le verrou d'écriture est tenu depuis BEGIN IMMEDIATE: ces lignes sont les nôtres, dans l'ordre
+            inserted_ids = [r[0] for r in conn.execute("SELECT id FROM candidates WHERE id > ? ORDER BY id", (last_id,))]
+            inserted_rows = to_insert
+            for position, candidate_id in zip(to_insert, inserted_ids):
+                result = rows[position]["result"]
+                checkpoints.append((self.source, result["item"], self.job_id, "imported", candidate_id, result["sha256"], None))
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO bulk_import_items (source, item, job_id, status, candidate_id, sha256, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                checkpoints
+            )
+
+        if self.index is not None and inserted_ids:
+            self.index.add_many(inserted_ids, embeddings[inserted_rows])
+
+        return {
+            "imported": len(inserted_ids),
+            "duplicate": len(rows) - len(inserted_ids),
+            "failed": len(batch) - len(results),
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """Importe tous les fichiers en attente et renvoie les compteurs"""
+        items = self.pending_items()
+        totals = {"imported": 0, "duplicate": 0, "failed": 0}
+        if not items:
+            print("✅ Rien à importer (tous les fichiers ont déjà été traités)")
+            return dict(totals, seconds=0.0, cvs_per_second=0.0)
+
+        job_embedding = self.job_embedding()
+        print(f"📥 Import de {len(items)} CV pour l'offre {self.job_id} ({self.workers} processus)...")
+
+        start = time.perf_counter()
+        processed = 0
+        batch: List[Dict[str, Any]] = []
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.source, self.upload_dir, self.db_path),
+        ) as pool:
+            for result in pool.map(_extract_item, items, chunksize=4):
+                batch.append(result)
+                if len(batch) >= self.batch_size:
+                    counts = self._flush(batch, job_embedding)
+                    processed += len(batch)
+                    batch = []
+                    for key, value in counts.items():
+                        totals[key] += value
+                    elapsed = time.perf_counter() - start
+                    print(f"  {processed}/{len(items)} CV traités ({processed / elapsed:.1f} CV/s)")
+            if batch:
+                counts = self._flush(batch, job_embedding)
+                processed += len(batch)
+                for key, value in counts.items():
+                    totals[key] += value
+
+        if self.index is not None:
+            # Hors du chemin des candidatures: le k-means ne tourne qu'ici ou via python -m lib.candidate_index
+            if self.index.needs_training():
+                self.index.train()
+            self.index.save()
+
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"✅ {totals['imported']} importés, {totals['duplicate']} doublons, {totals['failed']} échecs "
+              f"en {elapsed:.1f}s ({rate:.1f} CV/s)")
+        return dict(totals, seconds=round(elapsed, 3), cvs_per_second=round(rate, 2))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Import en masse de CV pour une offre d'emploi")
+    parser.add_argument("source", help="Dossier de CV ou archive .zip (PDF et DOCX)")
+    parser.add_argument("--job-id", type=int, required=True, help="Identifiant de l'offre dans la table jobs")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite")
+    parser.add_argument("--upload-dir", default=DEFAULT_UPLOAD_DIR, help="Dossier de stockage des CV")
+    parser.add_argument("--workers", type=int, default=None, help="Processus d'extraction (défaut: nombre de CPU)")
+    parser.add_argument("--batch-size", type=int, default=64, help="CV par lot d'embeddings et par transaction")
+    parser.add_argument("--no-index", action="store_true", help="Ne pas mettre à jour l'index des profils")
+    args = parser.parse_args(argv)
+
+    importer = BulkImporter(
+        args.source, args.job_id, db_path=args.db, upload_dir=args.upload_dir,
+        workers=args.workers, batch_size=args.batch_size, update_index=not args.no_index
+    )
+    importer.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Index de plus proches voisins approché (IVF) sur les embeddings de CV.
+
+Permet de retrouver les meilleurs profils de toute la base pour une offre
+sans re-scorer chaque CV. Les vecteurs sont normalisés (similarité cosinus =
+produit scalaire) et répartis en listes inversées autour de centroïdes
+k-means; une recherche ne parcourt que les nprobe listes les plus proches.
+
+Persistance: un instantané .npz à côté de ats_database.db, plus un journal
+binaire des ajouts récents, compacté périodiquement dans l'instantané.
+Plusieurs processus (application, import en masse) partagent ces fichiers:
+ajouts au journal et compaction se font sous un verrou exclusif (fcntl), et
+la compaction rejoue d'abord le journal pour ne perdre aucun ajout.
+
+Le k-means ne tourne jamais lors d'un ajout: il est lancé par l'import en
+masse ou à la main (tant qu'il n'a pas tourné, la recherche est exacte):
+
+    python -m lib.candidate_index --train
+"""
+import argparse
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .database import DEFAULT_DB_PATH
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: pas de verrou entre processus (un seul écrivain à la fois)
+    fcntl = None
+
+# En dessous de ce nombre de vecteurs, la recherche exacte est plus rapide que l'IVF
+MIN_TRAIN_SIZE = 2048
+# Nombre d'ajouts journalisés avant compaction automatique
+COMPACT_EVERY = 2000
+# Capacité initiale des tableaux (doublée quand elle est atteinte)
+INITIAL_CAPACITY = 1024
+
+
+def default_index_path(db_path: str = DEFAULT_DB_PATH) -> str:
+    """Chemin de l'index, dans le même dossier que la base SQLite"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "ats_candidate_index.npz")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """K-means sur vecteurs normalisés (affectation par produit scalaire maximal)"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        for cluster in range(k):
+            members = data[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+            else:
+                # Cluster vide: réinitialisé sur un point au hasard
+                centroids[cluster] = data[rng.integers(len(data))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class CandidateIndex:
+    """Index IVF incrémental des embeddings de CV, identifiés par candidate_id"""
+
+    def __init__(self, dim: int, path: Optional[str] = None, nprobe: int = 16):
+        self.dim = dim
+        self.path = path or default_index_path()
+        self.log_path = os.path.splitext(self.path)[0] + ".log"
+        self.lock_path = os.path.splitext(self.path)[0] + ".lock"
+        self.nprobe = nprobe
+
+        # Tableaux préalloués: seules les size premières lignes sont valides
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._size = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+
+        self._positions = {}
+        self._lists: Optional[List[np.ndarray]] = None
+        self._log_offset = 0
+        self._snapshot_mtime: Optional[int] = None
+        self._lock = threading.RLock()
+        self._file_lock_depth = 0
+
+    # --- Construction -------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    @property
+    def assignments(self) -> np.ndarray:
+        return self._assignments[:self._size]
+
+    def _reserve(self, size: int):
+        """Agrandit les tableaux (capacité doublée) pour contenir size lignes"""
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, INITIAL_CAPACITY)
+        for name, shape, dtype in (
+            ("_ids", (capacity,), np.int64),
+            ("_vectors", (capacity, self.dim), np.float32),
+            ("_assignments", (capacity,), np.int32),
+        ):
+            grown = np.empty(shape, dtype=dtype)
+            grown[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, grown)
+
+    def _set_rows(self, ids: np.ndarray, vectors: np.ndarray, assignments: np.ndarray):
+        """Remplace tout le contenu de l'index"""
+        self._size = 0
+        self._reserve(len(ids))
+        self._ids[:len(ids)] = ids
+        self._vectors[:len(ids)] = vectors
+        self._assignments[:len(ids)] = assignments
+        self._size = len(ids)
+        self._positions = {cid: i for i, cid in enumerate(self.ids.tolist())}
+        self._lists = None
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _append(self, ids: np.ndarray, vectors: np.ndarray):
+        """Ajoute ou remplace des vecteurs déjà normalisés"""
+        new_rows = []
+        for candidate_id, vector in zip(ids.tolist(), vectors):
+            position = self._positions.get(candidate_id)
+            if position is not None:
+                self._vectors[position] = vector
+                self._assignments[position] = self._assign(vector[None, :])[0]
+            else:
+                new_rows.append((candidate_id, vector))
+
+        if new_rows:
+            new_vectors = np.stack([row[1] for row in new_rows]).astype(np.float32)
+            start = self._size
+            end = start + len(new_rows)
+            self._reserve(end)
+            self._ids[start:end] = [row[0] for row in new_rows]
+            self._vectors[start:end] = new_vectors
+            self._assignments[start:end] = self._assign(new_vectors)
+            self._size = end
+            for offset, (candidate_id, _) in enumerate(new_rows):
+                self._positions[candidate_id] = start + offset
+        self._lists = None
+
+    def add_many(self, candidate_ids: Iterable[int], vectors: np.ndarray, persist: bool = True):
+        """Ajoute (ou met à jour) des CV; les ajouts sont journalisés sur disque"""
+        ids = np.asarray(list(candidate_ids), dtype=np.int64)
+        vectors = _normalize(np.asarray(vectors).reshape(len(ids), self.dim))
+        with self._lock:
+            self._append(ids, vectors)
+            if persist:
+                with self._file_lock():
+                    self._write_log(ids, vectors)
+                    if self._pending_log_records() >= COMPACT_EVERY:
+                        self._compact()
+
+    def add(self, candidate_id: int, vector: np.ndarray, persist: bool = True):
+        self.add_many([candidate_id], np.asarray(vector).reshape(1, -1), persist=persist)
+
+    def remove(self, candidate_id: int) -> bool:
+        """Retire un CV de l'index (l'instantané est réécrit)"""
+        with self._file_lock():
+            # Journal rejoué d'abord: la compaction ne doit pas faire revenir le CV retiré
+            self.refresh()
+            position = self._positions.get(candidate_id)
+            if position is None:
+                return False
+            keep = np.ones(self._size, dtype=bool)
+            keep[position] = False
+            self._set_rows(self.ids[keep], self.vectors[keep], self.assignments[keep])
+            self._write_snapshot()
+            return True
+
+    def needs_training(self) -> bool:
+        """Vrai si la base a fortement grossi depuis le dernier k-means"""
+        return self._size >= MIN_TRAIN_SIZE and (self.centroids is None or self._size >= 4 * self.trained_size)
+
+    def train(self, iterations: int = 10, sample_size: int = 50000):
+        """
+        Calcule les centroïdes (environ sqrt(n) listes), réaffecte tous les vecteurs et écrit l'instantané
+
+        Le k-means tourne hors du verrou entre processus, sur l'état courant;
+        les ajouts faits pendant ce temps sont rejoués puis affectés aux
+        nouveaux centroïdes.
+        """
+        with self._lock:
+            self.refresh()
+            n = self._size
+            if n < MIN_TRAIN_SIZE:
+                return
+            nlist = max(1, int(np.sqrt(n)))
+            rng = np.random.default_rng(0)
+            sample = self.vectors if n <= sample_size else self.vectors[rng.choice(n, sample_size, replace=False)]
+            print(f"🧭 Entraînement de l'index IVF ({nlist} listes sur {n} CV)...")
+            centroids = spherical_kmeans(sample, nlist, iterations=iterations)
+
+            with self._file_lock():
+                self.refresh()
+                self.centroids = centroids
+                self._assignments[:self._size] = self._assign(self.vectors)
+                self.trained_size = n
+                self._lists = None
+                self._write_snapshot()
+
+    def _inverted_lists(self) -> List[np.ndarray]:
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            counts = np.bincount(self.assignments[order], minlength=len(self.centroids))
+            self._lists = np.split(order, np.cumsum(counts)[:-1])
+        return self._lists
+
+    # --- Recherche ----------------------------------------------------
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Les k CV les plus proches de la requête
+
+        Returns:
+            Liste de (candidate_id, similarité cosinus), par similarité décroissante
+        """
+        with self._lock:
+            self.refresh()
+            if self._size == 0:
+                return []
+            query = _normalize(np.asarray(query).reshape(-1))
+
+            untrained = self.centroids is None or bool((self.assignments < 0).any())
+            if untrained:
+                rows = np.arange(self._size)
+            else:
+                probes = min(nprobe or self.nprobe, len(self.centroids))
+                closest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+                lists = self._inverted_lists()
+                rows = np.concatenate([lists[c] for c in closest])
+                if len(rows) < k:
+                    rows = np.arange(self._size)
+
+            scores = self.vectors[rows] @ query
+            k = min(k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(int(self.ids[rows[i]]), float(scores[i])) for i in best]
+
+    # --- Persistance --------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        """Verrou exclusif entre processus sur le journal et l'instantané (réentrant dans ce processus)"""
+        with self._lock:
+            if fcntl is None or self._file_lock_depth:
+                self._file_lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._file_lock_depth -= 1
+                return
+            with open(self.lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                self._file_lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._file_lock_depth -= 1
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @property
+    def _record_dtype(self) -> np.dtype:
+        return np.dtype([("id", "<i8"), ("vector", "<f4", (self.dim,))])
+
+    def _pending_log_records(self) -> int:
+        if not os.path.exists(self.log_path):
+            return 0
+        return os.path.getsize(self.log_path) // self._record_dtype.itemsize
+
+    def _write_log(self, ids: np.ndarray, vectors: np.ndarray):
+        # Le décalage de lecture n'avance pas: refresh() rejouera aussi ces
+        # enregistrements, sans effet puisqu'un ajout remplace par candidate_id
+        records = np.empty(len(ids), dtype=self._record_dtype)
+        records["id"] = ids
+        records["vector"] = vectors
+        with open(self.log_path, "ab") as f:
+            f.write(records.tobytes())
+
+    def _current_snapshot_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Rejoue les ajouts journalisés (par ce processus ou d'autres) depuis la dernière lecture"""
+        with self._lock:
+            if self._current_snapshot_mtime() != self._snapshot_mtime:
+                # Instantané réécrit (et journal vidé) par un autre processus
+                self._reload()
+                return
+            if not os.path.exists(self.log_path):
+                return
+            record_dtype = self._record_dtype
+            size = os.path.getsize(self.log_path)
+            if size < self._log_offset:
+                self._reload()
+                return
+            if size == self._log_offset:
+                return
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read(((size - self._log_offset) // record_dtype.itemsize) * record_dtype.itemsize)
+            records = np.frombuffer(data, dtype=record_dtype)
+            if len(records):
+                self._append(records["id"], records["vector"])
+                self._log_offset += len(data)
+
+    def _reload(self):
+        fresh = CandidateIndex.load(self.dim, self.path, self.nprobe)
+        self.__dict__.update({
+            key: value for key, value in fresh.__dict__.items() if key not in ("_lock", "_file_lock_depth")
+        })
+
+    def _write_snapshot(self):
+        """Écrit l'instantané (écriture atomique) et vide le journal; appelé sous le verrou de fichier"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=self.ids,
+                vectors=self.vectors,
+                assignments=self.assignments,
+                centroids=self.centroids if self.centroids is not None else np.zeros((0, self.dim), dtype=np.float32),
+                trained_size=np.array(self.trained_size),
+            )
+        os.replace(tmp_path, self.path)
+        open(self.log_path, "wb").close()
+        self._log_offset = 0
+        self._snapshot_mtime = self._current_snapshot_mtime()
+
+    def _compact(self):
+        # Ajouts des autres processus rejoués avant d'écrire l'instantané et de vider le journal
+        self.refresh()
+        self._write_snapshot()
+
+    def save(self):
+        """Compacte le journal dans l'instantané, sans perdre les ajouts des autres processus"""
+        with self._file_lock():
+            self._compact()
+
+    @classmethod
+    def load(cls, dim: int, path: Optional[str] = None, nprobe: int = 16) -> "CandidateIndex":
+        """Charge l'instantané et rejoue le journal (index vide si absent)"""
+        index = cls(dim, path, nprobe)
+        if os.path.exists(index.path):
+            with np.load(index.path) as data:
+                if data["vectors"].shape[1] != dim:
+                    raise ValueError(f"Dimension de l'index ({data['vectors'].shape[1]}) différente de {dim}")
+                centroids = data["centroids"]
+                index.centroids = centroids.astype(np.float32) if len(centroids) else None
+                index.trained_size = int(data["trained_size"])
+                index._set_rows(data["ids"], data["vectors"], data["assignments"])
+        index._snapshot_mtime = index._current_snapshot_mtime()
+        index.refresh()
+        return index
+
+
+def main(argv: Optional[List[str]] = None):
+    # Import local: l'index seul ne charge pas torch
+    from .embeddings import DOCUMENT_EMBEDDING_DIM
+
+    parser = argparse.ArgumentParser(description="Maintenance de l'index des embeddings de CV")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite (l'index est dans le même dossier)")
+    parser.add_argument("--train", action="store_true", help="Recalcule les centroïdes même si ce n'est pas nécessaire")
+    args = parser.parse_args(argv)
+
+    index = CandidateIndex.load(DOCUMENT_EMBEDDING_DIM, default_index_path(args.db))
+    if args.train or index.needs_training():
+        index.train()
+    index.save()
+    trained = "non entraîné" if index.centroids is None else f"{len(index.centroids)} listes"
+    print(f"✅ {len(index)} CV indexés ({trained})")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,74 @@ import random
 import warnings
 import json
 import os
-from typing import List, Tuple, Dict, Any
+import threading
+import time
+from typing import List, Tuple, Dict, Any, Iterable, Optional
 
 warnings.filterwarnings("ignore")
 
+# Cache du pipeline NER par dossier de modèle: (signature, nlp, dernière vérification)
+_ner_cache: Dict[str, Tuple[Optional[Tuple], Any, float]] = {}
+_ner_cache_lock = threading.RLock()
+# Intervalle minimal entre deux inspections du dossier du modèle (secondes)
+NER_RELOAD_CHECK_INTERVAL = 2.0
+
+ENTITY_LABELS = ["PERSON", "SKILL", "ORG", "LOC", "CERTIFICATION", "EDUCATION",
+                 "SOFT_SKILL", "LANGUAGE", "PRODUCT", "EXPERIENCE"]
+
+
+def _model_signature(model_path: str) -> Optional[Tuple]:
+    """Signature (nombre de fichiers, mtime max, taille totale) du dossier d'un modèle"""
+    if not os.path.isdir(model_path):
+        return None
+    count, latest, total = 0, 0.0, 0
+    for root, _, files in os.walk(model_path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            count += 1
+            latest = max(latest, stat.st_mtime)
+            total += stat.st_size
+    return count, latest, total
+
+
+def _store_pipeline(model_path: str, nlp):
+    key = os.path.abspath(model_path)
+    with _ner_cache_lock:
+        _ner_cache[key] = (_model_signature(model_path), nlp, time.monotonic())
+
+
+def get_cached_ner_pipeline(trainer: "CustomNERTrainer"):
+    """
+    Retourne le pipeline NER du processus, rechargé uniquement si le dossier
+    du modèle a changé sur disque depuis le dernier chargement
+    """
+    key = os.path.abspath(trainer.model_path)
+    with _ner_cache_lock:
+        cached = _ner_cache.get(key)
+        if cached is not None:
+            signature, nlp, checked_at = cached
+            now = time.monotonic()
+            if now - checked_at < NER_RELOAD_CHECK_INTERVAL:
+                return nlp
+            current = _model_signature(trainer.model_path)
+            if current == signature:
+                _ner_cache[key] = (signature, nlp, now)
+                return nlp
+            print(f"🔄 Modèle NER modifié sur disque, rechargement de {trainer.model_path}")
+
+        nlp = trainer.load_model()
+        _ner_cache[key] = (_model_signature(trainer.model_path), nlp, time.monotonic())
+        return nlp
+
+
+def clear_ner_cache():
+    """Vide le cache des pipelines NER"""
+    with _ner_cache_lock:
+        _ner_cache.clear()
+
 class CustomNERTrainer:
     def __init__(self, model_name="ner_recruitment_model"):
         self.model_name = model_name
@@ -105,10 +169,7 @@ class CustomNERTrainer:
         ner = nlp.add_pipe("ner", last=True)
         
         # Ajouter toutes les étiquettes
-        labels = ["PERSON", "SKILL", "ORG", "LOC", "CERTIFICATION", "EDUCATION", 
-                 "SOFT_SKILL", "LANGUAGE", "PRODUCT", "EXPERIENCE"]
-        
-        for label in labels:
+        for label in ENTITY_LABELS:
             ner.add_label(label)
         
         # Ajouter les étiquettes trouvées dans les données d'entraînement
@@ -150,6 +211,7 @@ class CustomNERTrainer:
         
         # Sauvegarder le modèle
         nlp.to_disk(self.model_path)
+        _store_pipeline(self.model_path, nlp)
         print(f"✅ Modèle sauvegardé dans {self.model_path}")
         
         return nlp
@@ -165,23 +227,12 @@ class CustomNERTrainer:
             print("🔄 Entraînement d'un nouveau modèle...")
             return self.train_model()
 
-    def extract_entities(self, text: str) -> Dict[str, List[str]]:
-        """Extrait les entités d'un texte avec le modèle personnalisé"""
-        nlp = self.load_model()
-        doc = nlp(text)
-        
-        entities = {
-            "PERSON": [],
-            "SKILL": [],
-            "ORG": [],
-            "LOC": [],
-            "CERTIFICATION": [],
-            "EDUCATION": [],
-            "SOFT_SKILL": [],
-            "LANGUAGE": [],
-            "PRODUCT": [],
-            "EXPERIENCE": []
-        }
+    def get_pipeline(self):
+        """Pipeline NER mis en cache pour tout le processus"""
+        return get_cached_ner_pipeline(self)
+
+    def _entities_from_doc(self, doc) -> Dict[str, List[str]]:
+        entities = {label: [] for label in ENTITY_LABELS}
         
         for ent in doc.ents:
             if ent.label_ in entities:
@@ -193,6 +244,16 @@ class CustomNERTrainer:
         
         return entities
 
+    def extract_entities(self, text: str) -> Dict[str, List[str]]:
+        """Extrait les entités d'un texte avec le modèle personnalisé"""
+        nlp = self.get_pipeline()
+        return self._entities_from_doc(nlp(text))
+
+    def extract_entities_many(self, texts: Iterable[str], batch_size: int = 32) -> List[Dict[str, List[str]]]:
+        """Extrait les entités de plusieurs textes en un seul passage nlp.pipe"""
+        nlp = self.get_pipeline()
+        return [self._entities_from_doc(doc) for doc in nlp.pipe(texts, batch_size=batch_size)]
+
     def test_model(self, test_texts: List[str] = None):
         """Teste le modèle sur des exemples"""
         if test_texts is None:
@@ -203,7 +264,7 @@ class CustomNERTrainer:
                 "Certifié AWS Solutions Architect, parle Arabe, Français et Anglais."
             ]
         
-        nlp = self.load_model()
+        nlp = self.get_pipeline()
         
         print("\n🧪 Test du modèle NER personnalisé:")
         print("=" * 50)
@@ -236,13 +297,18 @@ class CustomNERTrainer:
 def get_recruitment_ner_model():
     """Retourne une instance du modèle NER pour le recrutement"""
     trainer = CustomNERTrainer()
-    return trainer.load_model()
+    return trainer.get_pipeline()
 
 def extract_recruitment_entities(text: str) -> Dict[str, List[str]]:
     """Extrait les entités spécifiques au recrutement d'un texte"""
     trainer = CustomNERTrainer()
     return trainer.extract_entities(text)
 
+def extract_recruitment_entities_many(texts: Iterable[str], batch_size: int = 32) -> List[Dict[str, List[str]]]:
+    """Extrait les entités spécifiques au recrutement de plusieurs textes"""
+    trainer = CustomNERTrainer()
+    return trainer.extract_entities_many(texts, batch_size=batch_size)
+
 # Exécution principale pour l'entraînement
 if __name__ == "__main__":
     trainer = CustomNERTrainer()
@@ -1,12 +1,10 @@
-import pytesseract
-from PIL import Image
 import re
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import io
 import base64
 from typing import Dict, Any, List, Tuple
+from .model_registry import get_model
+from .ocr_pipeline import DecodedImage, ImageSource, get_ocr_pipeline
 
 class CVImageAnalyzer:
     def __init__(self):
@@ -15,9 +13,9 @@ class CVImageAnalyzer:
         """
         print("🚀 Initialisation de l'analyseur d'images CV...")
         
-        # Chargement du modèle Sentence-BERT
+        # Chargement du modèle Sentence-BERT (partagé via le registre de modèles)
         try:
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.model = get_model('all-MiniLM-L6-v2')
             print("✅ Modèle Sentence-BERT chargé avec succès")
         except Exception as e:
             print(f"⚠️ Erreur lors du chargement du modèle: {str(e)}")
@@ -25,6 +23,7 @@ class CVImageAnalyzer:
             
         # Configuration de pytesseract
         # pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'  # Décommenter et ajuster si nécessaire
+        self.ocr = get_ocr_pipeline()
         
         # Mots-clés par catégorie pour l'analyse
         self.skill_keywords = {
@@ -38,28 +37,34 @@ class CVImageAnalyzer:
         
         print("✅ Analyseur d'images CV initialisé avec succès")
 
-    def extract_text_from_image(self, image_data: bytes) -> str:
+    def extract_text_from_image(self, image_data: ImageSource) -> str:
         """
         Extrait le texte d'une image CV
         
         Args:
-            image_data: Données binaires de l'image
+            image_data: Octets, memoryview ou chemin de l'image (lu via mmap)
             
         Returns:
             Texte extrait de l'image
         """
+        return self.extract_text_from_images([image_data])[0]
+
+    def extract_text_from_images(self, images: List[ImageSource]) -> List[str]:
+        """
+        Extrait le texte de plusieurs images (ou pages) d'un CV en parallèle
+        
+        Args:
+            images: Octets, memoryview ou chemins des images
+            
+        Returns:
+            Texte extrait de chaque image, dans l'ordre ("" en cas d'échec)
+        """
         try:
-            img = Image.open(io.BytesIO(image_data))
-            # Essayer d'abord en français, puis en anglais si échec
-            try:
-                text = pytesseract.image_to_string(img, lang='fra')
-            except:
-                text = pytesseract.image_to_string(img, lang='eng')
-                
-            return text
+            # Prétraitement, passe unique fra+eng et cache par empreinte d'image
+            return self.ocr.ocr_many(images)
         except Exception as e:
             print(f"⚠️ Erreur lors de l'extraction du texte: {str(e)}")
-            return ""
+            return ["" for _ in images]
 
     def extract_text_from_base64(self, base64_image: str) -> str:
         """
@@ -190,19 +195,20 @@ class CVImageAnalyzer:
                 
         return experiences
 
-    def analyze_cv_image(self, image_data: bytes, job_description: str) -> Dict[str, Any]:
+    def analyze_cv_image(self, image_data: ImageSource, job_description: str) -> Dict[str, Any]:
         """
         Analyse complète d'une image CV par rapport à une description de poste
         
         Args:
-            image_data: Données binaires de l'image CV
+            image_data: Octets, memoryview ou chemin de l'image CV (lu via mmap,
+                sans copie); l'image est décodée une seule fois pour toutes les étapes
             job_description: Description du poste
             
         Returns:
             Résultats de l'analyse
         """
         # Extraction du texte
-        cv_text = self.extract_text_from_image(image_data)
+        cv_text = self.extract_text_from_image(DecodedImage.of(image_data))
         if not cv_text:
             return {"error": "Impossible d'extraire le texte de l'image"}
             
@@ -0,0 +1,107 @@
+"""
+Stockage des CV adressé par contenu.
+
+Chaque fichier déposé est enregistré sous son empreinte SHA-256: un même CV
+envoyé pour plusieurs offres n'est écrit qu'une fois. Les résultats coûteux
+calculés à partir du fichier (texte extrait, entités spaCy, embeddings) sont
+mis en cache dans SQLite sous cette même empreinte et la version de
+l'extracteur ou du modèle qui les a produits.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from .database import DEFAULT_DB_PATH, Database, get_database
+
+DEFAULT_UPLOAD_DIR = os.environ.get("ATS_UPLOAD_DIR", "uploads")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class StoredCV:
+    """Fichier enregistré dans le magasin"""
+    sha256: str
+    path: str
+    size: int
+    is_new: bool
+
+
+class CVStore:
+    """Fichiers de CV dédupliqués et cache des données dérivées"""
+
+    def __init__(self, upload_dir: str = DEFAULT_UPLOAD_DIR, db_path: str = DEFAULT_DB_PATH,
+                 db: Optional[Database] = None):
+        self.upload_dir = upload_dir
+        self.db = db or get_database(db_path)
+        # Tables cv_files et cv_features (lib.migrations)
+        self.db.init_schema()
+
+    # --- Fichiers -----------------------------------------------------
+
+    def path_for(self, sha256: str, extension: str) -> str:
+        # Sous-dossiers par préfixe pour éviter des répertoires géants
+        return os.path.join(self.upload_dir, "cv", sha256[:2], f"{sha256}{extension.lower()}")
+
+    def store(self, data: bytes, filename: str) -> StoredCV:
+        """Enregistre un fichier s'il n'est pas déjà présent"""
+        sha256 = content_hash(data)
+        path = self.path_for(sha256, os.path.splitext(filename)[1])
+        is_new = not os.path.exists(path)
+        if is_new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Écriture atomique: un fichier présent est toujours complet
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO cv_files (sha256, path, size, original_name) VALUES (?, ?, ?, ?)",
+                (sha256, path, len(data), filename)
+            )
+        return StoredCV(sha256, path, len(data), is_new)
+
+    # --- Données dérivées ---------------------------------------------
+
+    def get(self, sha256: str, name: str, version: str) -> Optional[Any]:
+        """Valeur en cache (tableau float32 pour les vecteurs, objet JSON sinon), ou None"""
+        row = self.db.fetchone(
+            "SELECT kind, value FROM cv_features WHERE sha256 = ? AND name = ? AND version = ?",
+            (sha256, name, version)
+        )
+        if row is None:
+            return None
+        kind, value = row
+        if kind == "vector":
+            return np.frombuffer(value, dtype=np.float32)
+        return json.loads(value)
+
+    def put(self, sha256: str, name: str, version: str, value: Any):
+        if isinstance(value, np.ndarray):
+            kind, blob = "vector", np.ascontiguousarray(value, dtype=np.float32).tobytes()
+        else:
+            kind, blob = "json", json.dumps(value, ensure_ascii=False)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cv_features (sha256, name, version, kind, value) VALUES (?, ?, ?, ?, ?)",
+                (sha256, name, version, kind, blob)
+            )
+
+    def get_or_compute(self, sha256: str, name: str, version: str, compute: Callable[[], Any]) -> Any:
+        """Retourne la valeur en cache, ou la calcule et la persiste (sauf si vide)"""
+        value = self.get(sha256, name, version)
+        if value is None:
+            value = compute()
+            # Un échec d'extraction (texte vide, None) n'est pas mis en cache
+            if value is not None and not (isinstance(value, str) and not value.strip()):
+                self.put(sha256, name, version, value)
+        return value
@@ -0,0 +1,331 @@
+"""
+Accès à la base SQLite de l'application.
+
+Une connexion par thread (les sessions Streamlit tournent chacune dans leur
+thread) est ouverte à la première requête puis réutilisée, en mode WAL: les
+lectures ne bloquent plus l'écriture d'une autre session. Les requêtes sont
+des chaînes constantes, gardées préparées dans le cache de statements de
+chaque connexion. transaction() regroupe plusieurs écritures en un seul
+commit; les transactions imbriquées rejoignent la transaction englobante.
+
+Les lectures des dépôts passent par un cache (lib.query_cache) invalidé par
+les écritures: chaque commit qui modifie des lignes incrémente
+write_version, et des triggers tiennent à jour la table data_version pour
+les écritures des autres processus.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .query_cache import QueryCache
+
+DEFAULT_DB_PATH = os.environ.get("ATS_DATABASE_PATH", "ats_database.db")
+# Cache de pages par connexion, en Kio (valeur négative pour SQLite)
+CACHE_SIZE_KIB = int(os.environ.get("ATS_DATABASE_CACHE_KIB", "20000"))
+BUSY_TIMEOUT_MS = 30000
+# Bins de l'histogramme des scores finaux (fixés par la table job_stats, voir lib.migrations)
+HISTOGRAM_BINS = 10
+
+
+class Database:
+    """Connexions SQLite par thread, WAL, et dépôts par table"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, cache_size_kib: int = CACHE_SIZE_KIB):
+        self.path = path
+        self.cache_size_kib = cache_size_kib
+        self._local = threading.local()
+        self._write_version = 0
+        self._write_version_lock = threading.Lock()
+        self.cache = QueryCache(self)
+        self.candidates = CandidateRepository(self)
+        self.jobs = JobRepository(self)
+        self.interviews = InterviewRepository(self)
+        self.documents = DocumentRepository(self)
+
+    def _open(self) -> sqlite3.Connection:
+        # isolation_level=None: pas de BEGIN implicite, les transactions sont explicites
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # En WAL, NORMAL ne synchronise qu'aux checkpoints: durable sauf coupure de courant
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connexion du thread courant, ouverte à la première utilisation"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Écritures groupées en un seul commit (annulées en cas d'exception)
+
+        BEGIN IMMEDIATE prend le verrou d'écriture dès le début: deux sessions
+        ne peuvent pas lire puis échouer à écrire la même ligne.
+        """
+        conn = self.connection
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        changes_before = conn.total_changes
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+            if conn.total_changes != changes_before:
+                self._bump_write_version()
+        finally:
+            self._local.depth = 0
+
+    def _bump_write_version(self):
+        with self._write_version_lock:
+            self._write_version += 1
+
+    @property
+    def write_version(self) -> int:
+        """Nombre de commits de ce processus ayant modifié des lignes"""
+        return self._write_version
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        return self.connection.execute(sql, params)
+
+    def executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows)
+
+    def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        return self.connection.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return self.connection.execute(sql, params).fetchall()
+
+    def query_df(self, sql: str, params: Sequence[Any] = ()):
+        """Résultat d'une requête sous forme de DataFrame pandas"""
+        import pandas as pd
+        return pd.read_sql_query(sql, self.connection, params=list(params))
+
+    def cached_fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        return self.cache.get(sql, params, lambda: self.fetchone(sql, params))
+
+    def cached_fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return self.cache.get(sql, params, lambda: self.fetchall(sql, params))
+
+    def cached_query_df(self, sql: str, params: Sequence[Any] = ()):
+        """DataFrame en cache jusqu'à la prochaine écriture (à ne pas modifier sur place)"""
+        return self.cache.get(sql, params, lambda: self.query_df(sql, params))
+
+    def init_schema(self):
+        """Crée ou met à jour le schéma (migrations en attente de lib.migrations)"""
+        from .migrations import migrate
+        migrate(self)
+
+    def close(self):
+        """Ferme la connexion du thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class Repository:
+    def __init__(self, db: Database):
+        self.db = db
+
+
+class CandidateRepository(Repository):
+    SCORE_COLUMNS = ("cv_match_score", "written_interview_score", "video_interview_score", "documents_score")
+    # Colonnes de la liste du tableau de bord
+    LIST_COLUMNS = (
+        "c.id", "c.name", "c.email", "j.title AS job_title", "c.cv_match_score", "c.written_interview_score",
+        "c.video_interview_score", "c.documents_score", "c.final_score", "c.status",
+    )
+
+    def create(self, name: str, email: str, phone: str, cv_path: str, job_id: int,
+               cv_match_score: float, status: str = "En attente") -> int:
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO candidates (name, email, phone, cv_path, job_id, cv_match_score, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, email, phone, cv_path, job_id, cv_match_score, status)
+            )
+            return cursor.lastrowid
+
+    def set_score(self, candidate_id: int, column: str, score: float):
+        if column not in self.SCORE_COLUMNS:
+            raise ValueError(f"Colonne de score inconnue: {column}")
+        with self.db.transaction() as conn:
+            conn.execute(f"UPDATE candidates SET {column} = ? WHERE id = ?", (score, candidate_id))
+
+    def scores(self, candidate_id: int) -> Optional[sqlite3.Row]:
+        # Lu sans cache: sert au score final, dans la transaction qui vient d'écrire les scores
+        return self.db.fetchone(
+            "SELECT cv_match_score, written_interview_score, video_interview_score, documents_score "
+            "FROM candidates WHERE id = ?",
+            (candidate_id,)
+        )
+
+    def set_final(self, candidate_id: int, final_score: float, status: str):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE candidates SET final_score = ?, status = ? WHERE id = ?",
+                         (final_score, status, candidate_id))
+
+    def by_ids_df(self, candidate_ids: Sequence[int]):
+        """id, name, email, job_id, status des candidats demandés"""
+        placeholders = ",".join("?" * len(candidate_ids))
+        return self.db.cached_query_df(
+            f"SELECT id, name, email, job_id, status FROM candidates WHERE id IN ({placeholders})",
+            candidate_ids
+        )
+
+    @staticmethod
+    def _where(job_id: Optional[int], status: Optional[str], prefix: str = "") -> Tuple[List[str], List[Any]]:
+        """Conditions des filtres du tableau de bord (prefix: alias de table, ex. « c. »)"""
+        conditions, params = [], []
+        if job_id is not None:
+            conditions.append(f"{prefix}job_id = ?")
+            params.append(job_id)
+        if status is not None:
+            conditions.append(f"{prefix}status = ?")
+            params.append(status)
+        return conditions, params
+
+    def status_counts(self, job_id: Optional[int] = None, status: Optional[str] = None) -> Dict[str, int]:
+        """Nombre de candidats par statut, lu dans job_stats (tenue à jour par triggers)"""
+        conditions, params = self._where(job_id, status)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.db.cached_fetchall(
+            f"SELECT status, SUM(n) AS n FROM job_stats{where} GROUP BY status HAVING SUM(n) > 0", params
+        )
+        return {row["status"]: row["n"] for row in rows}
+
+    def score_histogram(self, job_id: Optional[int] = None, status: Optional[str] = None) -> List[int]:
+        """Effectifs des scores finaux en HISTOGRAM_BINS bins de 10 points (score absent compté comme 0)"""
+        conditions, params = self._where(job_id, status)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.db.cached_fetchall(
+            f"SELECT score_bin, SUM(n) AS n FROM job_stats{where} GROUP BY score_bin", params
+        )
+        counts = [0] * HISTOGRAM_BINS
+        for row in rows:
+            counts[row["score_bin"]] = row["n"]
+        return counts
+
+    def page_df(self, job_id: Optional[int] = None, status: Optional[str] = None,
+                after_id: Optional[int] = None, limit: int = 50):
+        """
+        Page de la liste des candidats, paginée par clé (id croissant)
+
+        Seules les colonnes affichées sont lues. Pour la page suivante,
+        passer after_id = dernier id de la page courante.
+        """
+        conditions, params = self._where(job_id, status, prefix="c.")
+        if after_id is not None:
+            conditions.append("c.id > ?")
+            params.append(after_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.db.cached_query_df(
+            f"SELECT {', '.join(self.LIST_COLUMNS)} FROM candidates c JOIN jobs j ON j.id = c.job_id"
+            f"{where} ORDER BY c.id LIMIT ?",
+            params + [limit]
+        )
+
+    def detail(self, candidate_id: int) -> Optional[sqlite3.Row]:
+        """Fiche complète d'un candidat, avec l'intitulé de l'offre"""
+        return self.db.cached_fetchone(
+            "SELECT c.*, j.title AS job_title FROM candidates c LEFT JOIN jobs j ON j.id = c.job_id WHERE c.id = ?",
+            (candidate_id,)
+        )
+
+
+class JobRepository(Repository):
+    def create(self, title: str, description: str, required_skills: str, required_experience: int) -> int:
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (title, description, required_skills, required_experience) VALUES (?, ?, ?, ?)",
+                (title, description, required_skills, required_experience)
+            )
+            return cursor.lastrowid
+
+    def description(self, job_id: int) -> Optional[str]:
+        row = self.db.cached_fetchone("SELECT description FROM jobs WHERE id = ?", (job_id,))
+        return row["description"] if row else None
+
+    def titles_df(self):
+        return self.db.cached_query_df("SELECT id, title FROM jobs")
+
+    def listing_df(self):
+        return self.db.cached_query_df("SELECT id, title, required_experience, created_at FROM jobs ORDER BY created_at DESC")
+
+
+class InterviewRepository(Repository):
+    def create(self, candidate_id: int, job_id: int, questions: str, answers: str, written_score: float) -> int:
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO interviews (candidate_id, job_id, questions, answers, written_score) VALUES (?, ?, ?, ?, ?)",
+                (candidate_id, job_id, questions, answers, written_score)
+            )
+            return cursor.lastrowid
+
+    def set_video(self, candidate_id: int, video_score: float, emotions_data: str):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE interviews SET video_score = ?, emotions_data = ? WHERE candidate_id = ?",
+                         (video_score, emotions_data, candidate_id))
+
+    def for_candidate_df(self, candidate_id: int):
+        return self.db.cached_query_df("SELECT * FROM interviews WHERE candidate_id = ?", (candidate_id,))
+
+
+class DocumentRepository(Repository):
+    def create(self, candidate_id: int, document_type: str, document_path: str,
+               authenticity_score: float, verified: bool) -> int:
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO documents (candidate_id, document_type, document_path, authenticity_score, verified) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (candidate_id, document_type, document_path, authenticity_score, verified)
+            )
+            return cursor.lastrowid
+
+    def create_many(self, rows: Iterable[Sequence[Any]]):
+        """Plusieurs documents (candidate_id, type, chemin, score, vérifié) en une transaction"""
+        self.db.executemany(
+            "INSERT INTO documents (candidate_id, document_type, document_path, authenticity_score, verified) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def for_candidate_df(self, candidate_id: int):
+        return self.db.cached_query_df("SELECT * FROM documents WHERE candidate_id = ?", (candidate_id,))
+
+
+_databases: Dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path: str = DEFAULT_DB_PATH) -> Database:
+    """Base partagée par le processus pour ce chemin"""
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = Database(path)
+        return _databases[path]
@@ -13,8 +13,9 @@ from datetime import datetime
 import hashlib
 import pickle
 from sklearn.metrics.pairwise import cosine_similarity
-import easyocr
 from dataclasses import dataclass
+from .document_context import DocumentImage
+from .ocr_backends import get_backend
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -33,7 +34,7 @@ class DocumentFeatures:
 class DocumentClassifier:
     """Classificateur de documents utilisant LayoutLM et OCR"""
     
-    def __init__(self, model_name="microsoft/layoutlm-base-uncased"):
+    def __init__(self, model_name="microsoft/layoutlm-base-uncased", ocr_backend: str = "easyocr"):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Utilisation du device: {self.device}")
         
@@ -42,8 +43,8 @@ class DocumentClassifier:
         self.model = AutoModel.from_pretrained(model_name)
         self.model.to(self.device)
         
-        # Configuration OCR
-        self.ocr_reader = easyocr.Reader(['fr', 'ar', 'en'])
+        # Configuration OCR (moteur partagé, chargé à la première reconnaissance)
+        self.ocr_backend = get_backend(ocr_backend)
         
         # Types de documents supportés
         self.document_types = {
@@ -78,28 +79,20 @@ class DocumentClassifier:
         
         return DocumentTypeClassifier().to(self.device)
     
-    def extract_text_and_layout(self, image_path: str) -> Tuple[str, List[Dict]]:
-        """Extraction du texte et des informations de layout"""
+    def extract_text_and_layout(self, image) -> Tuple[str, List[Dict]]:
+        """Extraction du texte et des informations de layout (chemin ou DocumentImage)"""
         try:
-            # OCR avec EasyOCR
-            results = self.ocr_reader.readtext(image_path, detail=1)
+            # OCR sur l'image déjà décodée (le moteur la réduit si nécessaire)
+            result = self.ocr_backend.recognize(DocumentImage.of(image))
             
             text_content = ""
             layout_info = []
             
-            for (bbox, text, confidence) in results:
-                if confidence > 0.5:  # Seuil de confiance
-                    text_content += text + " "
-                    
-                    # Normalisation des coordonnées de bbox
-                    x_coords = [point[0] for point in bbox]
-                    y_coords = [point[1] for point in bbox]
-                    
-                    layout_info.append({
-                        'text': text,
-                        'bbox': [min(x_coords), min(y_coords), max(x_coords), max(y_coords)],
-                        'confidence': confidence
-                    })
+            for line in result.lines:
+                if line['confidence'] > 0.5:  # Seuil de confiance
+                    text_content += line['text'] + " "
+                    # bbox déjà dans le repère de l'image d'origine
+                    layout_info.append(line)
             
             return text_content.strip(), layout_info
             
@@ -141,15 +134,11 @@ class DocumentClassifier:
             logger.error(f"Erreur lors de la génération des embeddings: {e}")
             return np.zeros(768)
     
-    def extract_visual_features(self, image_path: str) -> np.ndarray:
-        """Extraction des caractéristiques visuelles"""
+    def extract_visual_features(self, image) -> np.ndarray:
+        """Extraction des caractéristiques visuelles (chemin ou DocumentImage)"""
         try:
-            image = cv2.imread(image_path)
-            if image is None:
-                return np.zeros(100)
-            
-            # Conversion en niveaux de gris
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # Niveaux de gris partagés avec les autres étapes
+            gray = DocumentImage.of(image).gray
             
             # Caractéristiques basiques
             features = []
@@ -205,18 +194,29 @@ class DocumentClassifier:
         else:
             return "unknown"
     
-    def process_document(self, image_path: str) -> DocumentFeatures:
-        """Traitement complet d'un document"""
-        logger.info(f"Traitement du document: {image_path}")
+    def process_document(self, image) -> DocumentFeatures:
+        """
+        Traitement complet d'un document (chemin, octets, tableau BGR ou DocumentImage).
+        L'image est décodée une seule fois pour toutes les étapes; une image
+        illisible donne un texte vide et des features visuelles nulles.
+        """
+        try:
+            document = DocumentImage.of(image)
+            image_path = document.path
+        except ValueError as e:
+            logger.error(f"Erreur lors du décodage de l'image: {e}")
+            document = None
+            image_path = image if isinstance(image, str) else None
+        logger.info(f"Traitement du document: {image_path or 'image en mémoire'}")
         
         # Extraction du texte et layout
-        text_content, layout_info = self.extract_text_and_layout(image_path)
+        text_content, layout_info = self.extract_text_and_layout(document) if document is not None else ("", [])
         
         # Génération des embeddings
         layout_embedding = self.get_layoutlm_embeddings(text_content, layout_info)
         
         # Extraction des features visuelles
-        visual_features = self.extract_visual_features(image_path)
+        visual_features = self.extract_visual_features(document) if document is not None else np.zeros(100)
         
         # Classification
         document_type = self.classify_document_type(text_content)
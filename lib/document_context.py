@@ -0,0 +1,84 @@
+"""
+Contexte de traitement d'une image de document (CIN, diplôme, permis...).
+
+L'image est décodée une seule fois en tableau numpy; les versions dérivées
+(RGB, niveaux de gris, réductions) sont calculées à la première demande puis
+partagées par les étapes OCR, mise en page et caractéristiques visuelles.
+"""
+import os
+from typing import Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+# Côté le plus long des images passées à l'OCR (au-delà, le détail n'aide plus)
+OCR_MAX_SIDE = 2048
+
+
+class DocumentImage:
+    """Image décodée (BGR, comme cv2.imread) et ses dérivées en cache"""
+
+    def __init__(self, bgr: np.ndarray, path: Optional[str] = None):
+        if bgr is None or bgr.size == 0:
+            raise ValueError(f"Image illisible: {path or 'données en mémoire'}")
+        if bgr.ndim == 2:
+            bgr = cv2.cvtColor(bgr, cv2.COLOR_GRAY2BGR)
+        self.bgr = bgr
+        self.path = path
+        self._rgb: Optional[np.ndarray] = None
+        self._gray: Optional[np.ndarray] = None
+        self._downscaled: Dict[Tuple[int, bool], Tuple[np.ndarray, float]] = {}
+
+    @classmethod
+    def from_path(cls, path: str) -> "DocumentImage":
+        return cls(cv2.imread(path), path=path)
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, bytearray, memoryview]) -> "DocumentImage":
+        # frombuffer ne copie pas: imdecode décode directement depuis le tampon reçu
+        return cls(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR))
+
+    @classmethod
+    def of(cls, source: Union[str, os.PathLike, bytes, bytearray, memoryview, np.ndarray, "DocumentImage"]) -> "DocumentImage":
+        """Contexte à partir d'un chemin, d'octets, d'un tableau BGR ou d'un contexte existant"""
+        if isinstance(source, DocumentImage):
+            return source
+        if isinstance(source, np.ndarray):
+            return cls(source)
+        if isinstance(source, (str, os.PathLike)):
+            return cls.from_path(os.fspath(source))
+        return cls.from_bytes(source)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.bgr.shape[:2]
+
+    @property
+    def rgb(self) -> np.ndarray:
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def downscaled(self, max_side: int = OCR_MAX_SIDE, gray: bool = False) -> Tuple[np.ndarray, float]:
+        """
+        Version réduite pour que le plus grand côté ne dépasse pas max_side
+
+        Returns:
+            (image, facteur) où facteur = taille réduite / taille d'origine (1.0 si inchangée)
+        """
+        key = (max_side, gray)
+        if key not in self._downscaled:
+            source = self.gray if gray else self.rgb
+            height, width = self.shape
+            factor = min(1.0, max_side / max(height, width))
+            if factor < 1.0:
+                size = (max(1, round(width * factor)), max(1, round(height * factor)))
+                source = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+            self._downscaled[key] = (source, factor)
+        return self._downscaled[key]
@@ -0,0 +1,246 @@
+"""
+Extraction de texte des CV (PDF et Word) page par page.
+
+Les pages sont produites par un générateur, éventuellement réparties sur un
+pool de processus pour les gros documents, dans la limite d'un budget de
+pages et d'octets. Chaque page est chronométrée. Pour les documents Word,
+les tableaux sont extraits avec les paragraphes, dans l'ordre du document.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Budgets par défaut: au-delà, le document est refusé (octets) ou tronqué (pages)
+MAX_DOCUMENT_BYTES = int(os.environ.get("ATS_MAX_DOCUMENT_BYTES", 20 * 1024 * 1024))
+MAX_PAGES = int(os.environ.get("ATS_MAX_DOCUMENT_PAGES", 30))
+# En dessous de ce nombre de pages, le pool de processus coûte plus qu'il ne rapporte
+PARALLEL_MIN_PAGES = 8
+# À incrémenter quand le texte produit change (invalide les textes mis en cache)
+EXTRACTION_VERSION = f"v1/pages{MAX_PAGES}"
+
+
+@dataclass
+class PageText:
+    """Texte d'une page (ou d'un bloc Word) et temps d'extraction"""
+    index: int
+    text: str
+    seconds: float
+
+
+@dataclass
+class ExtractionResult:
+    """Texte complet d'un document et détail par page"""
+    pages: List[PageText] = field(default_factory=list)
+    total_pages: int = 0
+    truncated: bool = False
+    seconds: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(page.text for page in self.pages if page.text)
+
+    def slowest_pages(self, n: int = 3) -> List[PageText]:
+        return sorted(self.pages, key=lambda page: page.seconds, reverse=True)[:n]
+
+
+def read_document_bytes(source: Any, max_bytes: int = MAX_DOCUMENT_BYTES) -> bytes:
+    """
+    Contenu d'un document (chemin, octets ou objet fichier comme un
+    UploadedFile Streamlit), refusé s'il dépasse max_bytes
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    elif isinstance(source, (str, os.PathLike)):
+        if os.path.getsize(source) > max_bytes:
+            raise ValueError(f"Document trop volumineux (limite: {max_bytes // 1024 ** 2} Mo)")
+        with open(source, "rb") as f:
+            data = f.read()
+    elif hasattr(source, "getvalue"):
+        data = source.getvalue()
+    else:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        data = source.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"Document trop volumineux (limite: {max_bytes // 1024 ** 2} Mo)")
+    return data
+
+
+# --- PDF -------------------------------------------------------------
+
+def _extract_pdf_pages(data: bytes, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """Extrait les pages [start, stop) (exécuté dans un processus du pool, qui relit le PDF une fois)"""
+    reader = open_pdf(data)
+    pages = []
+    for index in range(start, stop):
+        page_start = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        pages.append((index, text, time.perf_counter() - page_start))
+    return pages
+
+
+# Pools partagés, un par nombre de processus
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool de processus de cette taille, créé à la première extraction parallèle"""
+    with _pool_lock:
+        if workers not in _pools:
+            # spawn et non fork: le processus de l'application a déjà des threads (torch, OpenMP)
+            # qu'un fork copierait dans un état incohérent
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def open_pdf(data: bytes):
+    import PyPDF2
+    return PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def iter_pdf_pages(data: bytes, max_pages: int = MAX_PAGES, workers: Optional[int] = None,
+                   reader: Optional[Any] = None) -> Iterator[PageText]:
+    """
+    Pages d'un PDF, dans l'ordre, au fur et à mesure de leur extraction
+
+    Args:
+        data: Contenu du PDF
+        max_pages: Nombre maximal de pages extraites
+        workers: Processus pour les gros documents (défaut: nombre de CPU, 1 = séquentiel)
+        reader: PdfReader déjà ouvert sur data (le PDF n'est alors pas relu)
+    """
+    reader = reader or open_pdf(data)
+    n_pages = min(len(reader.pages), max_pages)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or n_pages < PARALLEL_MIN_PAGES:
+        for index in range(n_pages):
+            start = time.perf_counter()
+            text = reader.pages[index].extract_text() or ""
+            yield PageText(index, text, time.perf_counter() - start)
+        return
+
+    # Une tranche de pages contiguës par tâche; map() rend les tranches dans l'ordre
+    chunk_size = -(-n_pages // workers)
+    starts = list(range(0, n_pages, chunk_size))
+    pool = _get_pool(workers)
+    for pages in pool.map(
+        _extract_pdf_pages,
+        [data] * len(starts),
+        starts,
+        [min(start + chunk_size, n_pages) for start in starts],
+    ):
+        for index, text, seconds in pages:
+            yield PageText(index, text, seconds)
+
+
+def count_pdf_pages(data: bytes) -> int:
+    return len(open_pdf(data).pages)
+
+
+# --- Word ------------------------------------------------------------
+
+def iter_docx_blocks(data: bytes) -> Iterator[PageText]:
+    """
+    Paragraphes et tableaux d'un document Word, dans l'ordre du document
+    (une ligne de tableau = cellules séparées par " | ")
+    """
+    import docx
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(io.BytesIO(data))
+    body = document.element.body
+    index = 0
+    for child in body.iterchildren():
+        start = time.perf_counter()
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            text = Paragraph(child, document).text
+        elif tag == "tbl":
+            rows = []
+            for row in Table(child, document).rows:
+                cells = []
+                for cell in row.cells:
+                    # Les cellules fusionnées sont répétées par python-docx
+                    if not cells or cell.text != cells[-1]:
+                        cells.append(cell.text)
+                rows.append(" | ".join(cells))
+            text = "\n".join(rows)
+        else:
+            continue
+        yield PageText(index, text, time.perf_counter() - start)
+        index += 1
+
+
+# --- Point d'entrée ----------------------------------------------------
+
+def detect_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".pdf":
+        return "pdf"
+    if extension == ".docx":
+        return "docx"
+    raise ValueError(f"Format de fichier non supporté: {extension or filename}")
+
+
+def extract_document(source: Any, filename: Optional[str] = None, document_format: Optional[str] = None,
+                     max_pages: int = MAX_PAGES, max_bytes: int = MAX_DOCUMENT_BYTES,
+                     workers: Optional[int] = None) -> ExtractionResult:
+    """
+    Extrait le texte d'un CV PDF ou Word
+
+    Args:
+        source: Chemin, octets ou objet fichier
+        filename: Nom du fichier (format déduit de l'extension; défaut: source si c'est un chemin)
+        document_format: "pdf" ou "docx", prioritaire sur l'extension
+        max_pages: Budget de pages (PDF); les pages suivantes sont ignorées
+        max_bytes: Taille maximale du document (ValueError au-delà)
+        workers: Processus pour les gros PDF (1 = séquentiel)
+
+    Returns:
+        ExtractionResult avec le texte, le temps par page et l'indicateur de troncature
+    """
+    if document_format is None:
+        if filename is None:
+            filename = getattr(source, "name", None) or (str(source) if isinstance(source, (str, os.PathLike)) else "")
+        document_format = detect_format(filename)
+    elif document_format not in ("pdf", "docx"):
+        raise ValueError(f"Format de fichier non supporté: {document_format}")
+    data = read_document_bytes(source, max_bytes)
+
+    start = time.perf_counter()
+    result = ExtractionResult()
+    if document_format == "pdf":
+        # Un seul passage du PDF dans ce processus: le lecteur sert au comptage et à l'extraction
+        reader = open_pdf(data)
+        result.total_pages = len(reader.pages)
+        result.pages = list(iter_pdf_pages(data, max_pages=max_pages, workers=workers, reader=reader))
+        result.truncated = result.total_pages > max_pages
+    else:
+        result.pages = list(iter_docx_blocks(data))
+        result.total_pages = len(result.pages)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extraction de texte d'un CV avec temps par page")
+    parser.add_argument("path", help="Fichier PDF ou DOCX")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    result = extract_document(args.path, max_pages=args.max_pages, workers=args.workers)
+    print(f"📄 {len(result.pages)}/{result.total_pages} pages en {result.seconds:.2f}s"
+          f"{' (tronqué)' if result.truncated else ''}, {len(result.text)} caractères")
+    for page in result.slowest_pages(5):
+        print(f"  - page {page.index + 1}: {page.seconds * 1000:.0f} ms, {len(page.text)} caractères")
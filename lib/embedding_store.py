@@ -0,0 +1,244 @@
+"""
+Embeddings des CV et des offres enregistrés dans la base.
+
+    python -m lib.embedding_store --kind all --batch-size 32
+    python -m lib.embedding_store --kind cv --dtype float16
+
+Les vecteurs sont stockés en BLOB (float32, ou float16 pour diviser la place
+par deux) dans candidates.cv_embedding et jobs.job_embedding, avec leur type
+et la version du modèle qui les a produits: un changement de modèle rend les
+anciens vecteurs invisibles jusqu'au prochain remplissage.
+
+load_matrix() lit tous les vecteurs d'un type dans une seule matrice numpy
+contiguë, préallouée: chaque BLOB est vu sans copie (np.frombuffer) puis
+recopié une seule fois à sa ligne. La commande ci-dessus calcule par lots les
+embeddings manquants ou périmés des lignes existantes.
+"""
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cv_store import CVStore, content_hash
+from .database import DEFAULT_DB_PATH, Database, get_database
+from .document_extraction import EXTRACTION_VERSION, extract_document
+from .embeddings import DOCUMENT_EMBEDDING_VERSION, embed_documents
+from .job_analysis_cache import JobAnalysisCache
+
+EMBEDDING_DTYPES = {"float32": np.float32, "float16": np.float16}
+DEFAULT_EMBEDDING_DTYPE = os.environ.get("ATS_EMBEDDING_DTYPE", "float32")
+
+# Type d'embedding -> (table, colonne du vecteur)
+EMBEDDING_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "cv": ("candidates", "cv_embedding"),
+    "job": ("jobs", "job_embedding"),
+}
+
+
+def encode_embedding(vector: np.ndarray, dtype: str = DEFAULT_EMBEDDING_DTYPE) -> bytes:
+    return np.ascontiguousarray(vector, dtype=EMBEDDING_DTYPES[dtype]).tobytes()
+
+
+def decode_embedding(blob: bytes, dtype: str) -> np.ndarray:
+    """Vue en lecture seule sur le BLOB (sans copie)"""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPES[dtype])
+
+
+class EmbeddingStore:
+    """Lecture et écriture des colonnes d'embeddings de candidates et jobs"""
+
+    def __init__(self, db: Optional[Database] = None, dtype: str = DEFAULT_EMBEDDING_DTYPE,
+                 version: str = DOCUMENT_EMBEDDING_VERSION):
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Type de vecteur non supporté: {dtype} ({', '.join(EMBEDDING_DTYPES)})")
+        self.db = db or get_database()
+        self.dtype = dtype
+        self.version = version
+
+    @staticmethod
+    def _columns(kind: str) -> Tuple[str, str]:
+        if kind not in EMBEDDING_COLUMNS:
+            raise ValueError(f"Type d'embedding inconnu: {kind} ({', '.join(EMBEDDING_COLUMNS)})")
+        return EMBEDDING_COLUMNS[kind]
+
+    def save(self, kind: str, row_id: int, vector: np.ndarray):
+        self.save_many(kind, [(row_id, vector)])
+
+    def save_many(self, kind: str, items: Iterable[Tuple[int, np.ndarray]]):
+        """Plusieurs vecteurs (id, vecteur) en une transaction"""
+        table, column = self._columns(kind)
+        self.db.executemany(
+            f"UPDATE {table} SET {column} = ?, {column}_dtype = ?, {column}_version = ? WHERE id = ?",
+            [(encode_embedding(vector, self.dtype), self.dtype, self.version, row_id) for row_id, vector in items]
+        )
+
+    def get(self, kind: str, row_id: int) -> Optional[np.ndarray]:
+        """Vecteur float32 de la ligne, ou None s'il est absent ou produit par un autre modèle"""
+        table, column = self._columns(kind)
+        row = self.db.fetchone(
+            f"SELECT {column}, {column}_dtype FROM {table} WHERE id = ? AND {column}_version = ?",
+            (row_id, self.version)
+        )
+        if row is None or row[0] is None:
+            return None
+        return decode_embedding(row[0], row[1]).astype(np.float32)
+
+    def load_matrix(self, kind: str, job_id: Optional[int] = None, dtype=np.float32,
+                    fetch_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tous les vecteurs à jour d'un type dans une matrice contiguë
+
+        Args:
+            kind: « cv » ou « job »
+            job_id: Pour « cv », seulement les candidats de cette offre
+            dtype: Type de la matrice (les BLOB float16 sont convertis à la copie)
+
+        Returns:
+            (ids int64, matrice n x dim), dans l'ordre des id
+        """
+        table, column = self._columns(kind)
+        conditions = [f"{column} IS NOT NULL", f"{column}_version = ?"]
+        params: List = [self.version]
+        if job_id is not None:
+            if kind != "cv":
+                raise ValueError("job_id ne filtre que les embeddings de CV")
+            conditions.append("job_id = ?")
+            params.append(job_id)
+        where = " AND ".join(conditions)
+
+        conn = self.db.connection
+        count = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+        ids = np.empty(count, dtype=np.int64)
+        matrix: Optional[np.ndarray] = None
+        cursor = conn.execute(f"SELECT id, {column}, {column}_dtype FROM {table} WHERE {where} ORDER BY id", params)
+        position = 0
+        # Une ligne ajoutée entre le comptage et la lecture est ignorée (elle sera lue au prochain chargement)
+        while position < count:
+            rows = cursor.fetchmany(min(fetch_size, count - position))
+            if not rows:
+                break
+            for row_id, blob, blob_dtype in rows:
+                vector = decode_embedding(blob, blob_dtype)
+                if matrix is None:
+                    matrix = np.empty((count, vector.shape[0]), dtype=dtype)
+                ids[position] = row_id
+                matrix[position] = vector
+                position += 1
+        cursor.close()
+        if matrix is None:
+            return ids[:0], np.empty((0, 0), dtype=dtype)
+        return ids[:position], matrix[:position]
+
+    def stale_rows(self, kind: str, after_id: int, limit: int) -> List[Tuple[int, Optional[str]]]:
+        """(id, chemin du CV ou description de l'offre) des lignes sans vecteur à jour"""
+        table, column = self._columns(kind)
+        source = "cv_path" if kind == "cv" else "description"
+        return [
+            (row[0], row[1]) for row in self.db.fetchall(
+                f"SELECT id, {source} FROM {table} WHERE id > ? AND ({column} IS NULL OR {column}_version IS NOT ?) "
+                f"ORDER BY id LIMIT ?",
+                (after_id, self.version, limit)
+            )
+        ]
+
+
+def _cv_vectors(store: CVStore, version: str, paths: Sequence[Optional[str]]) -> List[Optional[np.ndarray]]:
+    """Vecteurs des CV: cache du magasin par empreinte, sinon extraction puis embedding par lot"""
+    vectors: List[Optional[np.ndarray]] = [None] * len(paths)
+    to_embed: List[Tuple[int, str, str]] = []
+    for position, path in enumerate(paths):
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        sha256 = content_hash(data)
+        vectors[position] = store.get(sha256, "embedding", version)
+        if vectors[position] is not None:
+            continue
+        try:
+            text = store.get_or_compute(
+                sha256, "text", EXTRACTION_VERSION, lambda: extract_document(data, filename=path).text
+            )
+        except Exception as e:
+            print(f"⚠️ {path}: {e}")
+            continue
+        if text and text.strip():
+            to_embed.append((position, sha256, text))
+
+    if to_embed:
+        embeddings = embed_documents([text for _, _, text in to_embed])
+        for (position, sha256, _), vector in zip(to_embed, embeddings):
+            store.put(sha256, "embedding", version, vector)
+            vectors[position] = vector
+    return vectors
+
+
+def _job_vectors(db_path: str, version: str, descriptions: Sequence[Optional[str]]) -> List[Optional[np.ndarray]]:
+    """Vecteurs des offres, en réutilisant le cache d'analyse des offres"""
+    cache = JobAnalysisCache(version, db_path)
+    vectors: List[Optional[np.ndarray]] = []
+    to_embed: List[int] = []
+    analyses: List[Optional[Dict]] = []
+    for position, description in enumerate(descriptions):
+        analyses.append(cache.get(description) if description else None)
+        vectors.append((analyses[-1] or {}).get("embedding"))
+        if vectors[-1] is None and description:
+            to_embed.append(position)
+
+    if to_embed:
+        embeddings = embed_documents([descriptions[position] for position in to_embed])
+        for position, vector in zip(to_embed, embeddings):
+            cache.put(descriptions[position], dict(analyses[position] or {}, embedding=vector))
+            vectors[position] = vector
+    return vectors
+
+
+def backfill(kind: str, store: EmbeddingStore, batch_size: int = 32) -> Dict[str, int]:
+    """
+    Calcule par lots les vecteurs manquants ou périmés d'un type
+
+    Returns:
+        {"saved": ..., "skipped": ...} (skipped: CV introuvable ou texte vide)
+    """
+    cv_store = CVStore(db=store.db) if kind == "cv" else None
+    totals = {"saved": 0, "skipped": 0}
+    after_id = 0
+    while True:
+        rows = store.stale_rows(kind, after_id, batch_size)
+        if not rows:
+            break
+        sources = [source for _, source in rows]
+        if kind == "cv":
+            vectors = _cv_vectors(cv_store, store.version, sources)
+        else:
+            vectors = _job_vectors(store.db.path, store.version, sources)
+        items = [(row_id, vector) for (row_id, _), vector in zip(rows, vectors) if vector is not None]
+        store.save_many(kind, items)
+        totals["saved"] += len(items)
+        totals["skipped"] += len(rows) - len(items)
+        # Pagination par id: les lignes ignorées ne sont pas reprises en boucle
+        after_id = rows[-1][0]
+        print(f"💾 {kind}: {totals['saved']} vecteurs enregistrés (id <= {after_id})")
+    return totals
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Remplissage des embeddings des CV et des offres")
+    parser.add_argument("--kind", choices=["cv", "job", "all"], default="all", help="Embeddings à calculer")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite")
+    parser.add_argument("--dtype", choices=list(EMBEDDING_DTYPES), default=DEFAULT_EMBEDDING_DTYPE,
+                        help="Type des vecteurs enregistrés")
+    parser.add_argument("--batch-size", type=int, default=32, help="Lignes par lot d'embeddings et par transaction")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    db.init_schema()
+    store = EmbeddingStore(db, dtype=args.dtype)
+    for kind in (["job", "cv"] if args.kind == "all" else [args.kind]):
+        totals = backfill(kind, store, batch_size=args.batch_size)
+        print(f"✅ {kind}: {totals['saved']} vecteurs enregistrés, {totals['skipped']} lignes ignorées")
+
+
+if __name__ == "__main__":
+    main()
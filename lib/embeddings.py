@@ -0,0 +1,218 @@
+"""
+Embeddings transformers par lots.
+
+Les textes sont tokenisés une seule fois, triés par longueur en tokens puis
+regroupés en lots de longueurs voisines: chaque lot n'est complété (padding)
+que jusqu'à son plus long élément. Les résultats sont rendus dans l'ordre
+des textes d'entrée.
+
+Les textes longs peuvent être découpés en fenêtres chevauchantes
+(embed_chunked), avec un nombre borné de fenêtres par document.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+
+def _model_device(model) -> torch.device:
+    try:
+        return next(model.parameters()).device
+    except (StopIteration, AttributeError):
+        return torch.device("cpu")
+
+
+def _hidden_size(model) -> int:
+    return int(getattr(model.config, "hidden_size", 768))
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int = 32,
+                   max_batch_tokens: Optional[int] = None) -> List[List[int]]:
+    """
+    Regroupe les indices par longueur croissante en lots d'au plus batch_size
+    éléments et, si demandé, d'au plus max_batch_tokens tokens après padding
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        # Les longueurs sont croissantes: le nouvel élément fixe la longueur du lot
+        padded_tokens = (len(current) + 1) * lengths[index]
+        if current and (len(current) >= batch_size or
+                        (max_batch_tokens is not None and padded_tokens > max_batch_tokens)):
+            buckets.append(current)
+            current = []
+        current.append(index)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def mean_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """Moyenne des états cachés sur les tokens réels (hors padding)"""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return summed / counts
+
+
+def _encode_features(features: List[dict], tokenizer, model, batch_size: int,
+                     max_batch_tokens: Optional[int]) -> np.ndarray:
+    """Encode des entrées déjà tokenisées par lots de longueurs voisines (ordre conservé)"""
+    lengths = [len(feature["input_ids"]) for feature in features]
+    device = _model_device(model)
+
+    embeddings = np.empty((len(features), _hidden_size(model)), dtype=np.float32)
+    with torch.inference_mode():
+        for bucket in length_buckets(lengths, batch_size, max_batch_tokens):
+            batch = tokenizer.pad([features[i] for i in bucket], padding=True, return_tensors="pt")
+            batch = {key: value.to(device) for key, value in batch.items()}
+
+            outputs = model(**batch)
+            pooled = mean_pool(outputs.last_hidden_state, batch["attention_mask"])
+            embeddings[bucket] = pooled.float().cpu().numpy()
+
+    return embeddings
+
+
+def embed_many(texts: Sequence[str], tokenizer, model, batch_size: int = 32, max_length: int = 512,
+               max_batch_tokens: Optional[int] = None) -> np.ndarray:
+    """
+    Embeddings (moyenne des états cachés) de plusieurs textes
+
+    Args:
+        texts: Textes à encoder
+        tokenizer: Tokenizer Hugging Face du modèle
+        model: Modèle encodeur (BERT, CamemBERT...)
+        batch_size: Nombre maximal de textes par passage
+        max_length: Troncature en tokens de chaque texte
+        max_batch_tokens: Budget optionnel de tokens (après padding) par passage
+
+    Returns:
+        Matrice float32 (len(texts), hidden_size), dans l'ordre des textes
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, _hidden_size(model)), dtype=np.float32)
+
+    encodings = tokenizer(texts, truncation=True, max_length=max_length)
+    keys = list(encodings.keys())
+    features = [{key: encodings[key][i] for key in keys} for i in range(len(texts))]
+    return _encode_features(features, tokenizer, model, batch_size, max_batch_tokens)
+
+
+# Stratégies d'agrégation des fenêtres d'un même document
+POOLING_STRATEGIES = ("mean", "weighted", "max", "first")
+
+
+def chunk_windows(n_tokens: int, window: int, overlap: int, max_chunks: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Fenêtres (début, fin) couvrant n_tokens avec chevauchement
+
+    Deux fenêtres consécutives partagent exactement overlap tokens: la
+    dernière s'arrête à la fin du document et peut être plus courte, au lieu
+    d'être recalée sur la précédente (la fin du texte compterait double dans
+    une moyenne des fenêtres).
+
+    Au-delà de max_chunks fenêtres, on en garde max_chunks réparties
+    uniformément (la première et la dernière sont toujours conservées).
+    """
+    if overlap >= window:
+        raise ValueError("Le chevauchement doit être inférieur à la taille de fenêtre")
+    if n_tokens <= window:
+        return [(0, n_tokens)]
+
+    step = window - overlap
+    # Le dernier début est >= n_tokens - window: la dernière fenêtre atteint la fin du document
+    starts = list(range(0, n_tokens - overlap, step))
+    if max_chunks is not None and len(starts) > max_chunks:
+        keep = np.unique(np.linspace(0, len(starts) - 1, max_chunks).round().astype(int))
+        starts = [starts[i] for i in keep]
+    return [(start, min(start + window, n_tokens)) for start in starts]
+
+
+def _pool_chunks(chunk_embeddings: np.ndarray, chunk_lengths: np.ndarray, pooling: str) -> np.ndarray:
+    if pooling == "mean":
+        return chunk_embeddings.mean(axis=0)
+    if pooling == "weighted":
+        weights = chunk_lengths / chunk_lengths.sum()
+        return weights @ chunk_embeddings
+    if pooling == "max":
+        return chunk_embeddings.max(axis=0)
+    return chunk_embeddings[0]
+
+
+def embed_chunked(texts: Sequence[str], tokenizer, model, max_length: int = 512, overlap: int = 64,
+                  max_chunks: Optional[int] = 8, pooling: str = "mean", batch_size: int = 32,
+                  max_batch_tokens: Optional[int] = None) -> np.ndarray:
+    """
+    Embeddings de textes longs (CV de plusieurs pages) sans troncature à 512 tokens
+
+    Chaque texte est découpé en fenêtres chevauchantes de max_length tokens
+    (tokens spéciaux compris); toutes les fenêtres de tous les textes sont
+    encodées ensemble par lots, puis agrégées par document.
+
+    Args:
+        texts: Textes à encoder
+        tokenizer: Tokenizer Hugging Face du modèle
+        model: Modèle encodeur (BERT, CamemBERT...)
+        max_length: Taille d'une fenêtre en tokens
+        overlap: Tokens partagés par deux fenêtres consécutives
+        max_chunks: Nombre maximal de fenêtres par document (None: sans limite)
+        pooling: "mean", "weighted" (par nombre de tokens), "max" ou "first"
+        batch_size: Nombre maximal de fenêtres par passage
+        max_batch_tokens: Budget optionnel de tokens (après padding) par passage
+
+    Returns:
+        Matrice float32 (len(texts), hidden_size), dans l'ordre des textes
+    """
+    if pooling not in POOLING_STRATEGIES:
+        raise ValueError(f"Stratégie d'agrégation inconnue: {pooling} (disponibles: {', '.join(POOLING_STRATEGIES)})")
+    texts = list(texts)
+    hidden_size = _hidden_size(model)
+    if not texts:
+        return np.zeros((0, hidden_size), dtype=np.float32)
+
+    window = max_length - tokenizer.num_special_tokens_to_add(pair=False)
+    token_ids = tokenizer(texts, add_special_tokens=False, truncation=False)["input_ids"]
+
+    # "first" n'encode que la première fenêtre (équivalent de la troncature)
+    chunk_budget = 1 if pooling == "first" else max_chunks
+    features = []
+    chunk_counts = []
+    for ids in token_ids:
+        windows = chunk_windows(len(ids), window, overlap, chunk_budget)
+        for start, end in windows:
+            input_ids = tokenizer.build_inputs_with_special_tokens(ids[start:end])
+            features.append({"input_ids": input_ids, "attention_mask": [1] * len(input_ids)})
+        chunk_counts.append(len(windows))
+
+    chunk_embeddings = _encode_features(features, tokenizer, model, batch_size, max_batch_tokens)
+    chunk_lengths = np.array([len(feature["input_ids"]) for feature in features], dtype=np.float32)
+
+    # Les fenêtres d'un document sont contiguës
+    embeddings = np.empty((len(texts), hidden_size), dtype=np.float32)
+    bounds = np.concatenate([[0], np.cumsum(chunk_counts)])
+    for doc_index in range(len(texts)):
+        rows = slice(bounds[doc_index], bounds[doc_index + 1])
+        embeddings[doc_index] = _pool_chunks(chunk_embeddings[rows], chunk_lengths[rows], pooling)
+    return embeddings
+
+
+# Embeddings des CV et des offres de l'application: CamemBERT, fenêtres moyennées
+DOCUMENT_EMBEDDING_MODEL = "camembert-base"
+DOCUMENT_EMBEDDING_DIM = 768
+DOCUMENT_MAX_CHUNKS = 8
+DOCUMENT_POOLING = "mean"
+# Version des embeddings mis en cache (à changer avec le modèle ou le découpage)
+DOCUMENT_EMBEDDING_VERSION = f"{DOCUMENT_EMBEDDING_MODEL}/{DOCUMENT_POOLING}x{DOCUMENT_MAX_CHUNKS}/v3"
+
+
+def embed_documents(texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+    """Embeddings de CV ou d'offres avec le modèle partagé du registre"""
+    from .model_registry import get_model
+    encoder = get_model(DOCUMENT_EMBEDDING_MODEL)
+    return embed_chunked(
+        texts, encoder.tokenizer, encoder.model,
+        max_chunks=DOCUMENT_MAX_CHUNKS, pooling=DOCUMENT_POOLING, batch_size=batch_size
+    )
@@ -1,71 +1,80 @@
-import spacy
-import torch
-from transformers import (
-    AutoTokenizer, AutoModel, AutoModelForSequenceClassification,
-    pipeline, BertTokenizer, BertModel
-)
-from sentence_transformers import SentenceTransformer
 import pandas as pd
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
 import re
 import json
 from typing import Dict, List, Tuple, Any
 import warnings
-from .custom_ner_trainer import CustomNERTrainer, extract_recruitment_entities
+from .custom_ner_trainer import extract_recruitment_entities_many
+from .embeddings import embed_chunked
+from .job_analysis_cache import JobAnalysisCache
+from .scoring_profiles import LazyModelsMixin, weighted_score
+from .tfidf_corpus import shared_corpus
 
 warnings.filterwarnings('ignore')
 
-class EnhancedATSSystem:
-    def __init__(self):
+class EnhancedATSSystem(LazyModelsMixin):
+    SUPPORTED_STAGES = frozenset({"regex", "tfidf", "sentence", "bert", "spacy", "custom_ner", "sentiment", "zero_shot"})
+
+    # Pondération du score ATS global
+    SCORE_WEIGHTS = {
+        "bert_similarity": 0.25,
+        "sentence_similarity": 0.25,
+        "tfidf_similarity": 0.15,
+        "entity_similarity": 0.20,
+        "skill_average": 0.15
+    }
+    
+    SKILL_CATEGORIES = ["SKILL", "programming", "frameworks", "databases", "cloud", "tools", "ai_ml"]
+    ENTITY_SIMILARITY_CATEGORIES = ["SKILL", "programming", "frameworks", "databases", "cloud", "tools"]
+
+    def __init__(self, profile: str = "full", preload: bool = False, use_job_cache: bool = True):
         """
-        Système ATS amélioré avec modèle NER personnalisé
+        Système ATS amélioré avec modèle NER personnalisé.
+        Les modèles du profil choisi sont chargés à la première utilisation
+        de leur étape (preload=True pour tout charger immédiatement). Les
+        analyses d'offres sont persistées et réutilisées (use_job_cache).
         """
         print("🚀 Initialisation du système ATS amélioré...")
-        
-        # Modèles de base
-        try:
-            self.nlp_fr = spacy.load("fr_core_news_sm")
-        except:
-            print("⚠️ Modèle français non trouvé, utilisation du modèle anglais")
-            self.nlp_fr = spacy.load("en_core_web_sm")
-            
-        self.nlp_en = spacy.load("en_core_web_sm")
-        
-        # Modèle NER personnalisé pour le recrutement
-        self.ner_trainer = CustomNERTrainer()
-        self.custom_nlp = self.ner_trainer.load_model()
-        
-        # Modèles BERT et transformers
-        self.bert_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-        self.bert_model = BertModel.from_pretrained('bert-base-uncased')
-        
-        # Sentence Transformers
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Pipelines d'analyse
-        self.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest"
-        )
-        
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli"
-        )
-        
-        print("✅ Système ATS amélioré initialisé avec succès!")
+        self._init_models(profile, preload=preload)
+        self.job_cache = JobAnalysisCache(self.analysis_version()) if use_job_cache else None
+        # IDF du corpus enregistré (offres et CV), partagé par tous les processus
+        self.tfidf_corpus = shared_corpus
+        print("✅ Système ATS amélioré prêt!")
 
     def extract_entities_enhanced(self, text: str) -> Dict[str, List[str]]:
         """
         Extraction d'entités améliorée avec le modèle personnalisé
         """
+        return self.extract_entities_enhanced_many([text])[0]
+
+    def extract_entities_enhanced_many(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, List[str]]]:
+        """
+        Extraction d'entités sur plusieurs textes (modèles spaCy appelés via nlp.pipe)
+        """
+        texts = list(texts)
+        
         # Utiliser le modèle NER personnalisé
-        custom_entities = extract_recruitment_entities(text)
+        if self.uses("custom_ner"):
+            custom_entities = extract_recruitment_entities_many(texts, batch_size=batch_size)
+        else:
+            custom_entities = [{} for _ in texts]
         
         # Compléter avec spaCy standard
-        doc = self.nlp_fr(text)
+        if self.uses("spacy"):
+            docs = self.nlp_fr.pipe(texts, batch_size=batch_size)
+        else:
+            docs = [None] * len(texts)
+        
+        return [
+            self._combine_entities(text, custom, doc)
+            for text, custom, doc in zip(texts, custom_entities, docs)
+        ]
+
+    def _combine_entities(self, text: str, custom_entities: Dict[str, List[str]], doc) -> Dict[str, List[str]]:
+        """
+        Fusionne entités personnalisées, entités spaCy et compétences détectées par regex
+        """
         standard_entities = {
             "PERSON": [],
             "ORG": [],
@@ -74,9 +83,10 @@ class EnhancedATSSystem:
             "DATE": [],
         }
         
-        for ent in doc.ents:
-            if ent.label_ in standard_entities:
-                standard_entities[ent.label_].append(ent.text.strip())
+        if doc is not None:
+            for ent in doc.ents:
+                if ent.label_ in standard_entities:
+                    standard_entities[ent.label_].append(ent.text.strip())
         
         # Fusionner les résultats
         combined_entities = {**custom_entities, **standard_entities}
@@ -160,16 +170,8 @@ class EnhancedATSSystem:
         """
         Analyse de CV améliorée avec le modèle personnalisé
         """
-        analysis = {
-            "entities": self.extract_entities_enhanced(cv_text),
-            "experience_analysis": self.extract_experience_level(cv_text),
-            "bert_embedding": self.extract_bert_embeddings(cv_text),
-            "sentence_embedding": self.extract_sentence_embeddings(cv_text),
-            "sentiment": self.sentiment_analyzer(cv_text[:512])[0],
-            "text_length": len(cv_text),
-            "word_count": len(cv_text.split()),
-            "raw_text": cv_text
-        }
+        analysis = self._analyze_text(cv_text)
+        analysis["experience_analysis"] = self.extract_experience_level(cv_text)
         
         # Analyse de la qualité du CV
         quality_score = self.calculate_cv_quality(analysis)
@@ -179,26 +181,41 @@ class EnhancedATSSystem:
 
     def analyze_job_enhanced(self, job_text: str) -> Dict[str, Any]:
         """
-        Analyse d'offre d'emploi améliorée
-        """
-        analysis = {
-            "entities": self.extract_entities_enhanced(job_text),
-            "experience_requirements": self.extract_experience_level(job_text),
-            "bert_embedding": self.extract_bert_embeddings(job_text),
-            "sentence_embedding": self.extract_sentence_embeddings(job_text),
-            "sentiment": self.sentiment_analyzer(job_text[:512])[0],
-            "text_length": len(job_text),
-            "word_count": len(job_text.split()),
-            "raw_text": job_text
-        }
+        Analyse d'offre d'emploi améliorée (mise en cache par texte d'offre)
+        """
+        if self.job_cache is not None:
+            cached = self.job_cache.get(job_text)
+            if cached is not None:
+                return cached
+        
+        analysis = self._analyze_text(job_text)
+        analysis["experience_requirements"] = self.extract_experience_level(job_text)
         
         # Classification du type de poste
-        job_types = ["développement", "data science", "design", "management", "marketing", "commercial"]
-        job_classification = self.classifier(job_text, job_types)
-        analysis["job_type"] = job_classification
+        analysis["job_type"] = None
+        if self.uses("zero_shot"):
+            job_types = ["développement", "data science", "design", "management", "marketing", "commercial"]
+            analysis["job_type"] = self.classifier(job_text, job_types)
+        
+        if self.job_cache is not None:
+            self.job_cache.put(job_text, analysis)
         
         return analysis
 
+    def _analyze_text(self, text: str) -> Dict[str, Any]:
+        """
+        Analyse commune aux CV et aux offres, limitée aux étapes du profil
+        """
+        return {
+            "entities": self.extract_entities_enhanced(text),
+            "bert_embedding": self.extract_bert_embeddings(text) if self.uses("bert") else None,
+            "sentence_embedding": self.extract_sentence_embeddings(text) if self.uses("sentence") else None,
+            "sentiment": self.sentiment_analyzer(text[:512])[0] if self.uses("sentiment") else None,
+            "text_length": len(text),
+            "word_count": len(text.split()),
+            "raw_text": text
+        }
+
     def calculate_cv_quality(self, cv_analysis: Dict) -> Dict[str, float]:
         """
         Calcule un score de qualité du CV
@@ -232,19 +249,18 @@ class EnhancedATSSystem:
 
     def extract_bert_embeddings(self, text: str) -> np.ndarray:
         """Extraction d'embeddings BERT"""
-        inputs = self.bert_tokenizer(
-            text, 
-            return_tensors='pt', 
-            max_length=512, 
-            truncation=True, 
-            padding=True
+        return self.extract_bert_embeddings_many([text])[0]
+
+    def extract_bert_embeddings_many(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Extraction d'embeddings BERT par lots (une ligne par texte, dans l'ordre).
+        Les CV longs sont découpés en fenêtres chevauchantes (au plus
+        EMBEDDING_MAX_CHUNKS par texte) agrégées selon EMBEDDING_POOLING.
+        """
+        return embed_chunked(
+            texts, self.bert_tokenizer, self.bert_model,
+            max_chunks=self.EMBEDDING_MAX_CHUNKS, pooling=self.EMBEDDING_POOLING, batch_size=batch_size
         )
-        
-        with torch.no_grad():
-            outputs = self.bert_model(**inputs)
-            embeddings = outputs.last_hidden_state.mean(dim=1)
-            
-        return embeddings.numpy().flatten()
 
     def extract_sentence_embeddings(self, text: str) -> np.ndarray:
         """Extraction d'embeddings avec Sentence Transformers"""
@@ -257,24 +273,24 @@ class EnhancedATSSystem:
         scores = {}
         
         # Similarité BERT
-        bert_similarity = cosine_similarity(
-            cv_analysis["bert_embedding"].reshape(1, -1),
-            job_analysis["bert_embedding"].reshape(1, -1)
-        )[0][0]
-        scores["bert_similarity"] = float(bert_similarity)
+        if cv_analysis.get("bert_embedding") is not None and job_analysis.get("bert_embedding") is not None:
+            bert_similarity = cosine_similarity(
+                cv_analysis["bert_embedding"].reshape(1, -1),
+                job_analysis["bert_embedding"].reshape(1, -1)
+            )[0][0]
+            scores["bert_similarity"] = float(bert_similarity)
         
         # Similarité Sentence Transformers
-        sentence_similarity = cosine_similarity(
-            cv_analysis["sentence_embedding"].reshape(1, -1),
-            job_analysis["sentence_embedding"].reshape(1, -1)
-        )[0][0]
-        scores["sentence_similarity"] = float(sentence_similarity)
+        if cv_analysis.get("sentence_embedding") is not None and job_analysis.get("sentence_embedding") is not None:
+            sentence_similarity = cosine_similarity(
+                cv_analysis["sentence_embedding"].reshape(1, -1),
+                job_analysis["sentence_embedding"].reshape(1, -1)
+            )[0][0]
+            scores["sentence_similarity"] = float(sentence_similarity)
         
         # Similarité TF-IDF
-        vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-        tfidf_matrix = vectorizer.fit_transform([cv_analysis["raw_text"], job_analysis["raw_text"]])
-        tfidf_similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-        scores["tfidf_similarity"] = float(tfidf_similarity)
+        if self.uses("tfidf"):
+            scores["tfidf_similarity"] = self.tfidf_corpus.similarity(cv_analysis["raw_text"], job_analysis["raw_text"])
         
         # Similarité d'entités (nouveau)
         entity_similarity = self.calculate_entity_similarity(cv_analysis["entities"], job_analysis["entities"])
@@ -286,10 +302,8 @@ class EnhancedATSSystem:
         """
         Calcule la similarité basée sur les entités extraites
         """
-        important_categories = ["SKILL", "programming", "frameworks", "databases", "cloud", "tools"]
-        
         similarities = []
-        for category in important_categories:
+        for category in self.ENTITY_SIMILARITY_CATEGORIES:
             cv_set = set([item.lower() for item in cv_entities.get(category, [])])
             job_set = set([item.lower() for item in job_entities.get(category, [])])
             
@@ -318,23 +332,12 @@ class EnhancedATSSystem:
         skill_matches = self.calculate_skill_match_enhanced(cv_analysis["entities"], job_analysis["entities"])
         
         # Calcul du score global ATS avec pondération améliorée
-        weights = {
-            "bert_similarity": 0.25,
-            "sentence_similarity": 0.25,
-            "tfidf_similarity": 0.15,
-            "entity_similarity": 0.20,
-            "skill_average": 0.15
-        }
+        weights = self.SCORE_WEIGHTS
         
         skill_average = np.mean(list(skill_matches.values())) if skill_matches else 0.0
         
-        ats_score = (
-            similarity_scores["bert_similarity"] * weights["bert_similarity"] +
-            similarity_scores["sentence_similarity"] * weights["sentence_similarity"] +
-            similarity_scores["tfidf_similarity"] * weights["tfidf_similarity"] +
-            similarity_scores["entity_similarity"] * weights["entity_similarity"] +
-            skill_average * weights["skill_average"]
-        ) * 100
+        # Les poids sont renormalisés sur les similarités calculées par le profil
+        ats_score = weighted_score({**similarity_scores, "skill_average": skill_average}, weights)
         
         return {
             "ats_score": round(ats_score, 2),
@@ -355,14 +358,94 @@ class EnhancedATSSystem:
             "recommendations": self.generate_enhanced_recommendations(cv_analysis, job_analysis, skill_matches)
         }
 
+    def rank_candidates(self, job_text: str, cv_texts: List[str], batch_size: int = 32,
+                        top_k: int = None) -> pd.DataFrame:
+        """
+        Classe un ensemble de CV pour une offre en un seul passage
+
+        L'offre est analysée une fois, les CV sont encodés par lots et les
+        similarités sont calculées par produits matriciels. Le TF-IDF utilise
+        les IDF du corpus enregistré, sans y ajouter ces textes (mêmes scores
+        que calculate_enhanced_similarity pour une paire CV/offre).
+
+        Args:
+            job_text: Texte de l'offre d'emploi
+            cv_texts: Textes des CV à classer
+            batch_size: Taille des lots d'encodage
+            top_k: Nombre de lignes à renvoyer (toutes par défaut)
+
+        Returns:
+            DataFrame trié par ats_score décroissant, cv_index renvoyant à cv_texts
+        """
+        cv_texts = list(cv_texts)
+        if not cv_texts:
+            return pd.DataFrame(columns=["cv_index", "ats_score"])
+        
+        print(f"📋 Analyse de l'offre et classement de {len(cv_texts)} CV...")
+        job_analysis = self.analyze_job_enhanced(job_text)
+        components = {}
+        
+        # Similarités d'embeddings: une ligne par CV contre le vecteur de l'offre
+        if self.uses("bert"):
+            cv_bert = self.extract_bert_embeddings_many(cv_texts, batch_size=batch_size)
+            components["bert_similarity"] = cosine_similarity(
+                cv_bert, job_analysis["bert_embedding"].reshape(1, -1)
+            ).ravel()
+        
+        if self.uses("sentence"):
+            cv_sentence = np.asarray(self.sentence_model.encode(cv_texts, batch_size=batch_size))
+            components["sentence_similarity"] = cosine_similarity(
+                cv_sentence, job_analysis["sentence_embedding"].reshape(1, -1)
+            ).ravel()
+        
+        if self.uses("tfidf"):
+            components["tfidf_similarity"] = self.tfidf_corpus.score_texts(job_text, cv_texts)
+        
+        # Compétences: matrice d'appartenance CV x compétences demandées, par catégorie
+        cv_entities = self.extract_entities_enhanced_many(cv_texts, batch_size=batch_size)
+        job_entities = job_analysis["entities"]
+        skill_matches = {}
+        entity_similarities = []
+        
+        for category in self.SKILL_CATEGORIES:
+            job_skills = sorted(set(skill.lower() for skill in job_entities.get(category, [])))
+            cv_sets = [set(skill.lower() for skill in entities.get(category, [])) for entities in cv_entities]
+            
+            if not job_skills:
+                skill_matches[category] = np.zeros(len(cv_texts))
+                continue
+            
+            membership = np.array([[skill in cv_set for skill in job_skills] for cv_set in cv_sets], dtype=bool)
+            intersection = membership.sum(axis=1)
+            skill_matches[category] = np.round(intersection / len(job_skills), 3)
+            
+            if category in self.ENTITY_SIMILARITY_CATEGORIES:
+                cv_sizes = np.array([len(cv_set) for cv_set in cv_sets])
+                union = cv_sizes + len(job_skills) - intersection
+                entity_similarities.append(np.divide(intersection, union, out=np.zeros(len(cv_texts)), where=union > 0))
+        
+        components["entity_similarity"] = (
+            np.mean(entity_similarities, axis=0) if entity_similarities else np.zeros(len(cv_texts))
+        )
+        components["skill_average"] = np.mean(list(skill_matches.values()), axis=0)
+        
+        table = pd.DataFrame({"cv_index": np.arange(len(cv_texts))})
+        table["ats_score"] = np.round(weighted_score(components, self.SCORE_WEIGHTS), 2)
+        for name, values in components.items():
+            table[name] = values
+        for category, values in skill_matches.items():
+            table[f"skill_{category}"] = values
+        
+        table = table.sort_values("ats_score", ascending=False, kind="stable").reset_index(drop=True)
+        return table.head(top_k) if top_k else table
+
     def calculate_skill_match_enhanced(self, cv_entities: Dict, job_entities: Dict) -> Dict[str, float]:
         """
         Calcul de matching des compétences amélioré
         """
-        skill_categories = ["SKILL", "programming", "frameworks", "databases", "cloud", "tools", "ai_ml"]
         skill_matches = {}
         
-        for category in skill_categories:
+        for category in self.SKILL_CATEGORIES:
             cv_skills = set([skill.lower() for skill in cv_entities.get(category, [])])
             job_skills = set([skill.lower() for skill in job_entities.get(category, [])])
             
@@ -408,9 +491,9 @@ class EnhancedATSSystem:
         return recommendations[:5]
 
 # Fonction utilitaire pour l'intégration
-def get_enhanced_ats_system():
+def get_enhanced_ats_system(profile: str = "full"):
     """Retourne une instance du système ATS amélioré"""
-    return EnhancedATSSystem()
+    return EnhancedATSSystem(profile=profile)
 
 if __name__ == "__main__":
     # Test du système amélioré
@@ -436,3 +519,4 @@ if __name__ == "__main__":
     result = ats.generate_enhanced_ats_score(cv_test, job_test)
     print(f"\nScore ATS: {result['ats_score']}")
     print(f"Recommandations: {result['recommendations']}")
+    ats.print_loading_report()
@@ -0,0 +1,150 @@
+"""
+Cache persistant des analyses d'offres d'emploi.
+
+L'analyse d'une offre (entités, embeddings, sentiment, classification) ne
+dépend que de son texte et des modèles utilisés: elle est calculée une fois,
+stockée dans SQLite (embeddings en blobs float32) et réutilisée par tous les
+processus. Une entrée est invalidée quand le texte change (nouveau hash) ou
+quand la version des modèles diffère.
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from .database import DEFAULT_DB_PATH, Database, get_database
+
+
+def job_text_hash(job_text: str) -> str:
+    """Empreinte SHA-256 du texte de l'offre (espaces de début et fin ignorés)"""
+    return hashlib.sha256(job_text.strip().encode("utf-8")).hexdigest()
+
+
+def _json_default(obj: Any) -> Any:
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type non sérialisable: {type(obj).__name__}")
+
+
+def _copy_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie indépendante d'une analyse: tableaux recopiés en lecture seule, le reste copié en profondeur"""
+    copied = {}
+    for name, value in analysis.items():
+        if isinstance(value, np.ndarray):
+            if value.flags.writeable:
+                value = value.copy()
+                value.setflags(write=False)
+            copied[name] = value
+        else:
+            copied[name] = copy.deepcopy(value)
+    return copied
+
+
+class JobAnalysisCache:
+    """Cache SQLite (avec un LRU mémoire devant) des analyses d'offres"""
+
+    def __init__(self, model_version: str, db_path: str = DEFAULT_DB_PATH, memory_size: int = 128,
+                 db: Optional[Database] = None):
+        self.model_version = model_version
+        self.db = db or get_database(db_path)
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Tables job_analysis_cache et job_analysis_vectors (lib.migrations)
+        self.db.init_schema()
+
+    def _remember(self, key: str, analysis: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = analysis
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, job_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Analyse en cache pour ce texte et cette version de modèles, sinon None
+
+        Chaque appel renvoie une copie: la modifier ne touche pas le cache
+        (les vecteurs sont en lecture seule).
+        """
+        key = job_text_hash(job_text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return _copy_analysis(self._memory[key])
+
+        row = self.db.fetchone(
+            "SELECT analysis FROM job_analysis_cache WHERE job_hash = ? AND model_version = ?",
+            (key, self.model_version)
+        )
+        if row is None:
+            return None
+        analysis = json.loads(row[0])
+        for name, vector in self.db.fetchall(
+            "SELECT name, vector FROM job_analysis_vectors WHERE job_hash = ? AND model_version = ?",
+            (key, self.model_version)
+        ):
+            analysis[name] = np.frombuffer(vector, dtype=np.float32)
+
+        self._remember(key, analysis)
+        return _copy_analysis(analysis)
+
+    def put(self, job_text: str, analysis: Dict[str, Any]):
+        """Enregistre une analyse; les tableaux numpy sont stockés en float32"""
+        key = job_text_hash(job_text)
+        vectors = {name: value for name, value in analysis.items() if isinstance(value, np.ndarray)}
+        metadata = {name: value for name, value in analysis.items() if name not in vectors}
+
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_analysis_cache (job_hash, model_version, analysis) VALUES (?, ?, ?)",
+                (key, self.model_version, json.dumps(metadata, default=_json_default, ensure_ascii=False))
+            )
+            conn.execute(
+                "DELETE FROM job_analysis_vectors WHERE job_hash = ? AND model_version = ?",
+                (key, self.model_version)
+            )
+            conn.executemany(
+                "INSERT INTO job_analysis_vectors (job_hash, model_version, name, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (key, self.model_version, name, np.ascontiguousarray(value, dtype=np.float32).tobytes())
+                    for name, value in vectors.items()
+                ]
+            )
+
+        # Copie: l'appelant peut continuer à modifier son dictionnaire
+        self._remember(key, _copy_analysis(analysis))
+
+    def get_or_compute(self, job_text: str, compute: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """Retourne l'analyse en cache, ou la calcule et la persiste"""
+        analysis = self.get(job_text)
+        if analysis is None:
+            analysis = compute(job_text)
+            self.put(job_text, analysis)
+        return analysis
+
+    def invalidate(self, job_text: str):
+        """Supprime toutes les versions en cache d'une offre"""
+        key = job_text_hash(job_text)
+        with self._lock:
+            self._memory.pop(key, None)
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM job_analysis_cache WHERE job_hash = ?", (key,))
+            conn.execute("DELETE FROM job_analysis_vectors WHERE job_hash = ?", (key,))
+
+    def prune_stale_versions(self) -> int:
+        """Supprime les analyses calculées avec d'autres versions de modèles"""
+        with self.db.transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM job_analysis_cache WHERE model_version != ?", (self.model_version,)
+            ).rowcount
+            conn.execute("DELETE FROM job_analysis_vectors WHERE model_version != ?", (self.model_version,))
+        return deleted
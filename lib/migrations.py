@@ -0,0 +1,320 @@
+"""
+Migrations versionnées du schéma de la base.
+
+    python -m lib.migrations            # applique les migrations en attente
+    python -m lib.migrations --check    # vérifie que les requêtes fréquentes utilisent un index
+
+Chaque migration s'exécute dans sa propre transaction et est enregistrée dans
+schema_migrations (la version courante est aussi copiée dans PRAGMA
+user_version). Une base créée avant les migrations passe par la version 1
+sans changement: ses tables existent déjà.
+"""
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from .database import DEFAULT_DB_PATH, Database, get_database
+
+INITIAL_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS candidates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        phone TEXT,
+        cv_path TEXT,
+        job_id INTEGER,
+        cv_match_score REAL,
+        written_interview_score REAL,
+        video_interview_score REAL,
+        documents_score REAL,
+        final_score REAL,
+        status TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        required_skills TEXT,
+        required_experience INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        candidate_id INTEGER,
+        document_type TEXT,
+        document_path TEXT,
+        authenticity_score REAL,
+        verified BOOLEAN,
+        FOREIGN KEY (candidate_id) REFERENCES candidates (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS interviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        candidate_id INTEGER,
+        job_id INTEGER,
+        questions TEXT,
+        answers TEXT,
+        written_score REAL,
+        video_score REAL,
+        emotions_data TEXT,
+        FOREIGN KEY (candidate_id) REFERENCES candidates (id),
+        FOREIGN KEY (job_id) REFERENCES jobs (id)
+    )
+    ''',
+]
+
+# Tables dont les écritures invalident le cache des lectures
+VERSIONED_TABLES = ("candidates", "jobs", "interviews", "documents")
+
+# Bin d'histogramme (10 bins de 10 points, score absent compté comme 0) d'une ligne OLD ou NEW
+def _score_bin(row: str) -> str:
+    return f"MIN(MAX(CAST(COALESCE({row}.final_score, 0) / 10 AS INTEGER), 0), 9)"
+
+
+def _job_stats_add(row: str) -> str:
+    return (
+        f"INSERT INTO job_stats (job_id, status, score_bin, n) "
+        f"VALUES (IFNULL({row}.job_id, 0), IFNULL({row}.status, ''), {_score_bin(row)}, 1) "
+        f"ON CONFLICT (job_id, status, score_bin) DO UPDATE SET n = n + 1;"
+    )
+
+
+def _job_stats_remove(row: str) -> str:
+    return (
+        f"UPDATE job_stats SET n = n - 1 WHERE job_id = IFNULL({row}.job_id, 0) "
+        f"AND status = IFNULL({row}.status, '') AND score_bin = {_score_bin(row)};"
+    )
+
+
+# (version, description, instructions SQL)
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Tables candidats, offres, documents et entretiens", INITIAL_SCHEMA),
+    (2, "Index des filtres du tableau de bord et du détail d'un candidat", [
+        # Filtre par offre, seule ou avec le statut
+        "CREATE INDEX IF NOT EXISTS idx_candidates_job_status ON candidates (job_id, status)",
+        # Filtre par statut seul (l'index composite ne sert pas sans job_id)
+        "CREATE INDEX IF NOT EXISTS idx_candidates_status ON candidates (status)",
+        "CREATE INDEX IF NOT EXISTS idx_interviews_candidate ON interviews (candidate_id)",
+        "CREATE INDEX IF NOT EXISTS idx_documents_candidate ON documents (candidate_id)",
+    ]),
+    (3, "Index de la pagination par offre (ordre des id sans tri temporaire)", [
+        "CREATE INDEX IF NOT EXISTS idx_candidates_job ON candidates (job_id)",
+    ]),
+    (4, "Compteur de version des données tenu par triggers (invalidation du cache de lectures)", [
+        "CREATE TABLE IF NOT EXISTS data_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)",
+    ] + [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_version AFTER {operation} ON {table} "
+        f"BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END"
+        for table in VERSIONED_TABLES
+        for operation in ("INSERT", "UPDATE", "DELETE")
+    ]),
+    (5, "Statistiques par offre (statuts et histogramme des scores) tenues par triggers", [
+        # Une ligne par (offre, statut, bin de score): job_id 0 et statut '' pour les valeurs absentes
+        '''
+        CREATE TABLE IF NOT EXISTS job_stats (
+            job_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            score_bin INTEGER NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, status, score_bin)
+        ) WITHOUT ROWID
+        ''',
+        "DELETE FROM job_stats",
+        "INSERT INTO job_stats (job_id, status, score_bin, n) "
+        f"SELECT IFNULL(job_id, 0), IFNULL(status, ''), {_score_bin('candidates')}, COUNT(*) "
+        "FROM candidates GROUP BY 1, 2, 3",
+        f"CREATE TRIGGER IF NOT EXISTS trg_candidates_insert_stats AFTER INSERT ON candidates "
+        f"BEGIN {_job_stats_add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_candidates_delete_stats AFTER DELETE ON candidates "
+        f"BEGIN {_job_stats_remove('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_candidates_update_stats AFTER UPDATE OF job_id, status, final_score ON candidates "
+        f"WHEN OLD.job_id IS NOT NEW.job_id OR OLD.status IS NOT NEW.status OR {_score_bin('OLD')} != {_score_bin('NEW')} "
+        f"BEGIN {_job_stats_remove('OLD')} {_job_stats_add('NEW')} END",
+    ]),
+    (6, "Embeddings des CV et des offres (BLOB float32/float16, version du modèle)", [
+        f"ALTER TABLE {table} ADD COLUMN {column}{suffix} {sql_type}"
+        for table, column in (("candidates", "cv_embedding"), ("jobs", "job_embedding"))
+        for suffix, sql_type in (("", "BLOB"), ("_dtype", "TEXT"), ("_version", "TEXT"))
+    ]),
+    (7, "Cache des analyses d'offres (métadonnées JSON et vecteurs float32)", [
+        '''
+        CREATE TABLE IF NOT EXISTS job_analysis_cache (
+            job_hash TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            analysis TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (job_hash, model_version)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS job_analysis_vectors (
+            job_hash TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            name TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (job_hash, model_version, name)
+        )
+        ''',
+    ]),
+    (8, "Magasin des CV par empreinte et cache de leurs données dérivées", [
+        '''
+        CREATE TABLE IF NOT EXISTS cv_files (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            original_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS cv_features (
+            sha256 TEXT NOT NULL,
+            name TEXT NOT NULL,
+            version TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            value BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sha256, name, version)
+        )
+        ''',
+    ]),
+    (9, "Points de reprise de l'import en masse", [
+        '''
+        CREATE TABLE IF NOT EXISTS bulk_import_items (
+            source TEXT NOT NULL,
+            item TEXT NOT NULL,
+            job_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            candidate_id INTEGER,
+            sha256 TEXT,
+            error TEXT,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, item, job_id)
+        )
+        ''',
+    ]),
+    (10, "Corpus TF-IDF partagé (comptes de termes par empreinte du texte)", [
+        # Table avec rowid: les processus relisent les documents ajoutés depuis leur dernière lecture
+        "CREATE TABLE IF NOT EXISTS tfidf_documents ("
+        "doc_key TEXT PRIMARY KEY, kind TEXT NOT NULL, term_counts TEXT NOT NULL)",
+    ]),
+]
+
+# Requêtes fréquentes de l'application et index attendu dans leur plan
+_CANDIDATE_PAGE = (
+    "SELECT c.id, c.name, c.status FROM candidates c JOIN jobs j ON j.id = c.job_id "
+    "WHERE {} ORDER BY c.id LIMIT 50"
+)
+HOT_QUERIES: Dict[str, Tuple[str, Tuple, str]] = {
+    "page de candidats par offre et statut": (
+        _CANDIDATE_PAGE.format("c.job_id = ? AND c.status = ? AND c.id > ?"), (1, "En attente", 0),
+        "idx_candidates_job_status"),
+    "page de candidats par offre": (
+        _CANDIDATE_PAGE.format("c.job_id = ? AND c.id > ?"), (1, 0), "idx_candidates_job"),
+    "page de candidats par statut": (
+        _CANDIDATE_PAGE.format("c.status = ? AND c.id > ?"), ("En attente", 0), "idx_candidates_status"),
+    "statistiques d'une offre": (
+        "SELECT status, SUM(n) AS n FROM job_stats WHERE job_id = ? GROUP BY status", (1,), "PRIMARY KEY"),
+    "entretiens d'un candidat": (
+        "SELECT * FROM interviews WHERE candidate_id = ?", (1,), "idx_interviews_candidate"),
+    "documents d'un candidat": (
+        "SELECT * FROM documents WHERE candidate_id = ?", (1,), "idx_documents_candidate"),
+}
+
+
+def _ensure_history(db: Database):
+    db.execute('''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def current_version(db: Database) -> int:
+    _ensure_history(db)
+    row = db.fetchone("SELECT MAX(version) FROM schema_migrations")
+    return row[0] or 0
+
+
+def migrate(db: Optional[Database] = None, target: Optional[int] = None) -> List[int]:
+    """
+    Applique les migrations en attente, dans l'ordre
+
+    Returns:
+        Versions appliquées par cet appel
+    """
+    db = db or get_database()
+    _ensure_history(db)
+    # Lecture sans verrou: une base à jour ne prend pas le verrou d'écriture
+    done = {row[0] for row in db.fetchall("SELECT version FROM schema_migrations")}
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version in done:
+            continue
+        with db.transaction() as conn:
+            # Relu sous le verrou d'écriture: deux processus n'appliquent pas la même migration
+            if conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)", (version, description))
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        applied.append(version)
+    return applied
+
+
+def query_plan(db: Database, sql: str, params: Tuple = ()) -> List[str]:
+    """Étapes de EXPLAIN QUERY PLAN (colonne detail)"""
+    return [row["detail"] for row in db.fetchall(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(db: Optional[Database] = None) -> Dict[str, Tuple[bool, List[str]]]:
+    """
+    Vérifie que chaque requête fréquente utilise l'index attendu
+
+    Returns:
+        {nom: (index utilisé, plan)}
+    """
+    db = db or get_database()
+    results = {}
+    for name, (sql, params, index) in HOT_QUERIES.items():
+        plan = query_plan(db, sql, params)
+        results[name] = (any(index in step for step in plan), plan)
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Migrations du schéma de la base ATS")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite")
+    parser.add_argument("--target", type=int, help="Version maximale à appliquer")
+    parser.add_argument("--check", action="store_true", help="Vérifie les plans des requêtes fréquentes")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    applied = migrate(db, target=args.target)
+    if applied:
+        print(f"✅ Migrations appliquées: {', '.join(map(str, applied))}")
+    print(f"📋 Version du schéma: {current_version(db)}")
+
+    if args.check:
+        failures = 0
+        for name, (uses_index, plan) in check_query_plans(db).items():
+            print(f"{'✅' if uses_index else '❌'} {name}: {' | '.join(plan)}")
+            failures += not uses_index
+        if failures:
+            raise SystemExit(f"{failures} requête(s) sans l'index attendu")
+
+
+if __name__ == "__main__":
+    main()
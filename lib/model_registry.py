@@ -0,0 +1,235 @@
+"""
+Registre de modèles partagé par tout le processus.
+
+ATSSystem, EnhancedATSSystem, CVImageAnalyzer et l'application Streamlit
+récupèrent leurs modèles par nom via ce registre: chaque modèle n'est chargé
+qu'une fois (à la première demande) et ses poids ne sont jamais dupliqués.
+"""
+import gc
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Callable, Dict, List, Optional
+
+# Tokenizer + modèle d'encodage (BERT, CamemBERT...)
+EncoderModel = namedtuple("EncoderModel", ["tokenizer", "model"])
+
+
+def _current_rss() -> Optional[int]:
+    """Mémoire résidente actuelle du processus en octets (None si indisponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss est un pic (Ko sous Linux, octets sous macOS): approximation faute de mieux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """Taille des poids torch d'un modèle, si elle est mesurable"""
+    candidates = [model]
+    if isinstance(model, EncoderModel):
+        candidates = [model.model]
+    elif hasattr(model, "model"):
+        # Pipelines transformers
+        candidates = [model.model]
+
+    total = 0
+    found = False
+    for candidate in candidates:
+        parameters = getattr(candidate, "parameters", None)
+        if not callable(parameters):
+            continue
+        for param in parameters():
+            total += param.numel() * param.element_size()
+            found = True
+    return total if found else None
+
+
+def _load_bert_base_uncased() -> EncoderModel:
+    from transformers import BertTokenizer, BertModel
+    return EncoderModel(
+        BertTokenizer.from_pretrained('bert-base-uncased'),
+        BertModel.from_pretrained('bert-base-uncased'),
+    )
+
+
+def _load_camembert_base() -> EncoderModel:
+    from transformers import AutoTokenizer, AutoModel
+    return EncoderModel(
+        AutoTokenizer.from_pretrained("camembert-base"),
+        AutoModel.from_pretrained("camembert-base"),
+    )
+
+
+def _load_minilm() -> Any:
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('all-MiniLM-L6-v2')
+
+
+def _load_sentiment() -> Any:
+    from transformers import pipeline
+    return pipeline(
+        "sentiment-analysis",
+        model="cardiffnlp/twitter-roberta-base-sentiment-latest"
+    )
+
+
+def _load_zero_shot() -> Any:
+    from transformers import pipeline
+    return pipeline(
+        "zero-shot-classification",
+        model="facebook/bart-large-mnli"
+    )
+
+
+def _load_tech_ner() -> Any:
+    from transformers import pipeline
+    return pipeline(
+        "ner",
+        model="dslim/bert-base-NER",
+        aggregation_strategy="simple"
+    )
+
+
+def _load_publaynet_layout() -> Any:
+    import layoutparser as lp
+    return lp.Detectron2LayoutModel(
+        'lp://PubLayNet/mask_rcnn_X_101_32x8d_FPN_3x/config',
+        extra_config=["MODEL.ROI_HEADS.SCORE_THRESH_TEST", 0.8],
+        label_map={0: "Text", 1: "Title", 2: "List", 3: "Table", 4: "Figure"}
+    )
+
+
+def _load_spacy(model_name: str) -> Callable[[], Any]:
+    def loader():
+        import spacy
+        return spacy.load(model_name)
+    return loader
+
+
+class ModelRegistry:
+    """Chargement paresseux et thread-safe de modèles nommés"""
+
+    SPACY_PREFIX = "spacy:"
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        # Un seul chargement à la fois pour que la mesure RSS soit attribuable
+        self._load_lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Déclare (ou remplace) le chargeur d'un modèle"""
+        with self._lock:
+            self._loaders[name] = loader
+
+    def _get_loader(self, name: str) -> Callable[[], Any]:
+        with self._lock:
+            if name in self._loaders:
+                return self._loaders[name]
+            if name.startswith(self.SPACY_PREFIX):
+                loader = _load_spacy(name[len(self.SPACY_PREFIX):])
+                self._loaders[name] = loader
+                return loader
+        raise KeyError(f"Modèle inconnu dans le registre: {name}")
+
+    def get(self, name: str) -> Any:
+        """Retourne le modèle, en le chargeant à la première demande"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        loader = self._get_loader(name)
+        with self._load_lock:
+            # Un autre thread a pu le charger pendant l'attente
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            print(f"📦 Chargement du modèle {name}...")
+            rss_before = _current_rss()
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = _current_rss()
+
+            with self._lock:
+                self._models[name] = model
+                self._stats[name] = {
+                    "load_seconds": round(load_seconds, 3),
+                    "rss_delta_bytes": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+                    "parameter_bytes": _parameter_bytes(model),
+                    "loaded_at": time.time(),
+                }
+            return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def loaded_names(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def unload(self, name: str) -> bool:
+        """Libère un modèle; il sera rechargé à la prochaine demande"""
+        with self._lock:
+            model = self._models.pop(name, None)
+            self._stats.pop(name, None)
+        if model is None:
+            return False
+
+        del model
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        print(f"🗑️ Modèle {name} déchargé")
+        return True
+
+    def unload_all(self):
+        for name in self.loaded_names():
+            self.unload(name)
+
+    def stats(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stats = self._stats.get(name)
+            return dict(stats, name=name) if stats else None
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Mémoire par modèle chargé et RSS total du processus"""
+        with self._lock:
+            models = [dict(stats, name=name) for name, stats in self._stats.items()]
+        return {
+            "process_rss_bytes": _current_rss(),
+            "models": models,
+        }
+
+
+# Registre unique du processus
+registry = ModelRegistry()
+registry.register("bert-base-uncased", _load_bert_base_uncased)
+registry.register("camembert-base", _load_camembert_base)
+registry.register("all-MiniLM-L6-v2", _load_minilm)
+registry.register("sentiment", _load_sentiment)
+registry.register("zero-shot", _load_zero_shot)
+registry.register("tech-ner", _load_tech_ner)
+registry.register("publaynet-layout", _load_publaynet_layout)
+
+
+def get_model(name: str) -> Any:
+    """Raccourci vers registry.get"""
+    return registry.get(name)
@@ -0,0 +1,298 @@
+"""
+Moteurs OCR interchangeables et choix du moteur par type de document.
+
+Tesseract et EasyOCR exposent la même interface (OCRBackend.recognize) sur
+une image déjà décodée (DocumentImage). La politique OCRPolicy associe à
+chaque type de document le moteur à utiliser; elle peut être recalculée à
+partir des mesures de lib.ocr_benchmark et enregistrée en JSON.
+
+EasyOCR détecte d'abord l'écriture du document (OSD Tesseract sur une image
+réduite) puis utilise un lecteur limité aux langues de cette écriture: un
+diplôme en caractères latins n'exécute que le modèle latin. Les lecteurs sont
+créés à la demande et gardés dans un LRU borné.
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .document_context import OCR_MAX_SIDE, DocumentImage
+
+DEFAULT_POLICY_PATH = os.environ.get("ATS_OCR_POLICY_PATH", "ocr_policy.json")
+# Lecteurs EasyOCR gardés en mémoire (chacun charge ses modèles de détection et reconnaissance)
+EASYOCR_MAX_READERS = int(os.environ.get("ATS_EASYOCR_MAX_READERS", "2"))
+
+# Langues EasyOCR par écriture détectée. Un document en écriture arabe (CIN
+# tunisienne) porte aussi des champs en français: son lecteur garde les trois langues
+SCRIPT_LANGUAGES = {
+    "Latin": ("fr", "en"),
+    "Arabic": ("ar", "fr", "en"),
+}
+DEFAULT_SCRIPT = "Latin"
+# Côté de l'image passée à l'OSD: la détection d'écriture n'a pas besoin de détail
+SCRIPT_DETECTION_MAX_SIDE = 1024
+
+
+@dataclass
+class OCRResult:
+    """Texte reconnu, lignes avec leur boîte (repère de l'image d'origine) et durée"""
+    text: str
+    lines: List[Dict[str, Any]] = field(default_factory=list)
+    confidence: float = 0.0
+    seconds: float = 0.0
+    backend: str = ""
+    script: str = ""
+
+
+class OCRBackend(ABC):
+    """Interface commune des moteurs OCR"""
+
+    name = "base"
+
+    def recognize(self, document: DocumentImage) -> OCRResult:
+        start = time.perf_counter()
+        result = self._recognize(document)
+        result.seconds = time.perf_counter() - start
+        result.backend = self.name
+        return result
+
+    @abstractmethod
+    def _recognize(self, document: DocumentImage) -> OCRResult:
+        """Reconnaissance propre au moteur (durée et nom du moteur ajoutés par recognize)"""
+
+
+class TesseractBackend(OCRBackend):
+    """Tesseract (pytesseract), une passe sur l'image en niveaux de gris"""
+
+    name = "tesseract"
+
+    def __init__(self, lang: str = "fra+eng", max_side: int = OCR_MAX_SIDE):
+        self.lang = lang
+        self.max_side = max_side
+
+    def _recognize(self, document: DocumentImage) -> OCRResult:
+        import pytesseract
+
+        image, factor = document.downscaled(self.max_side, gray=True)
+        # image_to_data donne en une passe les mots, leurs boîtes et leur confiance
+        data = pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+
+        lines: Dict[tuple, Dict[str, Any]] = {}
+        for i, word in enumerate(data["text"]):
+            confidence = float(data["conf"][i])
+            if not word.strip() or confidence < 0:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            left, top = data["left"][i] / factor, data["top"][i] / factor
+            right, bottom = left + data["width"][i] / factor, top + data["height"][i] / factor
+            line = lines.setdefault(key, {"words": [], "bbox": [left, top, right, bottom], "confidences": []})
+            line["words"].append(word)
+            line["confidences"].append(confidence / 100)
+            line["bbox"] = [min(line["bbox"][0], left), min(line["bbox"][1], top),
+                            max(line["bbox"][2], right), max(line["bbox"][3], bottom)]
+
+        result_lines = [
+            {"text": " ".join(line["words"]), "bbox": line["bbox"], "confidence": float(np.mean(line["confidences"]))}
+            for line in lines.values()
+        ]
+        return OCRResult(
+            text="\n".join(line["text"] for line in result_lines),
+            lines=result_lines,
+            confidence=float(np.mean([line["confidence"] for line in result_lines])) if result_lines else 0.0,
+        )
+
+
+def detect_script(document: DocumentImage, min_confidence: float = 0.5) -> Optional[str]:
+    """
+    Écriture dominante du document (« Latin », « Arabic »...) par l'OSD de Tesseract
+
+    Returns:
+        None si l'OSD échoue (trop peu de texte, osd.traineddata ou binaire
+        tesseract absent) ou si sa confiance est inférieure à min_confidence
+    """
+    try:
+        import pytesseract
+
+        image, _ = document.downscaled(SCRIPT_DETECTION_MAX_SIDE, gray=True)
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+    except (ImportError, OSError, RuntimeError):
+        # TesseractError dérive de RuntimeError, TesseractNotFoundError d'OSError:
+        # EasyOCR ne dépend pas de tesseract, l'appelant retient l'écriture par défaut
+        return None
+    if float(osd.get("script_conf", 0)) < min_confidence:
+        return None
+    return osd.get("script")
+
+
+class EasyOCRBackend(OCRBackend):
+    """EasyOCR (réseau de détection + reconnaissance), lecteur choisi selon l'écriture détectée"""
+
+    name = "easyocr"
+
+    def __init__(self, languages: Optional[tuple] = None, max_side: int = OCR_MAX_SIDE,
+                 min_confidence: float = 0.0, max_readers: int = EASYOCR_MAX_READERS,
+                 script_languages: Optional[Dict[str, tuple]] = None, default_script: str = DEFAULT_SCRIPT):
+        """
+        Args:
+            languages: Langues imposées (pas de détection d'écriture)
+            max_readers: Nombre de lecteurs gardés en mémoire (LRU)
+            script_languages: Langues EasyOCR par écriture détectée
+            default_script: Écriture retenue quand la détection échoue
+        """
+        self.languages = languages
+        self.max_side = max_side
+        self.min_confidence = min_confidence
+        self.max_readers = max(1, max_readers)
+        self.script_languages = script_languages or SCRIPT_LANGUAGES
+        self.default_script = default_script
+        self._readers: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Un verrou par jeu de langues: deux demandes du même lecteur ne le chargent qu'une fois
+        self._loading: Dict[tuple, threading.Lock] = {}
+
+    def _cached_reader(self, languages: tuple):
+        with self._lock:
+            if languages in self._readers:
+                self._readers.move_to_end(languages)
+                return self._readers[languages]
+            return None
+
+    def reader(self, languages: tuple):
+        """
+        Lecteur EasyOCR pour ces langues, créé à la première demande
+
+        Le chargement (téléchargement éventuel des modèles) se fait hors du
+        verrou du LRU: les lecteurs déjà chargés restent disponibles.
+        """
+        reader = self._cached_reader(languages)
+        if reader is not None:
+            return reader
+        with self._lock:
+            loading = self._loading.setdefault(languages, threading.Lock())
+        with loading:
+            reader = self._cached_reader(languages)
+            if reader is not None:
+                return reader
+            import easyocr
+            reader = easyocr.Reader(list(languages))
+            with self._lock:
+                self._readers[languages] = reader
+                while len(self._readers) > self.max_readers:
+                    # Les modèles du lecteur évincé sont libérés avec sa dernière référence
+                    self._readers.popitem(last=False)
+            return reader
+
+    def languages_for(self, document: DocumentImage) -> Tuple[str, tuple]:
+        """(écriture, langues) à utiliser pour ce document"""
+        if self.languages:
+            return "", tuple(self.languages)
+        script = detect_script(document)
+        if script not in self.script_languages:
+            script = self.default_script
+        return script, self.script_languages[script]
+
+    def _recognize(self, document: DocumentImage) -> OCRResult:
+        script, languages = self.languages_for(document)
+        image, factor = document.downscaled(self.max_side)
+        lines = []
+        for bbox, text, confidence in self.reader(languages).readtext(image, detail=1):
+            if confidence < self.min_confidence:
+                continue
+            x_coords = [point[0] / factor for point in bbox]
+            y_coords = [point[1] / factor for point in bbox]
+            lines.append({
+                "text": text,
+                "bbox": [min(x_coords), min(y_coords), max(x_coords), max(y_coords)],
+                "confidence": float(confidence),
+            })
+        return OCRResult(
+            text="\n".join(line["text"] for line in lines),
+            lines=lines,
+            confidence=float(np.mean([line["confidence"] for line in lines])) if lines else 0.0,
+            script=script,
+        )
+
+
+# Moteurs disponibles, instanciés à la première demande et partagés
+BACKEND_FACTORIES: Dict[str, Callable[[], OCRBackend]] = {
+    "tesseract": TesseractBackend,
+    "easyocr": EasyOCRBackend,
+}
+_backends: Dict[str, OCRBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[], OCRBackend]):
+    with _backends_lock:
+        BACKEND_FACTORIES[name] = factory
+        _backends.pop(name, None)
+
+
+def get_backend(name: str) -> OCRBackend:
+    with _backends_lock:
+        if name not in _backends:
+            if name not in BACKEND_FACTORIES:
+                raise ValueError(f"Moteur OCR inconnu: {name} (disponibles: {', '.join(BACKEND_FACTORIES)})")
+            _backends[name] = BACKEND_FACTORIES[name]()
+        return _backends[name]
+
+
+def normalize_document_type(document_type: Optional[str]) -> str:
+    """Clé de politique: 'CIN' -> 'cin', 'Diplôme' -> 'diplome', 'Permis de conduire' -> 'permis'"""
+    if not document_type:
+        return "default"
+    key = document_type.strip().lower().split()[0]
+    return key.replace("ô", "o").replace("é", "e").replace("è", "e")
+
+
+class OCRPolicy:
+    """Moteur OCR à utiliser pour chaque type de document"""
+
+    # Sans mesure, Tesseract partout (comportement historique de l'application)
+    DEFAULT_MAPPING = {"default": "tesseract"}
+
+    def __init__(self, mapping: Optional[Dict[str, str]] = None):
+        self.mapping = dict(self.DEFAULT_MAPPING)
+        self.mapping.update(mapping or {})
+
+    def backend_name(self, document_type: Optional[str]) -> str:
+        return self.mapping.get(normalize_document_type(document_type), self.mapping["default"])
+
+    def backend_for(self, document_type: Optional[str]) -> OCRBackend:
+        return get_backend(self.backend_name(document_type))
+
+    @classmethod
+    def from_benchmark(cls, results: Dict[str, Dict[str, Dict[str, float]]], min_accuracy: float = 0.9) -> "OCRPolicy":
+        """
+        Politique déduite d'un benchmark: pour chaque type, le moteur le plus
+        rapide dont la précision caractère atteint min_accuracy, sinon le plus précis
+
+        Args:
+            results: {type de document: {moteur: {"accuracy": ..., "mean_ms": ...}}}
+        """
+        mapping = {}
+        for document_type, engines in results.items():
+            good_enough = {name: m for name, m in engines.items() if m["accuracy"] >= min_accuracy}
+            if good_enough:
+                mapping[document_type] = min(good_enough, key=lambda name: good_enough[name]["mean_ms"])
+            elif engines:
+                mapping[document_type] = max(engines, key=lambda name: engines[name]["accuracy"])
+        return cls(mapping)
+
+    def save(self, path: str = DEFAULT_POLICY_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.mapping, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_POLICY_PATH) -> "OCRPolicy":
+        """Politique enregistrée, ou politique par défaut si le fichier n'existe pas"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
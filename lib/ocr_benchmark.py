@@ -0,0 +1,207 @@
+"""
+Benchmark hors ligne des moteurs OCR par type de document.
+
+    python -m lib.ocr_benchmark
+    python -m lib.ocr_benchmark --samples echantillons/ --write-policy ocr_policy.json
+
+Sans --samples, des images de CIN, de diplôme et de CV sont générées avec
+leur texte de référence (rendu du texte, bruit et léger flou pour imiter un
+scan). Un dossier d'échantillons réels suit la structure
+<type>/<nom>.png + <type>/<nom>.txt (texte attendu).
+
+Pour chaque type et chaque moteur sont mesurés la latence (moyenne et p95)
+et la précision caractère (1 - distance de Levenshtein / longueur attendue).
+"""
+import argparse
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from .document_context import DocumentImage
+from .ocr_backends import BACKEND_FACTORIES, DEFAULT_POLICY_PATH, OCRPolicy, get_backend
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+# Contenu des documents générés (texte latin: le rendu de l'arabe demande une
+# mise en forme que PIL ne fait pas sans libraqm)
+SAMPLE_TEXTS = {
+    "cin": [
+        "REPUBLIQUE TUNISIENNE\nCARTE NATIONALE D'IDENTITE\nNom: BEN ALI\nPrenom: Ahmed\n"
+        "Ne le: 12/03/1995 a Tunis\nN 0 8 4 5 2 1 7 3",
+        "CARTE NATIONALE D'IDENTITE\nNom: MANSOURI\nPrenom: Fatma\nNee le: 05/11/1998 a Sfax\n"
+        "Numero: 1234 5678 9012",
+    ],
+    "diplome": [
+        "UNIVERSITE DE TUNIS EL MANAR\nDIPLOME NATIONAL DE MASTER\nInformatique\n"
+        "Delivre a Ahmed Ben Ali\nMention: Tres bien\nTunis, le 30/06/2020\nLe President de l'Universite",
+        "ECOLE NATIONALE D'INGENIEURS DE SOUSSE\nDIPLOME D'INGENIEUR\nGenie Logiciel\n"
+        "Decerne a Fatma Mansouri\nSession 2021\nLe Directeur",
+    ],
+    "cv": [
+        "Ahmed Ben Ali\nDeveloppeur Full Stack\nahmed.benali@email.com +216 22 333 444\n"
+        "EXPERIENCE\nTechCorp 2020-2024: React, Node.js, PostgreSQL, Docker\n"
+        "FORMATION\nMaster en Informatique, Universite de Tunis, 2020\n"
+        "COMPETENCES\nPython, JavaScript, TypeScript, AWS, Kubernetes",
+        "Fatma Mansouri\nData Scientist\nfatma.mansouri@email.com\n"
+        "EXPERIENCE\nDataLab 2021-2024: machine learning, NLP, TensorFlow, pandas\n"
+        "FORMATION\nDiplome d'ingenieur, ENISo, 2021\n"
+        "LANGUES\nArabe, Francais, Anglais",
+    ],
+}
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    for path in ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "DejaVuSans.ttf", "Arial.ttf"):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1: police bitmap de taille fixe
+        return ImageFont.load_default()
+
+
+def render_sample(text: str, seed: int = 0, width: int = 1600, font_size: int = 36) -> np.ndarray:
+    """Image « scannée » (BGR) du texte: rendu, bruit gaussien et léger flou"""
+    font = _font(font_size)
+    line_height = int(font_size * 1.6)
+    lines = text.split("\n")
+    image = Image.new("L", (width, line_height * (len(lines) + 2)), color=250)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((60, line_height * (i + 1)), line, fill=20, font=font)
+    image = image.filter(ImageFilter.GaussianBlur(radius=0.6))
+
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(image, dtype=np.float32) + rng.normal(0, 12, size=(image.height, image.width))
+    gray = np.clip(pixels, 0, 255).astype(np.uint8)
+    return np.repeat(gray[:, :, None], 3, axis=2)
+
+
+def generate_samples() -> List[Tuple[str, str, DocumentImage]]:
+    """(type, texte attendu, image) pour chaque document généré"""
+    samples = []
+    for document_type, texts in SAMPLE_TEXTS.items():
+        for seed, text in enumerate(texts):
+            samples.append((document_type, text, DocumentImage(render_sample(text, seed=seed))))
+    return samples
+
+
+def load_samples(directory: str) -> List[Tuple[str, str, DocumentImage]]:
+    """Échantillons réels: <type>/<nom>.<image> avec <type>/<nom>.txt"""
+    samples = []
+    for document_type in sorted(os.listdir(directory)):
+        type_dir = os.path.join(directory, document_type)
+        if not os.path.isdir(type_dir):
+            continue
+        for filename in sorted(os.listdir(type_dir)):
+            stem, extension = os.path.splitext(filename)
+            truth_path = os.path.join(type_dir, stem + ".txt")
+            if extension.lower() in IMAGE_EXTENSIONS and os.path.exists(truth_path):
+                with open(truth_path, encoding="utf-8") as f:
+                    samples.append((document_type, f.read(), DocumentImage.from_path(os.path.join(type_dir, filename))))
+    return samples
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Distance d'édition (insertion, suppression, substitution)"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(predicted: str, expected: str) -> float:
+    """1 - CER, bornée à [0, 1], après normalisation des espaces et de la casse"""
+    predicted, expected = _normalize(predicted), _normalize(expected)
+    if not expected:
+        return 1.0 if not predicted else 0.0
+    return max(0.0, 1.0 - levenshtein(predicted, expected) / len(expected))
+
+
+def run_benchmark(samples: List[Tuple[str, str, DocumentImage]], engines: List[str],
+                  warmup: bool = True) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Mesure chaque moteur sur chaque échantillon
+
+    Returns:
+        {type: {moteur: {"accuracy", "mean_ms", "p95_ms", "samples"}}}
+    """
+    measures: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+    for engine in engines:
+        backend = get_backend(engine)
+        if warmup and samples:
+            # Le chargement des modèles n'est pas compté dans la latence
+            backend.recognize(samples[0][2])
+        for document_type, expected, document in samples:
+            start = time.perf_counter()
+            result = backend.recognize(document)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            entry = measures.setdefault(document_type, {}).setdefault(engine, {"accuracy": [], "ms": []})
+            entry["accuracy"].append(char_accuracy(result.text, expected))
+            entry["ms"].append(elapsed_ms)
+
+    return {
+        document_type: {
+            engine: {
+                "accuracy": round(float(np.mean(entry["accuracy"])), 4),
+                "mean_ms": round(float(np.mean(entry["ms"])), 1),
+                "p95_ms": round(float(np.percentile(entry["ms"], 95)), 1),
+                "samples": len(entry["ms"]),
+            }
+            for engine, entry in engines_measures.items()
+        }
+        for document_type, engines_measures in measures.items()
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Dict[str, float]]]):
+    print(f"{'Type':<10} {'Moteur':<10} {'Précision':>10} {'Moy. (ms)':>10} {'p95 (ms)':>10} {'N':>4}")
+    for document_type, engines in results.items():
+        for engine, metrics in engines.items():
+            print(f"{document_type:<10} {engine:<10} {metrics['accuracy'] * 100:>9.1f}% "
+                  f"{metrics['mean_ms']:>10.0f} {metrics['p95_ms']:>10.0f} {metrics['samples']:>4}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs OCR par type de document")
+    parser.add_argument("--samples", help="Dossier d'échantillons <type>/<nom>.png + .txt (défaut: images générées)")
+    parser.add_argument("--engines", default=",".join(BACKEND_FACTORIES), help="Moteurs à comparer")
+    parser.add_argument("--min-accuracy", type=float, default=0.9, help="Précision minimale pour la politique")
+    parser.add_argument("--write-policy", nargs="?", const=DEFAULT_POLICY_PATH, default=None,
+                        help="Enregistre la politique déduite (défaut: ocr_policy.json)")
+    args = parser.parse_args(argv)
+
+    samples = load_samples(args.samples) if args.samples else generate_samples()
+    if not samples:
+        parser.error("Aucun échantillon trouvé")
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+
+    print(f"🧪 Benchmark OCR: {len(samples)} documents, moteurs: {', '.join(engines)}")
+    results = run_benchmark(samples, engines)
+    print_report(results)
+
+    policy = OCRPolicy.from_benchmark(results, min_accuracy=args.min_accuracy)
+    print(f"📋 Politique proposée: {policy.mapping}")
+    if args.write_policy:
+        policy.save(args.write_policy)
+        print(f"💾 Politique enregistrée dans {args.write_policy}")
+
+
+if __name__ == "__main__":
+    main()
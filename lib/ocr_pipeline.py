@@ -0,0 +1,256 @@
+"""
+OCR Tesseract des images de CV.
+
+Chaque image (ou page d'un TIFF multipage) est convertie en niveaux de gris,
+réduite pour ne pas dépasser un budget de résolution (300 DPI pour une page
+A4) puis binarisée (seuil d'Otsu), et reconnue en une seule passe fra+eng.
+Les pages sont réparties sur un pool de processus Tesseract et les textes
+sont mis en cache par empreinte de l'image.
+
+Les images sont acceptées en octets, memoryview ou chemin de fichier (lu via
+mmap): l'empreinte est calculée sur le tampon d'origine, sans copie, et
+l'image n'est décodée qu'une fois, seulement si le texte n'est pas en cache.
+"""
+import hashlib
+import io
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageSequence
+
+DEFAULT_LANG = "fra+eng"
+TARGET_DPI = 300
+# Page A4 à 300 DPI (2480 x 3508 pixels)
+MAX_PIXELS = 2480 * 3508
+# Threads OpenMP par processus tesseract (les pages sont déjà parallélisées entre processus)
+TESSERACT_THREAD_LIMIT = "1"
+
+
+def limit_tesseract_threads(limit: str = TESSERACT_THREAD_LIMIT):
+    """
+    OMP_THREAD_LIMIT dans l'environnement des seuls processus tesseract
+
+    pytesseract lance tesseract avec os.environ: l'environnement de ses
+    sous-processus est complété ici, sans toucher à celui de l'application
+    (torch, spaCy gardent leurs threads). Une valeur déjà définie est respectée.
+    """
+    module = pytesseract.pytesseract
+    original = module.subprocess_args
+    if getattr(original, "thread_limit", None) is not None:
+        return
+
+    def subprocess_args(include_stdout=True):
+        kwargs = original(include_stdout)
+        env = dict(kwargs.get("env") or os.environ)
+        env.setdefault("OMP_THREAD_LIMIT", limit)
+        kwargs["env"] = env
+        return kwargs
+
+    subprocess_args.thread_limit = limit
+    module.subprocess_args = subprocess_args
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Seuil d'Otsu d'une image en niveaux de gris (uint8)"""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 127
+    levels = np.arange(256)
+    weight_background = np.cumsum(histogram)
+    weight_foreground = total - weight_background
+    cumulative_mean = np.cumsum(histogram * levels)
+    mean_background = cumulative_mean / np.maximum(weight_background, 1)
+    mean_foreground = (cumulative_mean[-1] - cumulative_mean) / np.maximum(weight_foreground, 1)
+    between_variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+    return int(np.argmax(between_variance))
+
+
+def downscale_factor(size, dpi: Optional[float], target_dpi: int = TARGET_DPI,
+                     max_pixels: int = MAX_PIXELS) -> float:
+    """Facteur de réduction (<= 1) pour respecter le budget de DPI et de pixels"""
+    factor = 1.0
+    if dpi and dpi > target_dpi:
+        factor = target_dpi / dpi
+    width, height = size
+    pixels = width * height * factor ** 2
+    if pixels > max_pixels:
+        factor *= (max_pixels / pixels) ** 0.5
+    return factor
+
+
+def preprocess_for_ocr(image: Image.Image, target_dpi: int = TARGET_DPI, max_pixels: int = MAX_PIXELS) -> Image.Image:
+    """Niveaux de gris, réduction au budget de résolution et binarisation"""
+    dpi = (image.info.get("dpi") or (None,))[0]
+    gray = image.convert("L")
+    factor = downscale_factor(gray.size, dpi, target_dpi, max_pixels)
+    if factor < 1.0:
+        new_size = (max(1, int(gray.width * factor)), max(1, int(gray.height * factor)))
+        gray = gray.resize(new_size, Image.LANCZOS)
+
+    pixels = np.asarray(gray)
+    binary = np.where(pixels > otsu_threshold(pixels), 255, 0).astype(np.uint8)
+    return Image.fromarray(binary, mode="L")
+
+
+# Octets, tampon (bytearray, memoryview, mmap) ou chemin de fichier
+ImageSource = Union[bytes, bytearray, memoryview, str, os.PathLike]
+
+
+def image_hash(image_data) -> str:
+    return hashlib.sha256(image_data).hexdigest()
+
+
+class DecodedImage:
+    """
+    Image d'un CV décodée une seule fois et partagée par les étapes d'analyse
+
+    Le décodage est paresseux: une image dont le texte est déjà en cache
+    n'est que hachée.
+    """
+
+    def __init__(self, source: ImageSource):
+        self.source = source
+        self._sha256: Optional[str] = None
+        self._pages: Optional[List[Image.Image]] = None
+
+    @classmethod
+    def of(cls, source: Union[ImageSource, "DecodedImage"]) -> "DecodedImage":
+        return source if isinstance(source, DecodedImage) else cls(source)
+
+    def _with_buffer(self, use):
+        """Applique use() au contenu brut: mmap pour un chemin, vue sans copie sinon"""
+        if isinstance(self.source, (str, os.PathLike)):
+            with open(self.source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return use(mapped)
+        return use(self.source if isinstance(self.source, bytes) else memoryview(self.source))
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = self._with_buffer(image_hash)
+        return self._sha256
+
+    @property
+    def pages(self) -> List[Image.Image]:
+        """Pages décodées (plusieurs pour un TIFF multipage)"""
+        if self._pages is None:
+            self._pages = self._with_buffer(self._decode)
+        return self._pages
+
+    @staticmethod
+    def _decode(buffer) -> List[Image.Image]:
+        # Un mmap se lit comme un fichier; BytesIO partage le tampon d'un objet bytes
+        image = Image.open(buffer if isinstance(buffer, mmap.mmap) else io.BytesIO(buffer))
+        pages = []
+        for frame in ImageSequence.Iterator(image):
+            # copy() force le décodage tant que le tampon source est ouvert
+            page = frame.copy()
+            if "dpi" in image.info:
+                page.info.setdefault("dpi", image.info["dpi"])
+            pages.append(page)
+        return pages
+
+
+class OCRPipeline:
+    """OCR prétraité, parallèle et mis en cache"""
+
+    def __init__(self, lang: str = DEFAULT_LANG, target_dpi: int = TARGET_DPI, max_pixels: int = MAX_PIXELS,
+                 workers: Optional[int] = None, cache_size: int = 256):
+        self.requested_lang = lang
+        self.target_dpi = target_dpi
+        self.max_pixels = max_pixels
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.cache_size = cache_size
+        self._lang: Optional[str] = None
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # pytesseract lance un processus tesseract par appel: des threads suffisent à les paralléliser
+        limit_tesseract_threads()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+
+    @property
+    def lang(self) -> str:
+        """Langues demandées effectivement installées (une seule passe, sans relance)"""
+        if self._lang is None:
+            try:
+                installed = set(pytesseract.get_languages(config=""))
+                available = [code for code in self.requested_lang.split("+") if code in installed]
+                self._lang = "+".join(available) or "eng"
+            except Exception:
+                self._lang = self.requested_lang
+        return self._lang
+
+    def _cache_key(self, image: DecodedImage) -> str:
+        return f"{image.sha256}:{self.lang}:{self.target_dpi}:{self.max_pixels}"
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _remember(self, key: str, text: str):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _recognize_page(self, page: Image.Image) -> str:
+        return pytesseract.image_to_string(
+            preprocess_for_ocr(page, self.target_dpi, self.max_pixels), lang=self.lang
+        )
+
+    def ocr_many(self, images: Sequence[Union[ImageSource, DecodedImage]]) -> List[str]:
+        """
+        Texte de plusieurs images; toutes les pages non en cache sont reconnues en parallèle
+
+        Args:
+            images: Octets, memoryview, chemins de fichiers ou images déjà décodées
+
+        Returns:
+            Un texte par image (pages séparées par un saut de ligne), dans l'ordre
+        """
+        images = [DecodedImage.of(image) for image in images]
+        keys = [self._cache_key(image) for image in images]
+        texts: List[Optional[str]] = [self._cached(key) for key in keys]
+
+        # Une tâche par page de chaque image à reconnaître
+        futures = {}
+        for index, image in enumerate(images):
+            if texts[index] is None and keys[index] not in futures:
+                futures[keys[index]] = [self._pool.submit(self._recognize_page, page) for page in image.pages]
+
+        recognized = {}
+        for key, page_futures in futures.items():
+            recognized[key] = "\n".join(future.result() for future in page_futures)
+            self._remember(key, recognized[key])
+        return [text if text is not None else recognized[key] for text, key in zip(texts, keys)]
+
+    def ocr(self, image: Union[ImageSource, DecodedImage]) -> str:
+        return self.ocr_many([image])[0]
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_pipeline: Optional[OCRPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_ocr_pipeline() -> OCRPipeline:
+    """Pipeline OCR partagé par le processus"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = OCRPipeline()
+        return _pipeline
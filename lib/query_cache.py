@@ -0,0 +1,118 @@
+"""
+Cache des lectures de la base, invalidé par les écritures.
+
+Chaque résultat est rangé sous (requête, paramètres, version des données).
+La version combine deux compteurs:
+- les écritures de ce processus (Database.write_version, incrémentée à
+  chaque commit qui modifie des lignes), visibles immédiatement;
+- la table data_version, tenue à jour par des triggers SQLite, qui couvre
+  les écritures des autres processus (import en masse, serveur d'analyse).
+  Elle est relue au plus une fois par intervalle.
+
+Un rafraîchissement sans écriture ne touche donc pas la base. Le cache est
+borné en nombre d'entrées et en mémoire estimée (LRU).
+"""
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Délai maximal avant de voir une écriture faite par un autre processus
+DEFAULT_VERSION_CHECK_INTERVAL = 2.0
+
+
+def estimate_size(value: Any) -> int:
+    """Taille approximative d'un résultat (DataFrame, liste de lignes, valeur)"""
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        return int(memory_usage(deep=True).sum())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, sqlite3.Row):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """LRU de résultats de requêtes, clé (requête, paramètres, version)"""
+
+    def __init__(self, db, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 version_check_interval: float = DEFAULT_VERSION_CHECK_INTERVAL):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_check_interval = version_check_interval
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._external_version = 0
+        self._external_checked_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _read_external_version(self) -> int:
+        try:
+            row = self.db.fetchone("SELECT version FROM data_version WHERE id = 1")
+        except sqlite3.OperationalError:
+            # Base pas encore migrée: seules les écritures locales comptent
+            return 0
+        return row[0] if row else 0
+
+    def version(self) -> Tuple[int, int]:
+        """(écritures locales, compteur des triggers relu au plus une fois par intervalle)"""
+        now = time.monotonic()
+        if now - self._external_checked_at >= self.version_check_interval:
+            self._external_version = self._read_external_version()
+            self._external_checked_at = now
+        return self.db.write_version, self._external_version
+
+    def get(self, sql: str, params: Tuple, loader: Callable[[], Any]) -> Any:
+        """
+        Résultat en cache pour cette requête, sinon loader() mis en cache
+
+        Le résultat est partagé entre les appels: il ne doit pas être modifié.
+        """
+        key = (sql, tuple(params), self.version())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = loader()
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self._bytes += size
+                # Les entrées d'anciennes versions ne sont plus demandées: le LRU les évince en premier
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_size
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,196 @@
+"""
+Score final et statut des candidats: politique de pondération et recalcul en masse.
+
+    python -m lib.score_recompute --dry-run
+    python -m lib.score_recompute --weights 0.4,0.2,0.2,0.2 --threshold 65
+    python -m lib.score_recompute --policy score_policy.json --job-id 3
+
+Le score final est la somme pondérée des quatre scores (CV, entretien écrit,
+entretien vidéo, documents); le statut dépend du seuil. Le recalcul charge les
+scores de tous les candidats complets dans un tableau numpy, applique la
+politique en une opération et réécrit les lignes modifiées par un seul
+executemany, dans la transaction qui a lu les scores. --dry-run affiche les
+changements sans rien écrire.
+"""
+import argparse
+import json
+import os
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .database import DEFAULT_DB_PATH, Database, get_database
+
+DEFAULT_POLICY_PATH = os.environ.get("ATS_SCORE_POLICY_PATH", "score_policy.json")
+SCORE_COLUMNS = ("cv_match_score", "written_interview_score", "video_interview_score", "documents_score")
+
+
+@dataclass(frozen=True)
+class ScorePolicy:
+    """Pondération des scores et seuil de présélection"""
+    cv_weight: float = 0.3
+    written_weight: float = 0.25
+    video_weight: float = 0.25
+    documents_weight: float = 0.2
+    threshold: float = 70.0
+    accepted_status: str = "Présélectionné"
+    rejected_status: str = "Rejeté"
+
+    @property
+    def weights(self) -> np.ndarray:
+        """Poids dans l'ordre de SCORE_COLUMNS"""
+        return np.array([self.cv_weight, self.written_weight, self.video_weight, self.documents_weight])
+
+    def final_scores(self, scores: np.ndarray) -> np.ndarray:
+        """Scores finaux d'une matrice n x 4 de scores (ordre de SCORE_COLUMNS)"""
+        return np.asarray(scores, dtype=np.float64) @ self.weights
+
+    def statuses(self, final_scores: np.ndarray) -> np.ndarray:
+        return np.where(np.asarray(final_scores) >= self.threshold, self.accepted_status, self.rejected_status)
+
+    def final_score(self, cv_match_score: float, written_score: float, video_score: float,
+                    documents_score: float) -> float:
+        return float(self.final_scores(np.array([cv_match_score, written_score, video_score, documents_score])))
+
+    def status_for(self, final_score: float) -> str:
+        return self.accepted_status if final_score >= self.threshold else self.rejected_status
+
+    def save(self, path: str = DEFAULT_POLICY_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_POLICY_PATH) -> "ScorePolicy":
+        """Politique enregistrée, ou politique par défaut si le fichier n'existe pas"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+
+@dataclass
+class RecomputeResult:
+    """Candidats examinés et changements (id, ancien score, nouveau score, ancien statut, nouveau statut)"""
+    considered: int
+    changes: List[Tuple[int, Optional[float], float, Optional[str], str]] = field(default_factory=list)
+    written: bool = False
+
+    def transitions(self) -> Dict[Tuple[Optional[str], str], int]:
+        """Nombre de candidats par changement de statut"""
+        counts: Dict[Tuple[Optional[str], str], int] = {}
+        for _, _, _, old_status, new_status in self.changes:
+            if old_status != new_status:
+                counts[(old_status, new_status)] = counts.get((old_status, new_status), 0) + 1
+        return counts
+
+
+def _load_scores(conn, job_id: Optional[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(ids, scores n x 4, anciens scores finaux avec NaN, anciens statuts) des candidats aux quatre scores"""
+    conditions = [f"{column} IS NOT NULL" for column in SCORE_COLUMNS]
+    params: List[Any] = []
+    if job_id is not None:
+        conditions.append("job_id = ?")
+        params.append(job_id)
+    rows = conn.execute(
+        f"SELECT id, {', '.join(SCORE_COLUMNS)}, final_score, status FROM candidates "
+        f"WHERE {' AND '.join(conditions)} ORDER BY id",
+        params
+    ).fetchall()
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    scores = np.array([tuple(row[1:5]) for row in rows], dtype=np.float64).reshape(len(rows), len(SCORE_COLUMNS))
+    old_final = np.array([np.nan if row[5] is None else row[5] for row in rows], dtype=np.float64)
+    old_status = np.array([row[6] for row in rows], dtype=object)
+    return ids, scores, old_final, old_status
+
+
+def recompute_scores(policy: ScorePolicy, db: Optional[Database] = None, job_id: Optional[int] = None,
+                     dry_run: bool = False, tolerance: float = 1e-6) -> RecomputeResult:
+    """
+    Recalcule le score final et le statut des candidats dont les quatre scores sont connus
+
+    Args:
+        policy: Pondération et seuil à appliquer
+        job_id: Seulement les candidats de cette offre
+        dry_run: Calcule les changements sans écrire
+        tolerance: Écart de score final en dessous duquel la ligne n'est pas réécrite
+    """
+    db = db or get_database()
+    # Lecture et écriture dans la même transaction: aucun score modifié entre les deux n'est écrasé
+    # (une simulation se contente d'une lecture, sans prendre le verrou d'écriture)
+    with (nullcontext(db.connection) if dry_run else db.transaction()) as conn:
+        ids, scores, old_final, old_status = _load_scores(conn, job_id)
+        new_final = policy.final_scores(scores)
+        new_status = policy.statuses(new_final)
+
+        changed = (
+            np.isnan(old_final)
+            | (np.abs(np.nan_to_num(old_final) - new_final) > tolerance)
+            | (old_status != new_status.astype(object))
+        )
+        positions = np.flatnonzero(changed)
+        result = RecomputeResult(considered=len(ids), changes=[
+            (int(ids[p]), None if np.isnan(old_final[p]) else float(old_final[p]), float(new_final[p]),
+             old_status[p], str(new_status[p]))
+            for p in positions
+        ])
+
+        if not dry_run and result.changes:
+            conn.executemany(
+                "UPDATE candidates SET final_score = ?, status = ? WHERE id = ?",
+                [(new_score, status, candidate_id) for candidate_id, _, new_score, _, status in result.changes]
+            )
+            result.written = True
+    return result
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    weights = [float(weight) for weight in value.split(",")]
+    if len(weights) != len(SCORE_COLUMNS):
+        raise argparse.ArgumentTypeError(f"{len(SCORE_COLUMNS)} poids attendus (CV, écrit, vidéo, documents)")
+    return dict(zip(("cv_weight", "written_weight", "video_weight", "documents_weight"), weights))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Recalcul des scores finaux et des statuts des candidats")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite")
+    parser.add_argument("--policy", default=DEFAULT_POLICY_PATH, help="Politique JSON (défaut si absente)")
+    parser.add_argument("--weights", type=_parse_weights, help="Poids CV,écrit,vidéo,documents (ex. 0.3,0.25,0.25,0.2)")
+    parser.add_argument("--threshold", type=float, help="Seuil de présélection")
+    parser.add_argument("--job-id", type=int, help="Seulement les candidats de cette offre")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche les changements sans écrire")
+    parser.add_argument("--show", type=int, default=20, help="Nombre de changements affichés")
+    parser.add_argument("--save-policy", action="store_true", help="Enregistre la politique utilisée dans --policy")
+    args = parser.parse_args(argv)
+
+    overrides = dict(args.weights or {})
+    if args.threshold is not None:
+        overrides["threshold"] = args.threshold
+    policy = ScorePolicy(**dict(asdict(ScorePolicy.load(args.policy)), **overrides))
+
+    db = Database(args.db)
+    db.init_schema()
+    result = recompute_scores(policy, db, job_id=args.job_id, dry_run=args.dry_run)
+
+    print(f"📋 {result.considered} candidats examinés, {len(result.changes)} à mettre à jour")
+    for candidate_id, old_score, new_score, old_status, new_status in result.changes[:args.show]:
+        old_text = "-" if old_score is None else f"{old_score:.1f}"
+        print(f"  #{candidate_id}: {old_text} -> {new_score:.1f}  {old_status or '-'} -> {new_status}")
+    if len(result.changes) > args.show:
+        print(f"  ... {len(result.changes) - args.show} autres")
+    for (old_status, new_status), count in sorted(result.transitions().items(), key=lambda item: -item[1]):
+        print(f"🔁 {old_status or '-'} -> {new_status}: {count}")
+
+    if args.dry_run:
+        print("🧪 Simulation: aucune ligne modifiée")
+    elif result.written:
+        print(f"✅ {len(result.changes)} candidats mis à jour")
+    if args.save_policy:
+        policy.save(args.policy)
+        print(f"💾 Politique enregistrée dans {args.policy}")
+
+
+if __name__ == "__main__":
+    main()
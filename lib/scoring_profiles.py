@@ -0,0 +1,198 @@
+"""
+Profils de scoring et chargement paresseux des modèles de l'ATS.
+
+Un profil liste les étapes d'analyse à exécuter; les modèles d'une étape ne
+sont chargés (via le registre de modèles) que lorsqu'elle est utilisée pour
+la première fois.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Union
+
+from .model_registry import registry
+
+# Étapes disponibles et rôle de chacune
+STAGES = {
+    "regex": "Extraction de compétences par expressions régulières",
+    "tfidf": "Similarité TF-IDF",
+    "sentence": "Embeddings Sentence Transformers (all-MiniLM-L6-v2)",
+    "bert": "Embeddings BERT (bert-base-uncased)",
+    "spacy": "Entités nommées spaCy",
+    "custom_ner": "Modèle NER personnalisé pour le recrutement",
+    "sentiment": "Analyse de sentiment (RoBERTa)",
+    "zero_shot": "Classification zero-shot (bart-large-mnli)",
+    "tech_ner": "Entités techniques (dslim/bert-base-NER)",
+}
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    """Ensemble nommé d'étapes d'analyse"""
+    name: str
+    stages: FrozenSet[str]
+
+    def uses(self, stage: str) -> bool:
+        return stage in self.stages
+
+
+SCORING_PROFILES = {
+    "fast": ScoringProfile("fast", frozenset({"regex", "tfidf", "sentence"})),
+    "standard": ScoringProfile("standard", frozenset({"regex", "tfidf", "sentence", "bert", "spacy", "custom_ner"})),
+    "full": ScoringProfile("full", frozenset(STAGES)),
+}
+
+DEFAULT_PROFILE = "full"
+
+
+def get_profile(profile: Union[str, ScoringProfile, None]) -> ScoringProfile:
+    """Résout un nom de profil (ou un profil déjà construit)"""
+    if isinstance(profile, ScoringProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in SCORING_PROFILES:
+        raise ValueError(f"Profil de scoring inconnu: {name} (disponibles: {', '.join(SCORING_PROFILES)})")
+    return SCORING_PROFILES[name]
+
+
+def weighted_score(components: Dict[str, float], weights: Dict[str, float]) -> float:
+    """
+    Score pondéré sur 100, les poids étant renormalisés sur les composantes
+    effectivement calculées par le profil
+    """
+    available = {key: weight for key, weight in weights.items() if components.get(key) is not None}
+    total_weight = sum(available.values())
+    if total_weight == 0:
+        return 0.0
+    return sum(components[key] * weight for key, weight in available.items()) / total_weight * 100
+
+
+class LazyModelsMixin:
+    """
+    Accès paresseux aux modèles partagés, limité aux étapes du profil choisi.
+    Les classes déclarent les étapes qu'elles savent exécuter dans SUPPORTED_STAGES.
+    """
+
+    SUPPORTED_STAGES: FrozenSet[str] = frozenset(STAGES)
+    # À incrémenter quand le contenu des analyses change (invalide le cache des offres)
+    ANALYSIS_VERSION = "1"
+    # Découpage des textes longs pour les embeddings BERT (voir embeddings.embed_chunked)
+    EMBEDDING_MAX_CHUNKS = 8
+    EMBEDDING_POOLING = "mean"
+
+    # Modèles à charger pour chaque étape
+    STAGE_ATTRIBUTES = {
+        "spacy": ["nlp_fr", "nlp_en"],
+        "custom_ner": ["custom_nlp"],
+        "bert": ["bert_model"],
+        "sentence": ["sentence_model"],
+        "sentiment": ["sentiment_analyzer"],
+        "zero_shot": ["classifier"],
+        "tech_ner": ["tech_ner"],
+    }
+
+    def _init_models(self, profile: Union[str, ScoringProfile, None] = None, preload: bool = False):
+        self.profile = get_profile(profile)
+        self._model_report: Dict[str, Dict[str, Any]] = {}
+        self._nlp_fr_name: Optional[str] = None
+        self._custom_nlp = None
+
+        stages = sorted(self.profile.stages & self.SUPPORTED_STAGES)
+        print(f"⚙️ Profil de scoring '{self.profile.name}': {', '.join(stages)}")
+        if preload:
+            self.preload_models()
+
+    def analysis_version(self) -> str:
+        """Identifiant des modèles et étapes utilisés, pour invalider les analyses en cache"""
+        stages = ",".join(sorted(self.profile.stages & self.SUPPORTED_STAGES))
+        chunking = f"{self.EMBEDDING_POOLING}x{self.EMBEDDING_MAX_CHUNKS}"
+        return f"{type(self).__name__}/v{self.ANALYSIS_VERSION}/{chunking}/{stages}"
+
+    def uses(self, stage: str) -> bool:
+        """L'étape fait-elle partie du profil actif?"""
+        return stage in self.SUPPORTED_STAGES and self.profile.uses(stage)
+
+    def _record_load(self, name: str, wait_seconds: float, rss_delta_bytes: Optional[int] = None):
+        if name not in self._model_report:
+            self._model_report[name] = {
+                "name": name,
+                "load_seconds": round(wait_seconds, 3),
+                "rss_delta_bytes": rss_delta_bytes,
+            }
+
+    def _model(self, name: str) -> Any:
+        start = time.perf_counter()
+        model = registry.get(name)
+        if name not in self._model_report:
+            stats = registry.stats(name) or {}
+            self._record_load(name, time.perf_counter() - start, stats.get("rss_delta_bytes"))
+        return model
+
+    @property
+    def nlp_fr(self):
+        if self._nlp_fr_name is None:
+            try:
+                self._model("spacy:fr_core_news_sm")
+                self._nlp_fr_name = "spacy:fr_core_news_sm"
+            except Exception:
+                print("⚠️ Modèle français non trouvé, utilisation du modèle anglais")
+                self._nlp_fr_name = "spacy:en_core_web_sm"
+        return self._model(self._nlp_fr_name)
+
+    @property
+    def nlp_en(self):
+        return self._model("spacy:en_core_web_sm")
+
+    @property
+    def custom_nlp(self):
+        if self._custom_nlp is None:
+            from .custom_ner_trainer import CustomNERTrainer
+            start = time.perf_counter()
+            self._custom_nlp = CustomNERTrainer().get_pipeline()
+            self._record_load("custom_ner", time.perf_counter() - start)
+        return self._custom_nlp
+
+    @property
+    def bert_tokenizer(self):
+        return self._model("bert-base-uncased").tokenizer
+
+    @property
+    def bert_model(self):
+        return self._model("bert-base-uncased").model
+
+    @property
+    def sentence_model(self):
+        return self._model("all-MiniLM-L6-v2")
+
+    @property
+    def sentiment_analyzer(self):
+        return self._model("sentiment")
+
+    @property
+    def classifier(self):
+        return self._model("zero-shot")
+
+    @property
+    def tech_ner(self):
+        return self._model("tech-ner")
+
+    def preload_models(self):
+        """Charge immédiatement tous les modèles du profil et affiche le rapport"""
+        for stage in sorted(self.profile.stages & self.SUPPORTED_STAGES):
+            for attribute in self.STAGE_ATTRIBUTES.get(stage, []):
+                getattr(self, attribute)
+        self.print_loading_report()
+
+    def loading_report(self) -> List[Dict[str, Any]]:
+        """Modèles chargés par cette instance et temps passé à les obtenir"""
+        return list(self._model_report.values())
+
+    def print_loading_report(self):
+        report = self.loading_report()
+        if not report:
+            print("📋 Aucun modèle chargé pour l'instant")
+            return
+        print(f"📋 Modèles chargés (profil '{self.profile.name}'):")
+        for entry in report:
+            rss = entry.get("rss_delta_bytes")
+            rss_text = f", +{rss / 1024 ** 2:.0f} Mo" if rss else ""
+            print(f"  - {entry['name']}: {entry['load_seconds']:.2f}s{rss_text}")
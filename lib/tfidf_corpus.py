@@ -0,0 +1,384 @@
+"""
+Modèle TF-IDF / BM25 partagé sur le corpus des CV et des offres.
+
+Au lieu d'ajuster un TfidfVectorizer sur deux documents à chaque comparaison,
+chaque texte est compté une seule fois puis ajouté au corpus: le vocabulaire
+et les fréquences documentaires (DF) sont mis à jour incrémentalement, et les
+comptes de termes sont conservés dans une matrice creuse CSR. Comparer une
+offre à tous les CV revient à un seul produit matrice creuse x vecteur; seules
+les lignes demandées sont pondérées par l'IDF courante.
+
+Le corpus est enregistré dans la table tfidf_documents (comptes de termes par
+empreinte du texte): tous les processus et tous les redémarrages voient les
+mêmes documents, donc les mêmes IDF. Il se remplit à partir des offres et des
+textes de CV enregistrés:
+
+    python -m lib.tfidf_corpus
+
+similarity() et score_texts() n'ajoutent rien au corpus: des textes quelconques
+(requêtes de l'API comprises) sont comparés avec les IDF du corpus tel qu'il est.
+"""
+import argparse
+import hashlib
+import json
+import math
+import threading
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from .database import DEFAULT_DB_PATH, Database, get_database
+from .document_extraction import EXTRACTION_VERSION
+
+
+def text_key(text: str) -> str:
+    """Identifiant par défaut d'un document: empreinte SHA-256 de son texte"""
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class TfidfCorpus:
+    """Corpus incrémental: vocabulaire, fréquences documentaires et comptes CSR"""
+
+    def __init__(self, stop_words: Optional[str] = "english", k1: float = 1.5, b: float = 0.75,
+                 db: Optional[Database] = None, persist: bool = True):
+        """
+        Args:
+            db: Base où le corpus est enregistré (base partagée par défaut)
+            persist: False pour un corpus en mémoire seulement, propre à ce processus
+        """
+        self._analyzer = CountVectorizer(stop_words=stop_words).build_analyzer()
+        self.k1 = k1
+        self.b = b
+        self._db = db
+        self.persist = persist
+
+        self.vocabulary: Dict[str, int] = {}
+        self._df = np.zeros(1024, dtype=np.int64)
+        self._rows: Dict[str, int] = {}
+        # Identifiants fournis par l'appelant (candidate_id, job_id...) -> empreinte du texte
+        self._aliases: Dict[Hashable, str] = {}
+        self._kinds: List[str] = []
+        self._doc_lengths: List[int] = []
+
+        # Matrice CSR des comptes, construite par morceaux
+        self._indptr: List[int] = [0]
+        self._indices: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+        self._matrix: Optional[sparse.csr_matrix] = None
+
+        self._last_rowid = 0
+        self._schema_ready = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+
+    # --- Construction -------------------------------------------------
+
+    def _term_counts(self, text: str) -> Dict[str, int]:
+        return dict(Counter(self._analyzer(text)))
+
+    def _add_counts(self, key: str, kind: str, term_counts: Dict[str, int]):
+        """Ajoute les comptes d'un document en mémoire (vocabulaire et DF étendus)"""
+        if key in self._rows:
+            return
+        for term in term_counts:
+            if term not in self.vocabulary:
+                self.vocabulary[term] = len(self.vocabulary)
+        if len(self.vocabulary) > len(self._df):
+            self._df = np.concatenate([self._df, np.zeros(max(len(self._df), len(self.vocabulary)), dtype=np.int64)])
+
+        indices = np.array(sorted(self.vocabulary[term] for term in term_counts), dtype=np.int32)
+        terms = {self.vocabulary[term]: count for term, count in term_counts.items()}
+        counts = np.array([terms[i] for i in indices.tolist()], dtype=np.float32)
+        self._df[indices] += 1
+
+        self._rows[key] = len(self._kinds)
+        self._kinds.append(kind)
+        self._doc_lengths.append(int(counts.sum()))
+        self._indices.append(indices)
+        self._counts.append(counts)
+        self._indptr.append(self._indptr[-1] + len(indices))
+        self._matrix = None
+
+    def refresh(self):
+        """Charge les documents enregistrés (par ce processus ou d'autres) depuis la dernière lecture"""
+        if not self.persist:
+            return
+        with self._lock:
+            if not self._schema_ready:
+                # Table tfidf_documents (lib.migrations)
+                self.db.init_schema()
+                self._schema_ready = True
+            for rowid, key, kind, term_counts in self.db.fetchall(
+                "SELECT rowid, doc_key, kind, term_counts FROM tfidf_documents WHERE rowid > ? ORDER BY rowid",
+                (self._last_rowid,)
+            ):
+                self._add_counts(key, kind, json.loads(term_counts))
+                self._last_rowid = rowid
+
+    def add_many(self, texts: Sequence[str], kind: str = "cv",
+                 doc_ids: Optional[Sequence[Hashable]] = None) -> List[Hashable]:
+        """
+        Ajoute des documents au corpus (un texte déjà présent n'est pas ajouté deux fois)
+
+        Args:
+            texts: Textes des documents
+            kind: Nature des documents ("cv" ou "job")
+            doc_ids: Identifiants (candidate_id, job_id...); empreinte du texte par défaut
+
+        Returns:
+            Identifiants des documents, dans l'ordre
+        """
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            self.refresh()
+            new = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows and key not in new:
+                    new[key] = self._term_counts(text)
+            if self.persist:
+                if new:
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO tfidf_documents (doc_key, kind, term_counts) VALUES (?, ?, ?)",
+                        [(key, kind, json.dumps(counts, ensure_ascii=False)) for key, counts in new.items()]
+                    )
+                    # Relu depuis la table: même ordre des documents que dans les autres processus
+                    self.refresh()
+            else:
+                for key, counts in new.items():
+                    self._add_counts(key, kind, counts)
+
+            if doc_ids is None:
+                return list(keys)
+            for doc_id, key in zip(doc_ids, keys):
+                self._aliases[doc_id] = key
+            return list(doc_ids)
+
+    def add(self, text: str, kind: str = "cv", doc_id: Optional[Hashable] = None) -> Hashable:
+        """Ajoute un document au corpus (sans effet s'il y est déjà); renvoie son identifiant"""
+        return self.add_many([text], kind, None if doc_id is None else [doc_id])[0]
+
+    def seed_from_database(self, batch_size: int = 500) -> int:
+        """
+        Ajoute au corpus les descriptions des offres et les textes de CV extraits (cv_features)
+
+        Returns:
+            Nombre de documents du corpus
+        """
+        self.refresh()
+        for kind, sql, params in (
+            ("job", "SELECT description FROM jobs WHERE description IS NOT NULL ORDER BY id", ()),
+            ("cv", "SELECT value FROM cv_features WHERE name = 'text' AND version = ? AND kind = 'json' ORDER BY rowid",
+             (EXTRACTION_VERSION,)),
+        ):
+            cursor = self.db.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                texts = [row[0] if kind == "job" else json.loads(row[0]) for row in rows]
+                self.add_many([text for text in texts if text and text.strip()], kind=kind)
+        return len(self)
+
+    # --- Pondérations -------------------------------------------------
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.vocabulary)
+
+    def idf(self) -> np.ndarray:
+        """IDF lissée (même formule que TfidfVectorizer: ln((1+N)/(1+df)) + 1)"""
+        n_docs = len(self._kinds)
+        return np.log((1 + n_docs) / (1 + self._df[:self.n_terms])) + 1.0
+
+    def bm25_idf(self) -> np.ndarray:
+        n_docs = len(self._kinds)
+        df = self._df[:self.n_terms]
+        return np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def count_matrix(self) -> sparse.csr_matrix:
+        """Comptes bruts de tous les documents (une ligne par document, dans l'ordre d'ajout)"""
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != self.n_terms:
+                self._matrix = self._count_rows(np.arange(len(self._kinds)))
+            return self._matrix
+
+    def _count_rows(self, rows: np.ndarray) -> sparse.csr_matrix:
+        """Comptes bruts des lignes demandées, sans reconstruire la matrice complète"""
+        if self._matrix is not None and self._matrix.shape[1] == self.n_terms:
+            return self._matrix[rows]
+        lengths = [len(self._indices[row]) for row in rows.tolist()]
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.concatenate([self._indices[row] for row in rows.tolist()]) if len(rows) else np.zeros(0, dtype=np.int32)
+        counts = np.concatenate([self._counts[row] for row in rows.tolist()]) if len(rows) else np.zeros(0, dtype=np.float32)
+        return sparse.csr_matrix((counts, indices, indptr), shape=(len(rows), self.n_terms))
+
+    def _tfidf_rows(self, rows: np.ndarray) -> sparse.csr_matrix:
+        """TF-IDF normalisé L2 des lignes demandées, avec l'IDF courante"""
+        return normalize(self._count_rows(rows) @ sparse.diags(self.idf().astype(np.float32)))
+
+    def _rows_for(self, doc_ids: Sequence[Hashable]) -> np.ndarray:
+        return np.array([self._rows[self._aliases.get(doc_id, doc_id)] for doc_id in doc_ids], dtype=np.int64)
+
+    def _query_vector(self, text: str, weighting: str) -> sparse.csr_matrix:
+        """Vecteur d'une requête, sans modifier le corpus (termes inconnus ignorés)"""
+        terms = Counter(term for term in self._analyzer(text) if term in self.vocabulary)
+        indices = np.array(sorted(self.vocabulary[term] for term in terms), dtype=np.int32)
+        counts_by_index = {self.vocabulary[term]: count for term, count in terms.items()}
+        counts = np.array([counts_by_index[i] for i in indices.tolist()], dtype=np.float32)
+        vector = sparse.csr_matrix(
+            (counts, indices, np.array([0, len(indices)])), shape=(1, self.n_terms)
+        )
+        if weighting == "bm25":
+            # BM25: la requête ne compte que la présence des termes
+            vector.data[:] = 1.0
+            return vector
+        return normalize(vector @ sparse.diags(self.idf().astype(np.float32)))
+
+    def _bm25_matrix(self, rows: np.ndarray) -> sparse.csr_matrix:
+        counts = self._count_rows(rows)
+        lengths = np.asarray(self._doc_lengths, dtype=np.float32)
+        average_length = max(float(lengths.mean()), 1.0) if len(lengths) else 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+
+        weighted = counts.copy()
+        row_norms = np.repeat(norms, np.diff(weighted.indptr))
+        weighted.data = weighted.data * (self.k1 + 1) / (weighted.data + row_norms)
+        return weighted @ sparse.diags(self.bm25_idf().astype(np.float32))
+
+    # --- Similarités --------------------------------------------------
+
+    def vectors(self, doc_ids: Sequence[Hashable]) -> sparse.csr_matrix:
+        """Lignes TF-IDF normalisées des documents demandés"""
+        with self._lock:
+            return self._tfidf_rows(self._rows_for(doc_ids))
+
+    def _term_weights(self, term_counts: Dict[str, int]) -> Dict[str, float]:
+        """Poids TF-IDF d'un texte, terme par terme (un terme absent du corpus a df = 0)"""
+        n_docs = len(self._kinds)
+        weights = {}
+        for term, count in term_counts.items():
+            index = self.vocabulary.get(term)
+            df = int(self._df[index]) if index is not None else 0
+            weights[term] = count * (math.log((1 + n_docs) / (1 + df)) + 1.0)
+        return weights
+
+    def similarity(self, text_a: str, text_b: str) -> float:
+        """
+        Similarité cosinus TF-IDF entre deux textes, avec les IDF du corpus
+
+        Les textes ne sont pas ajoutés au corpus: le score d'une paire ne
+        dépend que du corpus enregistré, pas des comparaisons déjà faites.
+        """
+        with self._lock:
+            self.refresh()
+            weights_a = self._term_weights(self._term_counts(text_a))
+            weights_b = self._term_weights(self._term_counts(text_b))
+        dot = sum(weight * weights_b[term] for term, weight in weights_a.items() if term in weights_b)
+        norm = math.sqrt(sum(w * w for w in weights_a.values())) * math.sqrt(sum(w * w for w in weights_b.values()))
+        return dot / norm if norm else 0.0
+
+    def score_texts(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        """
+        Similarité cosinus TF-IDF d'une requête avec chacun des textes (comme similarity())
+
+        Ni la requête ni les textes ne sont ajoutés au corpus; les termes absents
+        du corpus reçoivent l'IDF d'un terme de df nul.
+        """
+        with self._lock:
+            self.refresh()
+            n_docs = len(self._kinds)
+            # Vocabulaire du corpus prolongé localement par les termes nouveaux de ces textes
+            vocabulary = dict(self.vocabulary)
+            indices, counts, indptr = [], [], [0]
+            for text in [query, *texts]:
+                for term, count in self._term_counts(text).items():
+                    indices.append(vocabulary.setdefault(term, len(vocabulary)))
+                    counts.append(count)
+                indptr.append(len(indices))
+            df = np.zeros(len(vocabulary), dtype=np.int64)
+            df[:self.n_terms] = self._df[:self.n_terms]
+
+        idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+        matrix = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr)),
+            shape=(len(texts) + 1, len(vocabulary))
+        )
+        matrix = normalize(matrix @ sparse.diags(idf))
+        return np.asarray((matrix[1:] @ matrix[0].T).todense()).ravel()
+
+    def score_documents(self, query: str, doc_ids: Optional[Sequence[Hashable]] = None,
+                        kind: Optional[str] = "cv", weighting: str = "tfidf") -> Tuple[List[Hashable], np.ndarray]:
+        """
+        Score d'une requête (typiquement une offre) contre des documents du corpus
+
+        Args:
+            query: Texte de la requête (non ajouté au corpus)
+            doc_ids: Documents à scorer; par défaut tous ceux de nature kind
+            kind: Nature des documents quand doc_ids n'est pas fourni (None: tous)
+            weighting: "tfidf" (cosinus, entre 0 et 1) ou "bm25" (non borné)
+
+        Returns:
+            (identifiants, scores) dans le même ordre
+        """
+        if weighting not in ("tfidf", "bm25"):
+            raise ValueError(f"Pondération inconnue: {weighting}")
+        with self._lock:
+            self.refresh()
+            if doc_ids is None:
+                doc_ids = [doc_id for doc_id, row in self._rows.items() if kind is None or self._kinds[row] == kind]
+            doc_ids = list(doc_ids)
+            if not doc_ids:
+                return [], np.zeros(0, dtype=np.float32)
+
+            rows = self._rows_for(doc_ids)
+            if weighting == "bm25":
+                matrix = self._bm25_matrix(rows)
+            else:
+                matrix = self._tfidf_rows(rows)
+            query_vector = self._query_vector(query, weighting)
+
+        scores = np.asarray((matrix @ query_vector.T).todense()).ravel()
+        return doc_ids, scores
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": len(self._kinds),
+                "cv": self._kinds.count("cv"),
+                "job": self._kinds.count("job"),
+                "terms": self.n_terms,
+                "stored_entries": self._indptr[-1],
+            }
+
+
+# Corpus unique du processus, partagé par les systèmes ATS (enregistré dans la base par défaut)
+shared_corpus = TfidfCorpus()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Remplissage du corpus TF-IDF à partir des offres et des CV")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents par transaction")
+    args = parser.parse_args(argv)
+
+    corpus = TfidfCorpus(db=Database(args.db))
+    corpus.seed_from_database(batch_size=args.batch_size)
+    stats = corpus.stats()
+    print(f"✅ {stats['documents']} documents ({stats['cv']} CV, {stats['job']} offres), {stats['terms']} termes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Découpage en fenêtres et regroupement par longueur des embeddings."""
+import pytest
+
+pytest.importorskip("torch")
+
+from lib.embeddings import chunk_windows, length_buckets
+
+
+def test_short_document_is_a_single_window():
+    assert chunk_windows(100, 510, 64) == [(0, 100)]
+    assert chunk_windows(510, 510, 64) == [(0, 510)]
+
+
+def test_windows_cover_document_with_fixed_overlap():
+    for n_tokens in (511, 700, 893, 894, 1000, 2048, 5000):
+        windows = chunk_windows(n_tokens, 512, 128)
+        assert windows[0][0] == 0
+        assert windows[-1][1] == n_tokens
+        assert all(end - start <= 512 for start, end in windows)
+        for (_, previous_end), (start, _) in zip(windows, windows[1:]):
+            assert previous_end - start == 128, (n_tokens, windows)
+
+
+def test_last_window_is_not_pulled_back_onto_the_previous_one():
+    # 1000 tokens: la dernière fenêtre commence après la précédente, elle ne la recouvre pas presque entièrement
+    assert chunk_windows(1000, 512, 128) == [(0, 512), (384, 896), (768, 1000)]
+
+
+def test_max_chunks_keeps_first_and_last_windows():
+    all_windows = chunk_windows(10000, 512, 64)
+    windows = chunk_windows(10000, 512, 64, max_chunks=4)
+    assert len(windows) == 4
+    assert windows[0] == all_windows[0] and windows[-1] == all_windows[-1]
+    assert set(windows) <= set(all_windows)
+
+
+def test_overlap_must_be_smaller_than_window():
+    with pytest.raises(ValueError):
+        chunk_windows(1000, 128, 128)
+
+
+def test_length_buckets_sorted_and_bounded():
+    lengths = [50, 10, 300, 20, 10, 500, 40]
+    buckets = length_buckets(lengths, batch_size=3)
+    assert sorted(i for bucket in buckets for i in bucket) == list(range(len(lengths)))
+    assert all(len(bucket) <= 3 for bucket in buckets)
+    flat = [lengths[i] for bucket in buckets for i in bucket]
+    assert flat == sorted(lengths)
+
+
+def test_length_buckets_token_budget():
+    lengths = [100, 100, 100, 400, 400, 1000]
+    buckets = length_buckets(lengths, batch_size=32, max_batch_tokens=800)
+    for bucket in buckets:
+        # Après padding, un lot compte len(lot) x sa plus grande longueur (sauf élément seul trop long)
+        assert len(bucket) == 1 or len(bucket) * max(lengths[i] for i in bucket) <= 800
+    assert buckets == [[0, 1, 2], [3, 4], [5]]
+
+
+def test_length_buckets_empty():
+    assert length_buckets([]) == []
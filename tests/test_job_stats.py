@@ -0,0 +1,94 @@
+"""Compteurs job_stats tenus par triggers: comparés à un GROUP BY sur candidates."""
+import pytest
+
+from lib.database import HISTOGRAM_BINS, Database
+from lib.migrations import migrate
+
+
+def expected_status_counts(db, job_id=None):
+    where, params = ("WHERE job_id = ?", (job_id,)) if job_id is not None else ("", ())
+    rows = db.fetchall(f"SELECT COALESCE(status, '') AS status, COUNT(*) AS n FROM candidates {where} GROUP BY 1", params)
+    return {row["status"]: row["n"] for row in rows}
+
+
+def expected_histogram(db, job_id=None):
+    where, params = ("WHERE job_id = ?", (job_id,)) if job_id is not None else ("", ())
+    rows = db.fetchall(
+        "SELECT MIN(MAX(CAST(COALESCE(final_score, 0) / 10 AS INTEGER), 0), ?) AS score_bin, COUNT(*) AS n "
+        f"FROM candidates {where} GROUP BY 1", (HISTOGRAM_BINS - 1, *params)
+    )
+    counts = [0] * HISTOGRAM_BINS
+    for row in rows:
+        counts[row["score_bin"]] = row["n"]
+    return counts
+
+
+def assert_stats_match(db, job_ids):
+    for job_id in (None, *job_ids):
+        assert db.candidates.status_counts(job_id) == expected_status_counts(db, job_id), job_id
+        assert db.candidates.score_histogram(job_id) == expected_histogram(db, job_id), job_id
+
+
+def write(db, sql, params=()):
+    # Écriture hors dépôt: la transaction invalide le cache des lectures de job_stats
+    with db.transaction() as conn:
+        conn.execute(sql, params)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "ats.db"))
+    migrate(db)
+    return db
+
+
+@pytest.fixture
+def job_ids(db):
+    return [db.jobs.create(f"Offre {i}", "Description", "python", 2) for i in range(2)]
+
+
+def create_candidates(db, job_ids):
+    ids = []
+    for i in range(12):
+        candidate_id = db.candidates.create(f"Candidat {i}", f"c{i}@example.com", "0600000000",
+                                            f"cv{i}.pdf", job_ids[i % 2], 50.0)
+        ids.append(candidate_id)
+    return ids
+
+
+def test_insert(db, job_ids):
+    create_candidates(db, job_ids)
+    assert db.candidates.status_counts() == {"En attente": 12}
+    assert_stats_match(db, job_ids)
+
+
+def test_update_status_and_score(db, job_ids):
+    ids = create_candidates(db, job_ids)
+    for i, candidate_id in enumerate(ids):
+        # Scores aux bornes des bins, au-delà de 100 et négatifs
+        score = [0, 9.99, 10, 55, 99.9, 100, 120, -5][i % 8]
+        db.candidates.set_final(candidate_id, score, "Accepté" if score >= 55 else "Refusé")
+    assert_stats_match(db, job_ids)
+
+    write(db, "UPDATE candidates SET final_score = NULL, status = NULL WHERE id = ?", (ids[0],))
+    assert_stats_match(db, job_ids)
+
+
+def test_update_job(db, job_ids):
+    ids = create_candidates(db, job_ids)
+    db.candidates.set_final(ids[0], 72, "Accepté")
+    write(db, "UPDATE candidates SET job_id = ? WHERE id IN (?, ?)", (job_ids[1], ids[0], ids[2]))
+    write(db, "UPDATE candidates SET job_id = NULL WHERE id = ?", (ids[4],))
+    assert_stats_match(db, job_ids)
+    assert sum(db.candidates.status_counts(job_ids[1]).values()) == 8
+
+
+def test_delete(db, job_ids):
+    ids = create_candidates(db, job_ids)
+    db.candidates.set_final(ids[1], 88, "Accepté")
+    write(db, "DELETE FROM candidates WHERE id IN (?, ?, ?)", (ids[0], ids[1], ids[5]))
+    assert_stats_match(db, job_ids)
+
+    write(db, "DELETE FROM candidates")
+    assert db.candidates.status_counts() == {}
+    assert db.candidates.score_histogram() == [0] * HISTOGRAM_BINS
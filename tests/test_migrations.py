@@ -0,0 +1,19 @@
+"""Schéma versionné: migrations et index des requêtes fréquentes."""
+from lib.database import Database
+from lib.migrations import HOT_QUERIES, MIGRATIONS, check_query_plans, current_version, migrate
+
+
+def test_migrate_applies_every_version_once(tmp_path):
+    db = Database(str(tmp_path / "ats.db"))
+    assert migrate(db) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(db) == []
+    assert current_version(db) == MIGRATIONS[-1][0]
+
+
+def test_hot_queries_use_their_index(tmp_path):
+    db = Database(str(tmp_path / "ats.db"))
+    migrate(db)
+    results = check_query_plans(db)
+    assert set(results) == set(HOT_QUERIES)
+    missing = {name: plan for name, (uses_index, plan) in results.items() if not uses_index}
+    assert not missing, f"Requêtes sans l'index attendu: {missing}"
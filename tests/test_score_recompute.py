@@ -0,0 +1,81 @@
+"""Recalcul en masse des scores finaux: simulation, lignes réécrites, scores finaux absents."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from lib.database import Database
+from lib.migrations import migrate
+from lib.score_recompute import ScorePolicy, recompute_scores
+
+POLICY = ScorePolicy(cv_weight=0.25, written_weight=0.25, video_weight=0.25, documents_weight=0.25, threshold=70.0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "ats.db"))
+    migrate(db)
+    job_id = db.jobs.create("Offre", "Description", "python", 2)
+    rows = [
+        # (scores, score final, statut)
+        ((80, 80, 80, 80), 80.0, "Présélectionné"),   # à jour
+        ((60, 60, 60, 60), 60.0, "Rejeté"),           # à jour
+        ((90, 70, 70, 70), 70.0, "Rejeté"),           # score et statut obsolètes
+        ((50, 50, 50, 50), 50.0, "Présélectionné"),   # statut seul obsolète
+        ((40, 40, 40, 40), None, "En attente"),       # score final absent
+        ((40, 40, 40, None), None, "En attente"),     # incomplet: ignoré
+    ]
+    with db.transaction() as conn:
+        for i, (scores, final_score, status) in enumerate(rows):
+            conn.execute(
+                "INSERT INTO candidates (name, email, job_id, cv_match_score, written_interview_score, "
+                "video_interview_score, documents_score, final_score, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (f"Candidat {i}", f"c{i}@example.com", job_id, *scores, final_score, status)
+            )
+    # Identifiants des lignes réécrites, relevés par un trigger de cette connexion
+    db.connection.execute("CREATE TEMP TABLE updated_ids (id INTEGER)")
+    db.connection.execute(
+        "CREATE TEMP TRIGGER log_updates AFTER UPDATE ON candidates "
+        "BEGIN INSERT INTO updated_ids VALUES (NEW.id); END"
+    )
+    return db
+
+
+def snapshot(db):
+    return [tuple(row) for row in db.fetchall("SELECT id, final_score, status FROM candidates ORDER BY id")]
+
+
+def updated_ids(db):
+    return sorted(row[0] for row in db.fetchall("SELECT id FROM updated_ids"))
+
+
+def test_dry_run_writes_nothing(db):
+    before = snapshot(db)
+    result = recompute_scores(POLICY, db, dry_run=True)
+    assert result.considered == 5
+    assert [change[0] for change in result.changes] == [3, 4, 5]
+    assert not result.written
+    assert snapshot(db) == before
+    assert updated_ids(db) == []
+
+
+def test_only_changed_rows_are_rewritten(db):
+    result = recompute_scores(POLICY, db)
+    assert result.written
+    assert updated_ids(db) == [3, 4, 5]
+    assert result.transitions() == {("Rejeté", "Présélectionné"): 1, ("Présélectionné", "Rejeté"): 1,
+                                    ("En attente", "Rejeté"): 1}
+
+    rows = {row[0]: row[1:] for row in snapshot(db)}
+    assert rows[3] == (75.0, "Présélectionné")
+    assert rows[4] == (50.0, "Rejeté")
+    assert rows[6] == (None, "En attente")
+
+    # Un second passage ne trouve plus rien à réécrire
+    assert recompute_scores(POLICY, db).changes == []
+    assert updated_ids(db) == [3, 4, 5]
+
+
+def test_missing_final_score_is_picked_up(db):
+    result = recompute_scores(POLICY, db, dry_run=True)
+    change = next(change for change in result.changes if change[0] == 5)
+    assert change == (5, None, 40.0, "En attente", "Rejeté")